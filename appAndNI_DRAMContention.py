@@ -29,6 +29,7 @@ def main():
     parser.add_argument("--micaPrefetch", dest='micaPrefetch',default=False, action='store_true',help="Whether the RPCs themselves model aggressive MICA prefetching.. Default = False")
     parser.add_argument("--dataplanes", dest='dataplanes',default=False, action='store_true',help="If true, model a dataplanes system (N queues x 1). Default = False.")
     parser.add_argument("--collect_qdat", dest='collect_qdat',default=False, action='store_true',help="If true, collect data to measure queue depths and queueing times. Default = False.")
+    parser.add_argument("--budget", type=float,help="Max. wall-clock seconds per data point, slower jobs stop early and are flagged as partial. Default = None (no limit)",default=None)
     parser.add_argument("--ofile", dest='ofile',nargs='?',default='qsweep.csv',help="The ouput file to write.")
     parser.add_argument("--odir_qdata", dest='odir_qdata',nargs='?',default='queue_data/',help="The ouput directory to write queueing statstics to.")
     args = parser.parse_args()
@@ -82,6 +83,9 @@ def main():
                             'dataplanes' : args.dataplanes
                             }
 
+    if args.budget is not None:
+        invokerArgs['budget'] = args.budget
+
     threadController = Invoker( **invokerArgs )
     threadController.startProcs()
     threadController.joinProcs()
@@ -100,6 +104,7 @@ def main():
     # Remap to dictwriter-able format.
     for x in flat_results:
         for k,v in x.items():
+            partial = v.pop()
             avg_bw = v.pop()
             n_dropped = v.pop()
             l = sorted(list(v[0]),key = lambda t : t[0])
@@ -110,9 +115,11 @@ def main():
                 init_or_add(odict,k,tup[1])
         init_or_add(odict,k,n_dropped)
         init_or_add(odict,k,avg_bw)
+        init_or_add(odict,k,partial)
 
     output_fields.append('n_dropped')
     output_fields.append('Avg. DRAM BW')
+    output_fields.append('partial')
 
     # backup old file
     #fstring = 'queueing'+args.mode+'_'+args.mem+'_'+str(args.nodes)+'Nodes'+bstring+'.csv'
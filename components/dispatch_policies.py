@@ -1,9 +1,7 @@
 #!/usr/bin/env python
 ## Author: Mark Sutherland, (C) 2020
 from my_simpy.src.simpy.resources.store import Store
-
-# Python base package includes
-from random import randint
+from .random_stream import stream
 
 def find_shortest_q(qs):
     smallest = 1000000000
@@ -16,12 +14,25 @@ def find_shortest_q(qs):
 
     return shortest_q
 
+# Same as find_shortest_q for the partitions of a KeyedStore
+def find_shortest_partition(store,num_partitions):
+    smallest = 1000000000
+    shortest_p = 0
+    for pdx in range(num_partitions):
+        c_len = store.count(pdx)
+        if c_len < smallest:
+            smallest = c_len
+            shortest_p = pdx
+
+    return shortest_p
+
 class RandomDispatchPolicy(object):
     def __init__(self,num_queues):
         self.num_queues = num_queues
+        self.rng = stream('dispatch')
 
     def select(self,req=None):
-        the_q_idx = randint(0,self.num_queues-1)
+        the_q_idx = self.rng.randint(0,self.num_queues-1)
         return the_q_idx
 
 class JSQDispatchPolicy(object):
@@ -43,23 +54,26 @@ class JBSQDispatchPolicy(object):
         else:
             return -1
 
+# The CREW and EREW policies select a partition of a KeyedStore
 class CREWDispatchPolicy(object):
-    def __init__(self,qs):
-        self.queues = qs
+    def __init__(self,store,num_partitions):
+        self.store = store
+        self.num_partitions = num_partitions
 
     def select(self,req):
-        if req.getWrite(): # have to go to a single queue
-            # Map key to partition/queue.
+        if req.getWrite(): # have to go to a single partition
+            # Map key to partition.
             # Important not just to take mod of integer key, would result in all hot keys grouping up
-            return hash(req.key) % len(self.queues)
-        else: # Can dispatch to shortest queue
-            return find_shortest_q(self.queues)
+            return hash(req.key) % self.num_partitions
+        else: # Can dispatch to shortest partition
+            return find_shortest_partition(self.store,self.num_partitions)
 
 class EREWDispatchPolicy(object):
-    def __init__(self,qs):
-        self.queues = qs
+    def __init__(self,store,num_partitions):
+        self.store = store
+        self.num_partitions = num_partitions
 
     def select(self,req):
-        # Map key to partition/queue.
+        # Map key to partition.
         # Important not just to take mod of integer key, would result in all hot keys grouping up
-        return hash(req.key) % len(self.queues)
+        return hash(req.key) % self.num_partitions
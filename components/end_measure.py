@@ -1,6 +0,0 @@
-#!/usr/bin/env python
-## Author: Mark Sutherland, (C) 2020
-
-# Special class to indicate end of measurement phase
-class EndOfMeasurements(object):
-    pass
@@ -1,52 +1,48 @@
 #!/usr/bin/env python
 ## Author: Mark Sutherland, (C) 2020
-from numpy.random import exponential as exp_arrival
-from my_simpy.src.simpy import Environment,Interrupt
+import numpy as np
+from my_simpy.src.simpy import Environment
 from my_simpy.src.simpy.resources.store import Store
-from .end_measure import EndOfMeasurements
+from my_simpy.src.simpy.util import ArrivalStream
 from .requests import RPCRequest
+from .random_stream import stream
 
 # Python base package includes
-from random import randint
+from itertools import count
+
+# Number of inter-arrival times drawn (and arrivals scheduled) at once
+ARRIVAL_CHUNK = 1024
 
 ## A class which serves as a Poisson load generator.
+## Arrival times are drawn in chunks and injected into the output queue by an
+## ArrivalStream, so there is no process resume per arrival. The generator
+## never stops, the phase controller decides which requests are measured and
+## when the run ends.
 class PoissonLoadGen(object):
-    def __init__(self,simpy_env,out_queue,num_events,key_obj,incoming_load_A,writes):
+    def __init__(self,simpy_env,out_queue,phases,key_obj,incoming_load_A,writes):
         self.env = simpy_env
         self.q = out_queue
-        self.num_events = num_events
+        self.phases = phases
         self.myLambda = 1/float(incoming_load_A)
         self.key_generator = key_obj
         self.write_frac = writes
-        self.action = self.env.process(self.run())
+        self.rng = stream('load_generator')
+        self.stream = ArrivalStream(self.env,self.q,self.arrival_times(),
+                (self.gen_new_req(i) for i in count()),ARRIVAL_CHUNK)
 
     def gen_new_req(self,rpc_id=-1):
         # Setup parameters like id, key, etc
-        req = RPCRequest(rpc_id,self.key_generator.get_key())
-        write_integer = randint(0,100)
+        req = RPCRequest(rpc_id,self.key_generator.get_key(),measured=self.phases.admit())
+        write_integer = self.rng.randint(0,100)
         if write_integer <= self.write_frac:
             req.setWrite()
         return req
 
-    def run(self):
-        numGenerated = 0
-        while numGenerated < self.num_events:
-            try:
-                yield self.q.put(self.gen_new_req(numGenerated))
-                yield self.env.timeout(exp_arrival(self.myLambda))
-                numGenerated += 1
-            except Interrupt as i:
-                print("LoadGenerator killed during event generation. Interrupt:",i,"die....")
-                return
-
-        # Make a new EndOfMeasurements event (special)
-        yield self.q.put(EndOfMeasurements())
-
-        # Keep generating events for realistic measurement
+    def arrival_times(self):
+        # First arrival now, then exponential gaps, drawn in chunks.
+        t = self.env.now
+        yield t
         while True:
-            try:
-                yield self.q.put(self.gen_new_req(-1))
-                yield self.env.timeout(exp_arrival(self.myLambda))
-            except Interrupt as i:
-                print("LoadGenerator killed by feedback with Simpy text:",i)
-                return
+            times = (t + np.cumsum(self.rng.exponential(self.myLambda,ARRIVAL_CHUNK))).tolist()
+            yield from times
+            t = times[-1]
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+## Random number streams for the simulation components.
+## A RandomStream draws blocks of values with a numpy Generator and returns
+## them one by one, so a scalar draw costs an iterator step instead of a call
+## into numpy or scipy. The streams of the components are named and derived
+## from one root seed, so each component draws the same numbers in every run
+## with the same seed, no matter what the other components draw.
+import numpy as np
+from zlib import crc32
+
+# Number of values drawn at once
+BLOCK_SIZE = 4096
+
+class RandomStream(object):
+    def __init__(self,seed=None,block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.reseed(seed)
+
+    def reseed(self,seed):
+        # seed is an integer, a numpy SeedSequence or None (fresh OS entropy).
+        # Values buffered from the previous seed are dropped.
+        self.generator = np.random.default_rng(seed)
+        self._uniforms = iter(())
+        self._exponentials = iter(())
+        self._integers = { }
+        self._binomials = { }
+        self._ranks = { }
+
+    def random(self):
+        # Uniform in [0, 1)
+        try:
+            return next(self._uniforms)
+        except StopIteration:
+            self._uniforms = iter(self.generator.random(self.block_size).tolist())
+            return next(self._uniforms)
+
+    def exponential(self,scale=1.0,size=None):
+        # Exponential with mean scale, or an array of size of them
+        if size is not None:
+            return scale * self.generator.standard_exponential(size)
+        try:
+            return scale * next(self._exponentials)
+        except StopIteration:
+            self._exponentials = iter(self.generator.standard_exponential(self.block_size).tolist())
+            return scale * next(self._exponentials)
+
+    def randint(self,low,high):
+        # Uniform integer in [low, high], like random.randint
+        try:
+            return next(self._integers[low,high])
+        except (KeyError,StopIteration):
+            values = self._integers[low,high] = iter(self.generator.integers(low,high,self.block_size,endpoint=True).tolist())
+            return next(values)
+
+    def bernoulli(self,p):
+        # True with probability p
+        return self.random() < p
+
+    def binomial(self,n,p):
+        try:
+            return next(self._binomials[n,p])
+        except (KeyError,StopIteration):
+            values = self._binomials[n,p] = iter(self.generator.binomial(n,p,self.block_size).tolist())
+            return next(values)
+
+    def zipf_rank(self,cdf):
+        # Index of the first entry of the increasing numpy array cdf that is
+        # greater than a uniform draw (bisect_right), len(cdf) if there is none
+        try:
+            return next(self._ranks[id(cdf)][1])
+        except (KeyError,StopIteration):
+            ranks = iter(np.searchsorted(cdf,self.generator.random(self.block_size),side='right').tolist())
+            # Keep cdf alive, its id must not be reused while it is buffered
+            self._ranks[id(cdf)] = (cdf,ranks)
+            return next(ranks)
+
+class RandomStreams(object):
+    """Named RandomStreams, all derived from one root seed."""
+    def __init__(self,seed=None):
+        self.streams = { }
+        self.seed(seed)
+
+    def seed(self,seed):
+        # Reseed all streams in place, so components can keep references to them.
+        # With seed None, the root seed comes from fresh OS entropy.
+        self.root = seed
+        self._entropy = np.random.SeedSequence(seed).entropy
+        for name,stream in self.streams.items():
+            stream.reseed(self._seedFor(name))
+
+    def _seedFor(self,name):
+        # crc32 instead of hash(), which differs between python processes
+        return np.random.SeedSequence(self._entropy,spawn_key=(crc32(name.encode('utf-8')),))
+
+    def stream(self,name):
+        try:
+            return self.streams[name]
+        except KeyError:
+            s = self.streams[name] = RandomStream(self._seedFor(name))
+            return s
+
+# The streams of all components
+streams = RandomStreams()
+
+def stream(name):
+    return streams.stream(name)
+
+def seed(s):
+    streams.seed(s)
@@ -10,10 +10,11 @@ class AbstractRequest(object):
 
 ## A class that models an RPC request
 class RPCRequest(AbstractRequest):
-    def __init__(self,rpc_number,k,write=False):
+    def __init__(self,rpc_number,k,write=False,measured=True):
         super().__init__()
         self.num = rpc_number
         self.key = k
+        self.measured = measured # see PhaseController.admit()
         self.dispatch_time = -1
         self.start_proc_time = -1
         self.end_proc_time = -1
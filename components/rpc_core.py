@@ -3,10 +3,12 @@
 from .serv_times.exp_generator import ExpServTimeGenerator
 
 class RPCCore(object):
-    def __init__(self,simpy_env,core_id,request_queue,measurement_store,rd_gen,wr_gen,lgen_to_interrupt):
+    # If partition is given, request_queue is a KeyedStore and the core only gets the requests of that partition.
+    def __init__(self,simpy_env,core_id,request_queue,measurement_store,rd_gen,wr_gen,phases,partition=None):
         self.env = simpy_env
         self.id = core_id
         self.in_q = request_queue
+        self.partition = partition
         self.latency_store = measurement_store
         self.read_distribution_generator = rd_gen
         self.write_distribution_generator = wr_gen
@@ -15,7 +17,7 @@ class RPCCore(object):
         self.numSimulated = 0
 
         # Used for calculating service stability
-        self.lgen_to_interrupt = lgen_to_interrupt
+        self.phases = phases
         self.kill_sim_threshold = 10000
         self.lastFiveSTimes = [ ]
         if core_id is 0:
@@ -41,30 +43,32 @@ class RPCCore(object):
 
     def endSimUnstable(self):
         if self.isMaster is True:
-            try:
-                self.lgen_to_interrupt.action.interrupt("unstable")
-            except RuntimeError as e:
-                print('Caught exception',e,'lets transparently ignore it')
+            self.phases.stop()
         self.killed = True
 
     def run(self):
         while self.killed is False:
-            rpc = yield self.in_q.get()
+            if self.partition is None:
+                rpc = yield self.in_q.get()
+            else:
+                rpc = yield self.in_q.get(self.partition)
 
             rpcNumber = rpc.num
             rpc.start_proc_time = self.env.now
 
             # Model a service time
             if rpc.getWrite():
-                yield self.env.timeout(self.write_distribution_generator.get())
+                yield self.write_distribution_generator.get()
             else:
-                yield self.env.timeout(self.read_distribution_generator.get())
+                yield self.read_distribution_generator.get()
 
             # RPC is done
             rpc.end_proc_time = self.env.now
             rpc.completion_time = self.env.now # This may need to be changed to model any "end of rpc" actions
             total_time = rpc.getTotalServiceTime()
-            self.latency_store.record_value(total_time)
+            if rpc.measured:
+                self.latency_store.record_value(total_time)
+            self.phases.complete(rpc.measured)
             self.putSTime(total_time)
 
             if self.isMaster is True and self.isSimulationUnstable() is True:
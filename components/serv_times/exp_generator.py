@@ -1,10 +1,13 @@
 #!/usr/bin/python3
 ## Author: Mark Sutherland, (C) 2020
 
-from numpy.random import exponential
+from ..random_stream import stream
+
 class ExpServTimeGenerator(object):
-    def __init__(self,mean_service_time):
+    # Generators with the same stream name share their random numbers
+    def __init__(self,mean_service_time,stream_name='serv_times'):
         self.exp_stime = mean_service_time
+        self.rng = stream(stream_name)
 
     def get(self):
-        return exponential(self.exp_stime)
+        return self.rng.exponential(self.exp_stime)
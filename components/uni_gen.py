@@ -2,7 +2,7 @@
 ## Author: Mark Sutherland, (C) 2020
 ## A class which returns integer values (TODO: variable length strings)
 ## distributed according to a uniform distribution.
-from random import seed,uniform
+from .random_stream import RandomStream
 from math import ceil
 
 class UniformKeyGenerator(object):
@@ -17,12 +17,13 @@ class UniformKeyGenerator(object):
         self.theConfig = { "N": kwargs["num_items"]
                          }
         self.theNumKeys = int(self.theConfig['N'])
-        rand_seed = '0xdeadbeef'
-        print('Seeding random with',rand_seed)
-        seed(rand_seed)
+        # The keys do not depend on the seed of the other streams
+        rand_seed = 0xdeadbeef
+        print('Seeding key stream with',hex(rand_seed))
+        self.rng = RandomStream(rand_seed)
         print('Done!')
 
     def get_key(self):
         # Algorithm: Get a random number in the specified interval, return that key rank.
-        r = ceil(uniform(0,self.theNumKeys))
+        r = ceil(self.rng.random() * self.theNumKeys)
         return r
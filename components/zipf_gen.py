@@ -2,37 +2,68 @@
 ## Author: Mark Sutherland, (C) 2020
 ## A class which returns integer values (TODO: variable length strings)
 ## distributed according to a parameterized zipf distribution.
-from random import random
-from bisect import bisect_right
+## The cdf of each (N, s) is built once with numpy and cached in a .npy file,
+## later runs and other worker processes map the cached file read-only.
+import numpy as np
+import os
+import tempfile
+from .random_stream import stream
 
-class ZipfKeyGenerator(object):
-    def calc_generalized_harmonic(self,n,power=1):
-        harm = 0.0
-        for i in range(n):
-            harm += ( 1.0 / (pow(float(i+1),power)) )
-        return harm
+# Where the cdf arrays are cached, None disables the cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'),'.cache','zipf_cdf')
 
-    def make_pdf_cdf_arrays(self):
-        size = int(self.theConfig['N'])
-        s = float(self.theConfig['s'])
-        self.pdf_array = [ ]
-        self.cdf_array = [ ]
-        run_sum = 0.0
-        for i in range(size):
-            cur_rank_val = (1.0 / pow(i+1,s))/self.harmonic
-            run_sum += cur_rank_val
-            self.pdf_array.append(cur_rank_val)
-            self.cdf_array.append(run_sum)
-
-    def init_harmonics(self):
+class ZipfKeyGenerator(object):
+    def make_cdf_array(self):
         size = int(self.theConfig['N'])
         s = float(self.theConfig['s'])
-        self.harmonic = self.calc_generalized_harmonic(size,s)
+        # One float64 array of size N, reused for the rank weights, their
+        # running sum and the normalized cdf
+        cdf = np.arange(1,size+1,dtype=np.float64)
+        np.power(cdf,-s,out=cdf)
+        np.cumsum(cdf,out=cdf)
+        cdf /= cdf[-1] # divide by the generalized harmonic number
+        return cdf
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir,'zipf_cdf_N%d_s%r.npy' % (int(self.theConfig['N']),float(self.theConfig['s'])))
+
+    def load_cdf_array(self):
+        # Map the cached cdf, or build it and write it to the cache
+        if self.cache_dir is None:
+            return self.make_cdf_array()
+        path = self.cache_path()
+        try:
+            cdf = np.load(path,mmap_mode='r')
+            if cdf.shape == (int(self.theConfig['N']),):
+                print('Loaded cdf array from',path)
+                return cdf
+            print('WARNING: Cached cdf array',path,'has shape',cdf.shape,', rebuilding it.')
+        except (OSError,ValueError):
+            pass
+        print('Initializing cdf array....')
+        cdf = self.make_cdf_array()
+        try:
+            os.makedirs(self.cache_dir,exist_ok=True)
+            # Write to a temporary file and rename it, so concurrent workers
+            # never load a partially written cdf
+            fd,tmp_path = tempfile.mkstemp(suffix='.npy',dir=self.cache_dir)
+            try:
+                with os.fdopen(fd,'wb') as f:
+                    np.save(f,cdf)
+                os.replace(tmp_path,path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print('WARNING: Could not cache cdf array in',self.cache_dir,':',e)
+        return cdf
 
     def __init__(self,**kwargs):
         # args needed from higher level:
         #   (num_items) -> Number of items in the dataset
         #   (coeff) -> Zipf coefficient
+        # optional:
+        #   (cache_dir) -> Directory of the cached cdf arrays, None to disable
         req_args = ['num_items', 'coeff']
         for k in req_args:
             if k not in kwargs.keys():
@@ -41,23 +72,23 @@ class ZipfKeyGenerator(object):
         self.theConfig = { "N": kwargs["num_items"],
                             "s": kwargs["coeff"]
                          }
-        print('Initializing harmonic sums...')
-        self.init_harmonics()
-        print('Initializing pdf and cdf arrays....')
-        self.make_pdf_cdf_arrays()
+        self.cache_dir = kwargs.get("cache_dir",DEFAULT_CACHE_DIR)
+        self.rng = stream('keys')
+        self.cdf_array = self.load_cdf_array()
+        # The weight of rank 0 is 1, so cdf[0] is 1/harmonic
+        self.harmonic = 1.0 / float(self.cdf_array[0])
         print('Done!')
 
     def prob_for_rank(self,k):
-        return self.pdf_array[k]
-        #s = float(self.theConfig['s'])
-        #return ( (float(1.0)/pow(k,s)) / (self.harmonic) )
+        s = float(self.theConfig['s'])
+        return ( (float(1.0)/pow(k+1,s)) / (self.harmonic) )
 
     def get_key(self):
         # Algorithm: Get a random number in the standard interval
-        # Fit it into the cdf previously generated, and return the integer describing its rank
-        r = random()
-        rank = bisect_right(self.cdf_array, r)
+        # Fit it into the cdf previously generated, and return the integer describing its rank.
+        # The stream searches the cdf for a block of uniform draws at once.
+        rank = self.rng.zipf_rank(self.cdf_array)
         if rank < len(self.cdf_array):
             return rank
-        raise ValueError('rand() generated',r,'and bisect_right returned rank',rank,
+        raise ValueError('zipf_rank returned rank',rank,
                 'which is >= than the cdf array\'s length',len(self.cdf_array))
@@ -7,19 +7,21 @@ import argparse
 from scipy.special import binom as BinomCoefficient
 from .LatencyTracker import ExactLatencyTracker
 from hdrh.histogram import HdrHistogram
-from random import randint
 from math import floor,ceil
-from numpy.random import exponential as exp_arrival
 
 # Relative path required to have ./p3 and ./my_simpy in same dir
 import sys
 sys.path.append("..")
-from my_simpy.src.simpy import Environment,Interrupt
+from my_simpy.src.simpy import Actor,CountdownEvent,Environment
+from my_simpy.src.simpy.core import BudgetExceeded
 from my_simpy.src.simpy.resources.resource import FiniteQueueResource, Resource
 from my_simpy.src.simpy.resources.store import Store
-
-# Interval to print how many RPCs this generator has run
-PRINT_INTERVAL = 100000
+from my_simpy.src.simpy.resources.stats import QueueStats, length_percentile
+from my_simpy.src.simpy.profiling import Profiler
+from my_simpy.src.simpy.tracing import Tracer
+from my_simpy.src.simpy.util import PhaseController
+from parallel.branching import run_branches, reseed
+from components.random_stream import stream
 
 # some random DRAM parameters, can un-hardcode this later
 tCAS = 14
@@ -39,26 +41,30 @@ def printServiceTimes(latStore):
     print("99th is:",latStore.get_value_at_percentile(99))
     print("99.9th is:",latStore.get_value_at_percentile(99.9))
 
+def printProgress(now,events,rate):
+    print('Simulated time (ns):',now,', events:',events,', events/s:','%.0f' % rate)
+
 def getServiceTimes(latStore):
     percentiles = [ 50, 95, 99, 99.9 ]
     vals = [ latStore.get_value_at_percentile(p) for p in percentiles ]
     return zip(percentiles,vals)
 
 # Prob_ddio can be float, round down
-def rollHit(prob_ddio):
-    rand_ddiohit = randint(0,100)
+def rollHit(prob_ddio,rng):
+    rand_ddiohit = rng.randint(0,100)
     if rand_ddiohit < int(prob_ddio):
         return True
     return False
 
 class RPC(object):
-    def __init__(self,n,d,llc_hit):
+    def __init__(self,n,d,llc_hit,measured=True):
         self.num = n
         self.dispatch_time = d
         self.start_proc_time = -1
         self.end_proc_time = -1
         self.completion_time = -1
         self.hit = llc_hit
+        self.measured = measured # see PhaseController.admit()
 
     def getQueuedTime(self):
         return self.start_proc_time - self.dispatch_time
@@ -69,9 +75,6 @@ class RPC(object):
     def getTotalServiceTime(self):
         return self.completion_time - self.dispatch_time
 
-class EndOfMeasurements(object):
-    pass
-
 class BWBucket(object):
     def __init__(self,start,end):
         self.start_time = start
@@ -116,12 +119,16 @@ class InfiniteQueueDRAM(Resource):
 
         INTERVAL = 10000 # 10 us
         self.profiler = BWProfiler(env,nbanks,INTERVAL)
+        self.rng = stream('dram')
 
     def getIntervalBandwidths(self):
         return self.profiler.getBucketBWs()
 
+    def resetProfiler(self):
+        self.profiler = BWProfiler(self.env,self.num_banks,self.profiler.interval)
+
     def getBankLatency(self):
-        r = randint(0,100)
+        r = self.rng.randint(0,100)
         if r <= RB_HIT_RATE:
             return tOffchip + tCAS
         else:
@@ -130,211 +137,215 @@ class InfiniteQueueDRAM(Resource):
     def completeReq(self,sz):
         self.profiler.completeReq(self.env.now,sz)
 
+    def beginAccess(self,actor):
+        """Start the access of the SingleMemoryRequest actor."""
+        actor.request(self,actor.accessBank)
+
+    def syncAccess(self):
+        """Access one 64B line, use with yield from in a process."""
+        with self.request() as req:
+            yield req
+            r = self.getBankLatency()
+            yield r
+        self.completeReq(64)
+
 class Server(FiniteQueueResource):
     def __init__(self,env,numIndepServers,qdepth):
         super().__init__(env,numIndepServers,qdepth)
         self.myCores = numIndepServers
 
-class SingleMemoryRequest(object):
-    def __init__(self,env,resource_queues,eventToSucceed):
-        self.env = env
+class SingleMemoryRequest(Actor):
+    """Access one 64B line in a randomly chosen DRAM channel. When the access
+    is done, the actor counts down latch or, without a latch, succeeds."""
+    __slots__ = ('queues','latch','q','req')
+
+    # Channel selection of all memory requests
+    rng = stream('memory')
+
+    def __init__(self,env,resource_queues,latch=None):
+        super().__init__(env)
         self.queues = resource_queues
-        self.event = eventToSucceed
-        self.action = env.process(self.run())
+        self.latch = latch
 
-    # runs and then fulfills the event when it's done
-    def run(self):
-        #print('Single request starting at',self.env.now)
-        q = self.queues[randint(0,len(self.queues)-1)]
-        with q.request() as req:
-            yield req
-            yield self.env.timeout(q.getBankLatency())
-        q.completeReq(64)
-        # raise the event
-        #print('Single request raising event at',self.env.now)
-        self.event.succeed()
+    def start(self):
+        self.q = self.queues[self.rng.randint(0,len(self.queues)-1)]
+        self.q.beginAccess(self)
 
-# Also a separate process to run independently to the above requester
-class RPCDispatchRequest(object):
-    def __init__(self,env,resource_queues,sz,eventCompletion,interRequestTime,dispatch_q,rnum,rpc_q_dat_array,q_idx,collect_qdat,no_dispatch=False):
-        self.env = env
+    def accessBank(self,req):
+        self.req = req
+        self.sleep(self.q.getBankLatency(),self.complete)
+
+    def complete(self,wakeup):
+        self.q.release(self.req)
+        self.q.completeReq(64)
+        self.done()
+
+    def done(self):
+        if self.latch is None:
+            self.succeed()
+        else:
+            self.latch.count_down()
+
+class MultiLineMemoryRequest(Actor):
+    """Issue one SingleMemoryRequest per 64B line of sz bytes, spaced by
+    interRequestTime, and wait until all of them are done. The lines count
+    down a shared latch instead of triggering an event each. Subclasses
+    handle the completion in linesIssued() and linesDone()."""
+    __slots__ = ('queues','interRequestTime','numReqs','numIssued','latch')
+
+    def __init__(self,env,resource_queues,sz,interRequestTime):
+        super().__init__(env)
         self.queues = resource_queues
-        self.size = sz
         self.interRequestTime = interRequestTime
+        self.numReqs = floor(sz / 64)
+        self.numIssued = 0
+        self.latch = CountdownEvent(env,self.numReqs)
+
+    def start(self):
+        if self.numReqs > 0:
+            self.issueLine(None)
+        else:
+            self.linesIssued()
+
+    def issueLine(self,wakeup):
+        SingleMemoryRequest(self.env,self.queues,self.latch)
+        self.numIssued += 1
+        if self.numIssued < self.numReqs:
+            self.sleep(self.interRequestTime,self.issueLine)
+        else:
+            self.linesIssued()
+
+    def linesIssued(self):
+        self.awaitLines()
+
+    def awaitLines(self):
+        self.wait(self.latch,self.linesDone)
+
+    def linesDone(self,latch):
+        self.succeed()
+
+# Also a separate process to run independently to the above requester
+class RPCDispatchRequest(MultiLineMemoryRequest):
+    __slots__ = ('eventCompletion','dispatch_queue','num','measured','no_dispatch')
+
+    def __init__(self,env,resource_queues,sz,eventCompletion,interRequestTime,dispatch_q,rnum,measured=True,no_dispatch=False):
+        super().__init__(env,resource_queues,sz,interRequestTime)
         self.eventCompletion = eventCompletion
         self.dispatch_queue = dispatch_q
         self.num = rnum
-        self.q_idx = q_idx
+        self.measured = measured
         self.no_dispatch = no_dispatch
-        self.rpc_q_dat_array = rpc_q_dat_array
-        self.collect_qdat = collect_qdat
-        self.action = self.env.process(self.run())
-
-    def run(self):
-        num_reqs = floor(self.size / 64)
-        eventArray = [ self.env.event() for i in range(num_reqs) ]
-        for i in range(num_reqs):
-            #print('RPC',self.num,'created new single req. at',self.env.now)
-            SingleMemoryRequest(self.env,self.queues,eventArray[i])
-            if i < (num_reqs-1):
-                yield self.env.timeout(self.interRequestTime)
 
+    def linesIssued(self):
         # call to upper layer
-        #print('RPC',self.num,'completed packet writes at',self.env.now)
         self.eventCompletion.succeed()
-
         if self.no_dispatch is False:
-            # sleep until all events are fulfilled
-            for i in range(num_reqs):
-                yield eventArray[i]
-                #print('RPC',self.num,'activating event at',self.env.now)
-            newRPC = RPC(self.num,self.env.now,False) # ddio miss on writing payloads to dram
-            if self.collect_qdat is True:
-                self.rpc_q_dat_array.append((self.num,self.q_idx,len(self.dispatch_queue.items)))
-            yield self.dispatch_queue.put(newRPC)
-
-class SyncOverlappedMemoryRequest(object):
-    def __init__(self,env,resource_queues,sz,completionSignal,interRequestTime=1):
-        self.env = env
-        self.queues = resource_queues
-        self.size = sz
-        self.interRequestTime = interRequestTime
-        self.completionSignal = completionSignal
-        self.action = env.process(self.run())
+            # sleep until all lines are written
+            self.awaitLines()
+        else:
+            self.succeed()
 
-    def run(self):
-        num_reqs = floor(self.size / 64)
-        eventArray = [ self.env.event() for i in range(num_reqs) ]
-        for i in range(num_reqs):
-            SingleMemoryRequest(self.env,self.queues,eventArray[i])
-            if i < (num_reqs-1):
-                yield self.env.timeout(self.interRequestTime)
+    def linesDone(self,latch):
+        newRPC = RPC(self.num,self.env.now,False,self.measured) # ddio miss on writing payloads to dram
+        self.dispatch_queue.put(newRPC)
+        self.succeed()
+
+class SyncOverlappedMemoryRequest(MultiLineMemoryRequest):
+    __slots__ = ('completionSignal',)
 
-        # sleep until all events are fulfilled
-        for i in range(num_reqs):
-            yield eventArray[i]
+    def __init__(self,env,resource_queues,sz,completionSignal,interRequestTime=1):
+        super().__init__(env,resource_queues,sz,interRequestTime)
+        self.completionSignal = completionSignal
 
+    def linesDone(self,latch):
         self.completionSignal.succeed()
+        self.succeed()
 
 # Also a separate process to run independently to the above requester
-class AsyncMemoryRequest(object):
-    def __init__(self,env,resource_queues,sz,interRequestTime=1):
-        self.env = env
-        self.queues = resource_queues
-        self.size = sz
-        self.interRequestTime = interRequestTime
-        self.action = env.process(self.run())
+class AsyncMemoryRequest(MultiLineMemoryRequest):
+    __slots__ = ()
 
-    def run(self):
-        num_reqs = floor(self.size / 64)
-        eventArray = [ self.env.event() for i in range(num_reqs) ]
-        for i in range(num_reqs):
-            #print('created new single req. at',self.env.now)
-            SingleMemoryRequest(self.env,self.queues,eventArray[i])
-            if i < (num_reqs-1):
-                yield self.env.timeout(self.interRequestTime)
-
-        # sleep until all events are fulfilled
-        for i in range(num_reqs):
-            #print('asyncmemreqest yielding/passivating at',self.env.now)
-            yield eventArray[i]
-            #print('asyncmemreqest activating at',self.env.now)
+    def __init__(self,env,resource_queues,sz,interRequestTime=1):
+        super().__init__(env,resource_queues,sz,interRequestTime)
 
 class NI(object):
-    def __init__(self,env,ArrivalRate,resource_queues,p_ddio,RPCSize,dispatch_queues,N,dataplanes,collect_qdat):#,write_qdat_csv,qdat_csv_fname):
+    def __init__(self,env,ArrivalRate,resource_queues,p_ddio,RPCSize,dispatch_queues,phases,dataplanes,collect_qdat):#,write_qdat_csv,qdat_csv_fname):
         self.env = env
         self.queues = resource_queues
         self.myLambda = ArrivalRate
         self.prob_ddio = p_ddio
         self.dispatch_queues = dispatch_queues
         self.RPCSize = RPCSize
-        self.numRPCs = N
+        self.phases = phases
         self.dataplane_dispatch = dataplanes
-        self.collect_qdat = collect_qdat
+        self.rng = stream('ni')
 
-        # Data array containing tuples to be written to a queue depth CSV in the following format:
-        #   <rpc num>,<q_num>,<q_depth>
-        self.rpc_q_dat_array = []
+        # Time-weighted queue lengths of the dispatch queues
+        self.queue_stats = [ QueueStats(q) for q in dispatch_queues ] if collect_qdat else []
         self.action = env.process(self.run())
 
-    # Sort the q dat array by q_depth
     def get99th_queued(self):
-        sorted_by_q_depth = sorted(self.rpc_q_dat_array, key=lambda tup: tup[2])
-        idx_tail = floor(len(sorted_by_q_depth)*.99)
-        #print('Sorted by q_depth',sorted_by_q_depth)
-        return sorted_by_q_depth[idx_tail][2]
+        # Arrivals are Poisson, so they see the time-weighted queue lengths (PASTA).
+        histogram = {}
+        for stats in self.queue_stats:
+            for length,time in stats.histogram().items():
+                histogram[length] = histogram.get(length,0) + time
+        return length_percentile(histogram,99)
+
+    def resetQueueStats(self):
+        for stats in self.queue_stats:
+            stats.reset()
 
     def selectQueue(self):
         # Pick a queue statically, return it to the caller
         if self.dataplane_dispatch is True:
-            the_q_idx = randint(0,len(self.dispatch_queues)-1)
+            the_q_idx = self.rng.randint(0,len(self.dispatch_queues)-1)
         else:
             the_q_idx = 0
         #print('NI dispatcher sending req to queue:',the_q_idx)
         return the_q_idx,self.dispatch_queues[the_q_idx]
 
     def run(self):
+        # Runs until the phase controller ends the simulation. Only the RPCs
+        # admitted during its measurement phase are measured. While draining,
+        # the RPCs only generate memory traffic: they would queue up behind
+        # the measured ones and never be served before the end of the run.
         numSimulated = 0
-        while numSimulated < self.numRPCs:
-            try:
-                ddio_hit = rollHit(self.prob_ddio)
-                q_idx,the_queue_to_dispatch = self.selectQueue()
-                if ddio_hit is True:
-                    num_reqs = floor(self.RPCSize / 64)
-                    for i in range(num_reqs):
-                        if i < (num_reqs-1):
-                            yield self.env.timeout(self.myLambda)
-                    newRPC = RPC(numSimulated,self.env.now,ddio_hit)
-                    if self.collect_qdat is True:
-                        self.rpc_q_dat_array.append((numSimulated,q_idx,len(the_queue_to_dispatch.items)))
+        while True:
+            measured = self.phases.admit()
+            dispatch = measured or self.phases.phase is not PhaseController.DRAIN
+            ddio_hit = rollHit(self.prob_ddio,self.rng)
+            q_idx,the_queue_to_dispatch = self.selectQueue()
+            if ddio_hit is True:
+                num_reqs = floor(self.RPCSize / 64)
+                for i in range(num_reqs):
+                    if i < (num_reqs-1):
+                        yield self.myLambda
+                if dispatch is True:
+                    newRPC = RPC(numSimulated,self.env.now,ddio_hit,measured)
                     #print(q_idx,len(the_queue_to_dispatch.items))
                     yield the_queue_to_dispatch.put(newRPC)
-                else:
-                    # Launch a multi-packet request to memory, dispatch when it is done.
-                    payloadsDoneEvent = self.env.event()
-                    payloadWrite = RPCDispatchRequest(self.env, self.queues, self.RPCSize, payloadsDoneEvent, self.myLambda,the_queue_to_dispatch,numSimulated,self.rpc_q_dat_array,q_idx,self.collect_qdat)
-                    # Roll hit probability, and if fail, do a writeback
-                    hit_clean = rollHit(self.prob_ddio)
-                    if hit_clean is False:
-                        AsyncMemoryRequest(self.env, self.queues, self.RPCSize)
-                    yield payloadsDoneEvent # all payloads written
-
-                yield self.env.timeout(exp_arrival(self.myLambda))
-                numSimulated += 1
-            except Interrupt as i:
-                print("NI killed with Simpy exception:",i,"....EoSim")
-                return
-
-        yield self.dispatch_queues[0].put(EndOfMeasurements()) # Only put 1 EndOfMeasurements() event.
-
-        # After the dispatch is done, keep generating the traffic for realistic measurements.
-        while True:
-            try:
-                ddio_hit = rollHit(self.prob_ddio)
-                if ddio_hit is True:
-                    num_reqs = floor(self.RPCSize / 64)
-                    for i in range(num_reqs):
-                        if i < (num_reqs-1):
-                            yield self.env.timeout(self.myLambda)
-                else:
-                    # Launch a multi-packet request to memory, but don't dispatch it
-                    payloadsDoneEvent = self.env.event()
-                    payloadWrite = RPCDispatchRequest(self.env, self.queues, self.RPCSize, payloadsDoneEvent, self.myLambda,self.dispatch_queues[0],numSimulated,self.rpc_q_dat_array,0,self.collect_qdat,no_dispatch=True)
-                    yield payloadsDoneEvent # all payloads written
-
-                yield self.env.timeout(self.myLambda)
-            except Interrupt as i:
-                #print("NI killed in post-dispatch phase, exception:",i,"....End of Sim...")
-                return
+            else:
+                # Launch a multi-packet request to memory, dispatch when it is done.
+                payloadsDoneEvent = self.env.event()
+                payloadWrite = RPCDispatchRequest(self.env, self.queues, self.RPCSize, payloadsDoneEvent, self.myLambda,the_queue_to_dispatch,numSimulated,measured,not dispatch)
+                # Roll hit probability, and if fail, do a writeback
+                if dispatch is True and rollHit(self.prob_ddio,self.rng) is False:
+                    AsyncMemoryRequest(self.env, self.queues, self.RPCSize)
+                yield payloadsDoneEvent # all payloads written
+
+            yield self.rng.exponential(self.myLambda)
+            numSimulated += 1
 
 class ClosedLoopRPCGenerator(object):
-    def __init__(self,env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,isParent=False):
+    def __init__(self,env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,isParent=False):
         self.env = env
         self.queues = sharedQueues
         self.latencyStore = latStore
         self.numSimulated = 0
-        self.ni_to_interrupt = NIToInterrupt
+        self.phases = phases
         self.cid = i
+        self.rng = stream('core.%d' % i)
         self.kill_sim_threshold = max_stime_ns
         self.dispatch_queue = dispatch_queue
         self.p_hit = p_ddio
@@ -378,31 +389,27 @@ class ClosedLoopRPCGenerator(object):
             return True
         return False
 
-    def endSimGraceful(self):
-        try:
-            self.ni_to_interrupt.action.interrupt("end of sim")
-            if len(self.dispatch_queue.items) != 0:
-                print("WARNING: Core got EoM packet from NI, but there are still",len(self.dispatch_queue.items),"RPCs in the queue. Recommend check results.")
-        except RuntimeError as e:
-            print('Caught exception',e,'lets transparently ignore it')
-        self.killed = True
-
     def endSimUnstable(self):
         if self.isMaster is True:
-            try:
-                self.ni_to_interrupt.action.interrupt("unstable")
-            except RuntimeError as e:
-                print('Caught exception',e,'lets transparently ignore it')
+            self.phases.stop()
         self.killed = True
 
+    def finishRPC(self,rpc):
+        """Record the latency of a measured rpc and check the stability."""
+        total_time = rpc.getTotalServiceTime()
+        if rpc.measured:
+            self.latencyStore.record_value(total_time)
+        self.phases.complete(rpc.measured)
+        self.putSTime(total_time)
+        if self.isMaster is True and self.isSimulationUnstable() is True:
+            print('Simulation was unstable, last five service times from core 0 were:',self.lastFiveSTimes,', killing sim.')
+            self.endSimUnstable()
+        self.numSimulated += 1
+
     def run(self):
         while self.killed is False:
             # Start new RPC
             rpc = yield self.dispatch_queue.get()
-            if isinstance(rpc,EndOfMeasurements):
-                #print('End of simulation received by core',self.cid,', interrupting NI')
-                self.endSimGraceful()
-                continue
 
             rpcNumber = rpc.num
             #print('core',self.cid,'got rpc #',rpcNumber,'from the dispatch queue at time',self.env.now,'dispatch time',rpc.dispatch_time)
@@ -412,15 +419,11 @@ class ClosedLoopRPCGenerator(object):
             #   - first access is synchronous (must access the index)
             #   - all other accesses are parallel (overlapped loads for GETS or stores for PUTS)
             # Do first access
-            q = self.queues[randint(0,len(self.queues)-1)]
-            with q.request() as req:
-                yield req
-                r = q.getBankLatency()
-                yield self.env.timeout(r)
-            q.completeReq(64)
+            q = self.queues[self.rng.randint(0,len(self.queues)-1)]
+            yield from q.syncAccess()
 
             # spend some Cpu time, calculated in __init__
-            yield self.env.timeout(self.mean_cpu_time)
+            yield self.mean_cpu_time
 
             # Do payload accesses in parallel
             # For GET -> asynchronously copy out of DRAM and into local buffers
@@ -431,7 +434,7 @@ class ClosedLoopRPCGenerator(object):
             AsyncMemoryRequest(self.env, self.queues, self.RPCSize)
 
             # Roll hit probability, and if fail, do a writeback
-            hit_clean = rollHit(self.p_hit)
+            hit_clean = rollHit(self.p_hit,self.rng)
             if hit_clean is False:
                 AsyncMemoryRequest(self.env, self.queues, self.RPCSize)
 
@@ -439,26 +442,16 @@ class ClosedLoopRPCGenerator(object):
             rpc.end_proc_time = self.env.now
 
             # Model payload write for return value
-            q = self.queues[randint(0,len(self.queues)-1)]
-            with q.request() as req:
-                yield req
-                r = q.getBankLatency()
-                yield self.env.timeout(r)
-            q.completeReq(64)
+            q = self.queues[self.rng.randint(0,len(self.queues)-1)]
+            yield from q.syncAccess()
 
             rpc.completion_time = self.env.now
-            total_time = rpc.getTotalServiceTime()
-            #print('Core num',self.cid,', RPC num',rpcNumber,'total processing time',rpc.getProcessingTime(),', total e-e service time',total_time)
-            self.latencyStore.record_value(total_time)
-            self.putSTime(total_time)
-            if self.isMaster is True and self.isSimulationUnstable() is True:
-                print('Simulation was unstable, last five service times from core 0 were:',self.lastFiveSTimes,', killing sim.')
-                self.endSimUnstable()
-            self.numSimulated += 1
+            #print('Core num',self.cid,', RPC num',rpcNumber,'total processing time',rpc.getProcessingTime(),', total e-e service time',rpc.getTotalServiceTime())
+            self.finishRPC(rpc)
 
 class FixedServTimeRPCGenerator(ClosedLoopRPCGenerator):
-    def __init__(self,env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
-        super().__init__(env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
+    def __init__(self,env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
+        super().__init__(env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
         self.fixed_stime = mean_service_time
         self.action = env.process(self.run())
 
@@ -466,28 +459,17 @@ class FixedServTimeRPCGenerator(ClosedLoopRPCGenerator):
         while self.killed is False:
             # Start new RPC
             rpc = yield self.dispatch_queue.get()
-            if isinstance(rpc,EndOfMeasurements):
-                #print('End of simulation received by core',self.cid,', interrupting NI')
-                self.endSimGraceful()
-                continue
 
             rpc.start_proc_time = self.env.now
 
             # Wait for a fixed time.
-            yield self.env.timeout(self.fixed_stime)
+            yield self.fixed_stime
             rpc.completion_time = self.env.now
-            total_time = rpc.getTotalServiceTime()
-
-            self.latencyStore.record_value(total_time)
-            self.putSTime(total_time)
-            if self.isMaster is True and self.isSimulationUnstable() is True:
-                print('Simulation was unstable, last five service times from core 0 were:',self.lastFiveSTimes,', killing sim.')
-                self.endSimUnstable()
-            self.numSimulated += 1
+            self.finishRPC(rpc)
 
 class ExpServTimeRPCGenerator(ClosedLoopRPCGenerator):
-    def __init__(self,env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
-        super().__init__(env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
+    def __init__(self,env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
+        super().__init__(env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
         self.exp_stime = mean_service_time
         self.action = env.process(self.run())
 
@@ -495,28 +477,17 @@ class ExpServTimeRPCGenerator(ClosedLoopRPCGenerator):
         while self.killed is False:
             # Start new RPC
             rpc = yield self.dispatch_queue.get()
-            if isinstance(rpc,EndOfMeasurements):
-                #print('End of simulation received by core',self.cid,', interrupting NI')
-                self.endSimGraceful()
-                continue
 
             rpc.start_proc_time = self.env.now
 
             # Wait for a fixed time.
-            yield self.env.timeout(exp_arrival(self.exp_stime))
+            yield self.rng.exponential(self.exp_stime)
             rpc.completion_time = self.env.now
-            total_time = rpc.getTotalServiceTime()
-
-            self.latencyStore.record_value(total_time)
-            self.putSTime(total_time)
-            if self.isMaster is True and self.isSimulationUnstable() is True:
-                print('Simulation was unstable, last five service times from core 0 were:',self.lastFiveSTimes,', killing sim.')
-                self.endSimUnstable()
-            self.numSimulated += 1
+            self.finishRPC(rpc)
 
 class BimodalServTimeRPCGenerator(ClosedLoopRPCGenerator):
-    def __init__(self,env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
-        super().__init__(env,sharedQueues,latStore,mean_service_time,NIToInterrupt,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
+    def __init__(self,env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch):
+        super().__init__(env,sharedQueues,latStore,mean_service_time,phases,i,max_stime_ns,dispatch_queue,p_ddio,sz,num_mem_reqs,amat,micaPrefetch,True)
         self.mean_stime = mean_service_time
         self.action = env.process(self.run())
 
@@ -524,29 +495,18 @@ class BimodalServTimeRPCGenerator(ClosedLoopRPCGenerator):
         while self.killed is False:
             # Start new RPC
             rpc = yield self.dispatch_queue.get()
-            if isinstance(rpc,EndOfMeasurements):
-                #print('End of simulation received by core',self.cid,', interrupting NI')
-                self.endSimGraceful()
-                continue
 
             rpc.start_proc_time = self.env.now
 
             # Roll to see if you are in the 10% long ones, or 90% short ones.
-            short = rollHit(90)
+            short = rollHit(90,self.rng)
             if short:
-                yield self.env.timeout(self.mean_stime / 2)
+                yield self.mean_stime / 2
             else:
-                yield self.env.timeout(5.5*self.mean_stime)
+                yield 5.5*self.mean_stime
 
             rpc.completion_time = self.env.now
-            total_time = rpc.getTotalServiceTime()
-
-            self.latencyStore.record_value(total_time)
-            self.putSTime(total_time)
-            if self.isMaster is True and self.isSimulationUnstable() is True:
-                print('Simulation was unstable, last five service times from core 0 were:',self.lastFiveSTimes,', killing sim.')
-                self.endSimUnstable()
-            self.numSimulated += 1
+            self.finishRPC(rpc)
 
 def str2bool(v):
     if v.lower() in ('yes', 'true', 't', 'y', '1'):
@@ -556,17 +516,17 @@ def str2bool(v):
     else:
         raise argparse.ArgumentTypeError('Boolean value expected.')
 
-def rpc_generator_factory(distribution_type,env,DRAMChannels,latencyStore,serv_time,NIDevice,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch):
+def rpc_generator_factory(distribution_type,env,DRAMChannels,latencyStore,serv_time,phases,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch):
     if distribution_type == 'Fixed':
-        return FixedServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,NIDevice,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
+        return FixedServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,phases,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
     elif distribution_type == 'Exponential':
-        return ExpServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,NIDevice,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
+        return ExpServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,phases,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
     elif distribution_type == 'Bimodal':
-        return BimodalServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,NIDevice,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
+        return BimodalServTimeRPCGenerator(env,DRAMChannels,latencyStore,serv_time,phases,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
     else: # MICA
-        return ClosedLoopRPCGenerator(env,DRAMChannels,latencyStore,serv_time,NIDevice,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
+        return ClosedLoopRPCGenerator(env,DRAMChannels,latencyStore,serv_time,phases,i,MAX_STIME_NS,disp_queues,p_ddio,RPC_SIZE,numMemRequests,dram_avg_lat,micaPrefetch)
 
-def simulateAppAndNI_DRAM(argsFromInvoker):
+def parseAppAndNI_DRAMArgs(argsFromInvoker):
     parser = argparse.ArgumentParser(description='Run a M*k/D/k/N queueing sim.')
     parser.add_argument('-k','--NumberOfChannels', dest='NumberOfChannels', type=int, default=1,help='Number of DRAM chs. to assume in the simulation (k in Kendall\'s notation)')
     parser.add_argument('-c','--NumberOfCores', dest='NumberOfCores', type=int, default=1,help='Number of application cores executing RPCs.')
@@ -575,6 +535,8 @@ def simulateAppAndNI_DRAM(argsFromInvoker):
     parser.add_argument('-b','--BanksPerChannel', dest='BanksPerChannel', type=int, default=1,help='DRAM banks per channel')
     parser.add_argument('-N', '--NumSlots', dest='NumQueueSlots', type=int, default=-1,help='Max number of slots in each queue (-1 if unlimited).')
     parser.add_argument('-n', '--N_rpcs', dest='NumRPCs', type=int, default=1,help='Number of RPCS/messages/jobs to simulate.')
+    parser.add_argument('--warmup', dest='warmup', type=float, default=0,help='Number of RPCs (ns with --measure_time) to simulate before the measured ones. Default = 0.')
+    parser.add_argument('--measure_time', dest='measure_time', type=float, default=None,help='If set, measure the RPCs that arrive in this many ns after the warm-up instead of -n RPCs. Default = None.')
     parser.add_argument('-s', '--serv_time', dest='serv_time', type=int, default=100,help='Service time of the RPC')
     parser.add_argument('-S', '--Servers', dest='servers', type=int, default=10000,help='Number of server nodes to assume.')
     parser.add_argument('--reqsPerRPC', dest='numMemRequests', type=int, default=2,help='Number of memory requests to do per RPC.')
@@ -586,21 +548,16 @@ def simulateAppAndNI_DRAM(argsFromInvoker):
     parser.add_argument("--dataplanes", dest='dataplanes',type=str2bool,default=False, const=True,nargs='?',help="If true, model a dataplanes system (N queues x 1). Default = False.")
     parser.add_argument("--collect_qdat", dest='collect_qdat',type=str2bool,default=False, const=True,nargs='?',help="If true, collect data to measure queue depths and queueing times. Default = False.")
     parser.add_argument("--dist", dest='stime_dist',default="MICA", help="The type of service time distribution that is implemented by the RPC models. Default = MICA.")
+    parser.add_argument("--profile", dest='profile',type=str2bool,default=False, const=True,nargs='?',help="If true, print a profile of the simulation kernel (events and wall time per event type and process) after the run. Default = False.")
+    parser.add_argument("--trace", dest='trace',default=None,help="Record the events of the simulation kernel to this file (the most recent 1M events, see simpy.tracing.TraceReader). Cannot be combined with --profile. Default = None.")
+    parser.add_argument("--budget", dest='budget',type=float,default=None,help="Max. wall-clock seconds to simulate for. If exceeded, the job stops and its results are flagged as partial. Default = None (no limit).")
+    parser.add_argument("--progress", dest='progress',type=float,default=None,help="Print the simulated time, event count and events/s every this many wall-clock seconds. Default = None (no progress).")
+    parser.add_argument("--inline_limit", dest='inline_limit',type=int,default=0,help="Max. number of already triggered events (e.g. gets on non-empty queues) a process continues with inline before waiting for the scheduler. Default = 0 (disabled).")
+    parser.add_argument("--seed", dest='seed',type=int,default=None,help="Seed of the random number streams of the NI, cores and DRAM. Default = None (fresh OS entropy).")
 
-    args = parser.parse_args(argsFromInvoker.split(' '))
-
-    env = Environment()
-
-    RPC_SIZE = args.rpcSizeBytes
-
-    #dram_avg_lat = tOffchip + (RB_HIT_RATE/100)*tCAS + (1-(RB_HIT_RATE/100))*(tRP+tRAS+tCAS)
-    dram_avg_lat = 45
-    #print('Avg DRAM lat:',dram_avg_lat)
-    #print('Naive DRAM estimate BW:',64/dram_avg_lat * 8)
-
-    # 100ns to 100us, with a precision of 0.1%
-    latencyStore = HdrHistogram(MIN_STIME_NS, MAX_STIME_NS, 3)
+    return parser.parse_args(argsFromInvoker.split(' '))
 
+def getDDIOProbability(args):
     # Number of connections per server
     #N_threads = args.servers * args.NumberOfCores
     N_connections = args.servers
@@ -621,6 +578,125 @@ def simulateAppAndNI_DRAM(argsFromInvoker):
         p_ddio = 100
     else:
         p_ddio = (float(LLCSpace) / BufSpace)*100
+    return BDP,BufSpace,LLCSpace,p_ddio
+
+class AppAndNI_DRAMModel(object):
+    """The NI, DRAM channels and RPC cores of one simulateAppAndNI_DRAM() job."""
+    def __init__(self,args,p_ddio):
+        self.args = args
+        if args.seed is not None:
+            reseed(args.seed)
+        env = self.env = Environment(inline_limit=args.inline_limit)
+        RPC_SIZE = args.rpcSizeBytes
+
+        #dram_avg_lat = tOffchip + (RB_HIT_RATE/100)*tCAS + (1-(RB_HIT_RATE/100))*(tRP+tRAS+tCAS)
+        dram_avg_lat = 45
+        # Set if the run was stopped by its wall-clock budget
+        self.partial = False
+        #print('Avg DRAM lat:',dram_avg_lat)
+        #print('Naive DRAM estimate BW:',64/dram_avg_lat * 8)
+
+        # 100ns to 100us, with a precision of 0.1%
+        latencyStore = self.latencyStore = HdrHistogram(MIN_STIME_NS, MAX_STIME_NS, 3)
+
+        # Warm-up, measure and drain phases, the run ends when the last
+        # measured RPC completes
+        if args.measure_time is not None:
+            phases = self.phases = PhaseController(env,args.measure_time,args.warmup,timed=True)
+        else:
+            phases = self.phases = PhaseController(env,args.NumRPCs,int(args.warmup))
+
+        # Create N queues, one per DRAM channel
+        if args.NumQueueSlots == -1:
+            self.DRAMChannels = DRAMChannels = [InfiniteQueueDRAM(env,args.BanksPerChannel) for i in range(args.NumberOfChannels)]
+        else:
+            self.DRAMChannels = DRAMChannels = [Server(env,args.BanksPerChannel,args.NumQueueSlots) for i in range(args.NumberOfChannels)]
+        if args.warmup > 0:
+            # Only measure the DRAM bandwidth and queue depths from the start of the measurement phase on.
+            phases.measuring.callbacks.append(lambda event: self.resetProfilers())
+
+        # Create 1 single dispatch queue or N queues if running in dataplane mode
+        # FIXME: Need to make these finite-length queues for more detailed simulation
+        if args.dataplanes is True:
+            disp_queues = [ Store(env) for i in range(args.NumberOfCores) ]
+        else:
+            disp_queues = [ Store(env) ]
+
+        # NI BW generator/dispatcher
+        self.NIDevice = NIDevice = NI(env,args.LambdaArrivalRate,DRAMChannels,p_ddio,RPC_SIZE,disp_queues,phases,args.dataplanes,args.collect_qdat)
+
+        # create rpc generator
+        if args.dataplanes is True:
+            # Each core gets a private queue
+            self.CPUsModel = [rpc_generator_factory(args.stime_dist,env,DRAMChannels,latencyStore,args.serv_time,phases,i,MAX_STIME_NS,disp_queues[i],p_ddio,RPC_SIZE,args.numMemRequests,dram_avg_lat,args.micaPrefetch) for i in range(args.NumberOfCores)]
+        else:
+            # All core models get the same queue
+            self.CPUsModel = [rpc_generator_factory(args.stime_dist,env,DRAMChannels,latencyStore,args.serv_time,phases,i,MAX_STIME_NS,disp_queues[0],p_ddio,RPC_SIZE,args.numMemRequests,dram_avg_lat,args.micaPrefetch) for i in range(args.NumberOfCores)]
+
+    def run(self):
+        if self.args.profile is True and self.args.trace is not None:
+            raise ValueError('--trace cannot be combined with --profile.')
+        if self.args.profile is True:
+            with Profiler(self.env) as profiler:
+                self.runEnv()
+            print(profiler.report())
+        elif self.args.trace is not None:
+            with Tracer(self.env,self.args.trace) as tracer:
+                self.runEnv()
+            print('Traced',tracer.count,'events to',self.args.trace)
+        else:
+            self.runEnv()
+
+    def runEnv(self):
+        progress = printProgress if self.args.progress is not None else None
+        try:
+            self.env.run(until=self.phases,budget=self.args.budget,progress=progress,progress_interval=self.args.progress)
+        except BudgetExceeded as e:
+            print('WARNING:',e,'Results are partial.')
+            self.partial = True
+
+    def resetBWProfilers(self):
+        for ch in self.DRAMChannels:
+            ch.resetProfiler()
+
+    def resetProfilers(self):
+        self.resetBWProfilers()
+        self.NIDevice.resetQueueStats()
+
+    def resetMeasurements(self):
+        """Drop everything measured so far, e.g. after a warm-up phase."""
+        self.latencyStore.reset()
+        self.resetProfilers()
+
+    def getResults(self):
+        args = self.args
+        NIDevice = self.NIDevice
+        DRAMChannels = self.DRAMChannels
+        latencyStore = self.latencyStore
+
+        # Get the 99th percentile of number of queued rpcs from the NIDevice, which was stored there
+        if args.collect_qdat:
+            tail_queued = NIDevice.get99th_queued()
+        else:
+            tail_queued = 0
+
+        # Get/print DRAM BWs if option enabled.
+        dramChannelBW_Lists = [ ch.getIntervalBandwidths() for ch in DRAMChannels ] # list of lists
+        def avgBW(l):
+            return sum(l,0.0)/len(l)
+
+        #retList = [ getServiceTimes(latencyStore), 0 ] + [ avgBW(ch) for ch in dramChannelBW_Lists ]
+        perCh_averages = [ avgBW(ch) for ch in dramChannelBW_Lists ]
+        if args.printDRAMBW is True:
+            print('DRAM channel bandwidths for job (',args.BWGbps,'):',perCh_averages)
+        retList = [ getServiceTimes(latencyStore), 0, sum(perCh_averages), tail_queued, self.partial ]
+        return retList
+
+def simulateAppAndNI_DRAM(argsFromInvoker):
+    args = parseAppAndNI_DRAMArgs(argsFromInvoker)
+
+    RPC_SIZE = args.rpcSizeBytes
+    BDP,BufSpace,LLCSpace,p_ddio = getDDIOProbability(args)
 
     if args.calcBW is True:
         t_f = 0.0 # fixed on-chip lat
@@ -652,46 +728,31 @@ def simulateAppAndNI_DRAM(argsFromInvoker):
 
     print('[NEW JOB: BW',args.BWGbps,', lambda',args.LambdaArrivalRate,'BDP',BDP,'Buffer space(MB)',BufSpace/1e6,', LLC Size(MB)',LLCSpace/1e6,'DDIO hit percentage',p_ddio,'%]')
 
-    # Create N queues, one per DRAM channel
-    if args.NumQueueSlots == -1:
-        DRAMChannels = [InfiniteQueueDRAM(env,args.BanksPerChannel) for i in range(args.NumberOfChannels)]
-    else:
-        DRAMChannels = [Server(env,args.BanksPerChannel,args.NumQueueSlots) for i in range(args.NumberOfChannels)]
-
-    # Create 1 single dispatch queue or N queues if running in dataplane mode
-    # FIXME: Need to make these finite-length queues for more detailed simulation
-    if args.dataplanes is True:
-        disp_queues = [ Store(env) for i in range(args.NumberOfCores) ]
-    else:
-        disp_queues = [ Store(env) ]
-
-    # NI BW generator/dispatcher
-    NIDevice = NI(env,args.LambdaArrivalRate,DRAMChannels,p_ddio,RPC_SIZE,disp_queues,args.NumRPCs,args.dataplanes,args.collect_qdat)
-
-    # create rpc generator
-    if args.dataplanes is True:
-        # Each core gets a private queue
-        CPUsModel = [rpc_generator_factory(args.stime_dist,env,DRAMChannels,latencyStore,args.serv_time,NIDevice,i,MAX_STIME_NS,disp_queues[i],p_ddio,RPC_SIZE,args.numMemRequests,dram_avg_lat,args.micaPrefetch) for i in range(args.NumberOfCores)]
-    else:
-        # All core models get the same queue
-        CPUsModel = [rpc_generator_factory(args.stime_dist,env,DRAMChannels,latencyStore,args.serv_time,NIDevice,i,MAX_STIME_NS,disp_queues[0],p_ddio,RPC_SIZE,args.numMemRequests,dram_avg_lat,args.micaPrefetch) for i in range(args.NumberOfCores)]
-
-    env.run()
-
-    # Get the 99th percentile of number of queued rpcs from the NIDevice, which was stored there
-    if args.collect_qdat:
-        tail_queued = NIDevice.get99th_queued()
-    else:
-        tail_queued = 0
-
-    # Get/print DRAM BWs if option enabled.
-    dramChannelBW_Lists = [ ch.getIntervalBandwidths() for ch in DRAMChannels ] # list of lists
-    def avgBW(l):
-        return sum(l,0.0)/len(l)
-
-    #retList = [ getServiceTimes(latencyStore), 0 ] + [ avgBW(ch) for ch in dramChannelBW_Lists ]
-    perCh_averages = [ avgBW(ch) for ch in dramChannelBW_Lists ]
-    if args.printDRAMBW is True:
-        print('DRAM channel bandwidths for job (',args.BWGbps,'):',perCh_averages)
-    retList = [ getServiceTimes(latencyStore), 0, sum(perCh_averages), tail_queued ]
-    return retList
+    model = AppAndNI_DRAMModel(args,p_ddio)
+    model.run()
+    return model.getResults()
+
+def simulateAppAndNI_DRAM_warmStart(argsFromInvoker,warmupTime,lambdas,seed=0,maxParallel=None):
+    """Simulate the job described by argsFromInvoker up to the simulated time
+    warmupTime once, then fork() one copy per NI arrival rate (NI.myLambda)
+    in lambdas and continue each of them with its own seed (seed + index).
+
+    Returns one result per rate, in the format of simulateAppAndNI_DRAM().
+    Measurements only cover the time after the warm-up, but -n still counts
+    the RPCs since time 0. Requires os.fork() (Linux/macOS)."""
+    args = parseAppAndNI_DRAMArgs(argsFromInvoker)
+    BDP,BufSpace,LLCSpace,p_ddio = getDDIOProbability(args)
+    print('[NEW WARM-START JOB: BW',args.BWGbps,', lambda',args.LambdaArrivalRate,'warm-up',warmupTime,'branch lambdas',list(lambdas),'DDIO hit percentage',p_ddio,'%]')
+
+    model = AppAndNI_DRAMModel(args,p_ddio)
+    def makeBranch(myLambda,branchSeed):
+        def branch(env):
+            reseed(branchSeed)
+            model.NIDevice.myLambda = myLambda
+            model.resetMeasurements()
+            model.run()
+            return model.getResults()
+        return branch
+
+    branches = [ makeBranch(l,seed+i) for i,l in enumerate(lambdas) ]
+    return run_branches(model.env,warmupTime,branches,maxParallel)
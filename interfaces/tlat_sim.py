@@ -10,8 +10,12 @@ from .LatencyTracker import ExactLatencyTracker
 # Relative path required to have ./p3 and ./my_simpy in same dir
 import sys
 sys.path.append("..")
-from my_simpy.src.simpy import Environment,Interrupt
+from my_simpy.src.simpy import Environment
+from my_simpy.src.simpy.core import BudgetExceeded
 from my_simpy.src.simpy.resources.resource import FiniteQueueResource
+from my_simpy.src.simpy.profiling import Profiler
+from parallel.branching import reseed
+from components.random_stream import stream
 
 ThroughputBytesPerSecond = 128e9 # full duplex
 BytesPerPacket = 64
@@ -31,7 +35,10 @@ tMem = 50
 
 DEF_SERV_TIME = 1000
 RTT = 5000 # 5 us
-PRINT_INTERVAL = 500000
+PRINT_INTERVAL = 10 # wall-clock seconds between progress prints
+
+# Service times of all RPCs
+serviceRNG = stream('service_times')
 
 # Print out average and tail latency
 def printServiceTimes(latStore):
@@ -40,16 +47,19 @@ def printServiceTimes(latStore):
     print("99th is:",latStore.get_value_at_percentile(99))
     print("99.9th is:",latStore.get_value_at_percentile(99.9))
 
+def printProgress(now,events,rate):
+    print('Simulated time (ns):',now,', events:',events,', events/s:','%.0f' % rate)
+
 def getServiceTimes(latStore):
     percentiles = [ 50, 95, 99, 99.9 ]
     vals = [ latStore.get_value_at_percentile(p) for p in percentiles ]
     return zip(percentiles,vals)
 
-def getNumDropped(latStore):
-    return latStore.get_num_dropped()
+def getNumDropped(server):
+    return server.rejections
 
 def RandomVarForServTime():
-    numHits = stats.binom.rvs(FirstLevelRolls,Prob_L1Hit)
+    numHits = serviceRNG.binomial(FirstLevelRolls,Prob_L1Hit)
     coeff = BinomCoefficient(FirstLevelRolls,numHits)
     return coeff # TODO: Fixme
 
@@ -86,39 +96,36 @@ class RPC(object):
 
         while current_time < Deadline and not comp:
             #print("rpc",self.rid,"trying to request access, at time:",current_time)
-            # queue waiting to get a core for service
-            with self.NAMES.request() as req:
-                try:
-                    yield req
-                    # GOT their names, now can serve
-                    #print("rpc",self.rid,"GOT access, at time:",current_time)
-                    yield self.env.timeout(sampledServiceTime)
-                    total_time = self.env.now - before_queue
-                    self.latencyTracker.record_value(total_time,num_times_retried)
-                    #print("RPC",self.rid,"Finished @ time:",self.env.now)
-                    comp = True
-                except Interrupt as exc:
-                    if exc.cause != 'maxQDepthExceeded':
-                        raise ValueError('Unknown interrupt type')
-                    else:
-                        #print("RPC",self.rid,"overflowed the queue @ time:",self.env.now)
-                        yield self.env.timeout(RTT)
-                        num_times_retried += 1
-                        current_time = self.env.now
+            # queue waiting to get a core for service, the server counts the rejections
+            req = self.NAMES.try_request(num_times_retried > 0)
+            if req is None:
+                #print("RPC",self.rid,"overflowed the queue @ time:",self.env.now)
+                yield RTT
+                num_times_retried += 1
+                current_time = self.env.now
+                continue
+            with req:
+                yield req
+                # GOT their names, now can serve
+                #print("rpc",self.rid,"GOT access, at time:",current_time)
+                yield sampledServiceTime
+                total_time = self.env.now - before_queue
+                self.latencyTracker.record_value(total_time)
+                #print("RPC",self.rid,"Finished @ time:",self.env.now)
+                comp = True
         if not comp:
             #print("RPC",self.rid,"never finished by SLO deadline. Supposed to start at:",before_queue)
-            self.latencyTracker.record_value(SLO*100,num_times_retried)
+            self.latencyTracker.record_value(SLO*100)
 
 class PointQuery(RPC):
     def __init__(self,env,dist,theirNAMES,latencyTracker,rid):
         super().__init__(env,dist,theirNAMES,latencyTracker,rid)
         self.name = "Point Query RPC"
         self.baseServiceTime = DEF_SERV_TIME
-        self.serviceTimeDist = stats.expon(scale=self.baseServiceTime)
         self.action = env.process(self.run())
 
     def getServiceTimeValue(self):
-        return self.serviceTimeDist.rvs()
+        return serviceRNG.exponential(self.baseServiceTime)
         #cacheHits = self.statsDist.rvs(FirstLevelRolls,Prob_L1Hit)
         #return self.baseServiceTime - ( (tMem - tL1)*cacheHits )
 
@@ -130,7 +137,7 @@ class InlineScanQuery(RPC):
         self.action = env.process(self.run())
 
     def getServiceTimeValue(self):
-        return stats.expon.rvs(scale=self.baseServiceTime)
+        return serviceRNG.exponential(self.baseServiceTime)
 
 class NonInlineScanQuery(RPC):
     def __init__(self,env,dist,theirNAMES,latencyTracker,rid):
@@ -140,7 +147,7 @@ class NonInlineScanQuery(RPC):
         self.action = env.process(self.run())
 
     def getServiceTimeValue(self):
-        return stats.expon.rvs(scale=self.baseServiceTime)
+        return serviceRNG.exponential(self.baseServiceTime)
 
 class Server(FiniteQueueResource):
     def __init__(self,env,numIndepServers,qdepth):
@@ -156,19 +163,18 @@ class RPCGenerator(object):
         self.nRPCS = num
         self.percPointQueries = ppq
         self.longQueryClassType = longtype
+        self.rng = stream('rpc_generator')
         self.action = env.process(self.run())
         self.numSimulated = 0
 
     def run(self):
         while self.nRPCS > 0:
-            if (self.nRPCS % PRINT_INTERVAL) == 0:
-                print('RPCs simulated:',self.numSimulated)
-                #printServiceTimes(self.latencyStore)
-            yield self.env.timeout(stats.expon.rvs(self.myLambda))
+            # Same as stats.expon.rvs(self.myLambda): myLambda is the location, the scale is 1
+            yield self.myLambda + self.rng.exponential()
             #print("Generated new RPC at:",self.env.now)
-            # binom generate for % of short queries
-            boolForShortQuery = stats.binom.rvs(1,self.percPointQueries)
-            if boolForShortQuery == 1:
+            # Bernoulli roll for % of short queries
+            boolForShortQuery = self.rng.bernoulli(self.percPointQueries)
+            if boolForShortQuery is True:
                 myRPC = RPCFactory(PointQuery,self.env,stats.binom,self.server,self.latencyStore,self.numSimulated).construct()
             else:
                 myRPC = RPCFactory(self.longQueryClassType,self.env,stats.binom,self.server,self.latencyStore,self.numSimulated).construct()
@@ -183,10 +189,15 @@ def simulate(argsFromInvoker):
     parser.add_argument('-N', '--NumSlots', dest='NumQueueSlots', type=int, default=1,help='Max number of slots in the shared queue.')
     parser.add_argument('-n', '--N_rpcs', dest='NumRPCs', type=int, default=1,help='Number of RPCS/messages/jobs to simulate.')
     parser.add_argument('-f', '--frac_short',dest='FractionShortRPCs', type=float, default=1.0,help='Fraction of RPCs that will be considered "short".')
+    parser.add_argument('--budget', dest='budget', type=float, default=None,help='Max. wall-clock seconds to simulate for. If exceeded, the results are flagged as partial.')
+    parser.add_argument('--profile', dest='profile', action='store_true',help='Print a profile of the simulation kernel (events and wall time per event type and process) after the run.')
+    parser.add_argument('--seed', dest='seed', type=int, default=None,help='Seed of the random number streams. Default = None (fresh OS entropy).')
 
     args = parser.parse_args(argsFromInvoker.split(' '))
     #print('Simulating nCores = {}, Lambda = {}, QueueDepth = {}, and NRPCS = {}'.format(args.NumberOfCores,args.LambdaArrivalRate,args.NumQueueSlots,args.NumRPCs))
 
+    if args.seed is not None:
+        reseed(args.seed)
     env = Environment()
     # all measurements in range: [STime, 1000*STime], with a precision of 3 digits
     #latencyStore = HdrHistogram(DEF_SERV_TIME-10 , DEF_SERV_TIME*1000, 5)
@@ -194,5 +205,18 @@ def simulate(argsFromInvoker):
     theirNAMES = Server(env,args.NumberOfCores,args.NumQueueSlots)
     # pass number of events to the generator
     poissonGen = RPCGenerator(env,args.LambdaArrivalRate,theirNAMES,latencyStore,args.NumRPCs,args.FractionShortRPCs,NonInlineScanQuery)
-    env.run()
-    return [ getServiceTimes(latencyStore), getNumDropped(latencyStore) ]
+    def run():
+        try:
+            env.run(budget=args.budget,progress=printProgress,progress_interval=PRINT_INTERVAL)
+        except BudgetExceeded as e:
+            print('WARNING:',e,'Results are partial.')
+            return True
+        return False
+
+    if args.profile:
+        with Profiler(env) as profiler:
+            partial = run()
+        print(profiler.report())
+    else:
+        partial = run()
+    return [ getServiceTimes(latencyStore), getNumDropped(theirNAMES), partial ]
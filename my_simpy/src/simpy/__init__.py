@@ -13,12 +13,13 @@ from pkgutil import extend_path
 from .core import Environment
 from .rt import RealtimeEnvironment
 from .exceptions import SimPyException, Interrupt, StopProcess
-from .events import Event, Timeout, Process, AllOf, AnyOf
+from .events import (
+    Event, Timeout, Process, Actor, CountdownEvent, AllOf, AnyOf)
 from .resources.resource import (
     Resource, PriorityResource, PreemptiveResource,FiniteQueueResource)
 from .resources.container import Container
 from .resources.store import (
-    Store, PriorityItem, PriorityStore, FilterStore)
+    Store, PriorityItem, PriorityStore, FilterStore, KeyedStore)
 
 
 def compile_toc(entries, section_marker='='):
@@ -38,11 +39,12 @@ toc = (
         Environment, RealtimeEnvironment,
     )),
     ('Events', (
-        Event, Timeout, Process, AllOf, AnyOf, Interrupt,
+        Event, Timeout, Process, Actor, CountdownEvent, AllOf, AnyOf,
+        Interrupt,
     )),
     ('Resources', (
         Resource, PriorityResource, PreemptiveResource, Container, Store,
-        PriorityItem, PriorityStore, FilterStore,
+        PriorityItem, PriorityStore, FilterStore, KeyedStore,
     )),
     ('Exceptions', (
         SimPyException, Interrupt, StopProcess,
@@ -3,12 +3,18 @@ Core components for event-discrete simulation environments.
 
 """
 import types
-from heapq import heappush, heappop
-from itertools import count
+from collections import deque
+from itertools import count, repeat
+
+try:
+    from time import perf_counter
+except ImportError:  # Python 2
+    from time import time as perf_counter
 
 from .exceptions import StopProcess
 from .events import (AllOf, AnyOf, Event, Process, Timeout, URGENT,
-                          NORMAL)
+                          NORMAL, CANCELLED)
+from .queues import HeapQueue
 
 
 Infinity = float('inf')  #: Convenience alias for infinity
@@ -47,6 +53,14 @@ class EmptySchedule(Exception):
     pass
 
 
+class BudgetExceeded(Exception):
+    """Thrown by :meth:`BaseEnvironment.run()` if its wall-clock *budget* ran
+    out before the *until* criterion was met. The simulation stops after the
+    last processed event and can be continued by calling
+    :meth:`~BaseEnvironment.run()` again."""
+    pass
+
+
 class StopSimulation(Exception):
     """Indicates that the simulation should stop now."""
 
@@ -92,11 +106,31 @@ class BaseEnvironment(object):
         """
         raise NotImplementedError(self)
 
+    def schedule_many(self, events, times, priority=NORMAL):
+        """Schedule each of the *events* with the given *priority* at the
+        corresponding absolute simulation time in *times*.
+
+        The events must have been triggered (i.e. their value must have been
+        set) like for :meth:`schedule()`. Raise a :exc:`ValueError` if the
+        lengths of *events* and *times* differ or if a time lies in the past.
+
+        """
+        if len(events) != len(times):
+            raise ValueError('Got %d events but %d times.' %
+                             (len(events), len(times)))
+        now = self.now
+        if len(times) and min(times) < now:
+            raise ValueError('Time %s lies before the current time %s.' %
+                             (min(times), now))
+        for event, at in zip(events, times):
+            self.schedule(event, priority, at - now)
+
     def step(self):
         """Processes the next event."""
         raise NotImplementedError(self)
 
-    def run(self, until=None):
+    def run(self, until=None, budget=None, progress=None,
+            progress_events=None, progress_interval=1.0):
         """Executes :meth:`step()` until the given criterion *until* is met.
 
         - If it is ``None`` (which is the default), this method will return
@@ -110,6 +144,20 @@ class BaseEnvironment(object):
         - If it is a number, the method will continue stepping
           until the environment's time reaches *until*.
 
+        If *budget* is not ``None``, the run may take at most *budget* seconds
+        of wall-clock time. A :exc:`BudgetExceeded` exception is raised when
+        the budget runs out before *until* is met.
+
+        If *progress* is not ``None``, it is called as ``progress(now, events,
+        rate)`` with the current simulation time, the number of events
+        processed by this run so far and the number of events per wall-clock
+        second since the previous call. It is called every *progress_events*
+        events or, if that is ``None``, every *progress_interval* seconds.
+
+        The wall-clock time is only checked every :attr:`CHECK_EVENTS` events
+        (or every *progress_events* events), so both the budget and the
+        progress interval are kept approximately.
+
         """
         if until is not None:
             if not isinstance(until, Event):
@@ -127,15 +175,19 @@ class BaseEnvironment(object):
                 until._value = None
                 self.schedule(until, URGENT, at - self.now)
 
-            elif until.callbacks is None:
+            elif until._callbacks is None:
                 # Until event has already been processed.
                 return until.value
 
             until.callbacks.append(StopSimulation.callback)
 
         try:
-            while True:
-                self.step()
+            if budget is None and progress is None:
+                while True:
+                    self.step()
+            else:
+                self._run_monitored(budget, progress, progress_events,
+                                    progress_interval)
         except StopSimulation as exc:
             return exc.args[0]  # == until.value
         except EmptySchedule:
@@ -143,6 +195,41 @@ class BaseEnvironment(object):
                 assert not until.triggered
                 raise RuntimeError('No scheduled events left but "until" '
                                    'event was not triggered: %s' % until)
+        except BudgetExceeded:
+            if until is not None:
+                # Another run() must not be stopped by this until event.
+                until.callbacks.remove(StopSimulation.callback)
+            raise
+
+    CHECK_EVENTS = 1000
+    """Number of events :meth:`run()` processes between two checks of the
+    wall-clock time if it has a budget or reports its progress."""
+
+    def _run_monitored(self, budget, progress, progress_events,
+                       progress_interval):
+        """Step until an exception stops the run and check the *budget* and
+        the *progress* of the run after every block of events."""
+        step = self.step
+        block = progress_events or self.CHECK_EVENTS
+        start = last = perf_counter()
+        deadline = Infinity if budget is None else start + budget
+        events = last_events = 0
+        while True:
+            for _ in repeat(None, block):
+                step()
+            events += block
+            wall = perf_counter()
+            if progress is not None and (
+                    progress_events or wall - last >= progress_interval):
+                elapsed = wall - last
+                rate = ((events - last_events) / elapsed if elapsed > 0
+                        else Infinity)
+                progress(self.now, events, rate)
+                last, last_events = wall, events
+            if wall >= deadline:
+                raise BudgetExceeded('Wall-clock budget of %s s exceeded at '
+                                     'simulation time %s.' %
+                                     (budget, self.now))
 
     def exit(self, value=None):
         """Stop the current process, optionally providing a ``value``.
@@ -162,15 +249,62 @@ class Environment(BaseEnvironment):
     You can provide an *initial_time* for the environment. By default, it
     starts at ``0``.
 
+    Scheduled events are kept in an event queue of type *event_queue*, which
+    defaults to :attr:`EventQueue`. See :mod:`simpy.queues` for the available
+    backends. All backends process events in the same order.
+
+    Events that are due at the current simulation time with the priority
+    :data:`~simpy.events.URGENT` or :data:`~simpy.events.NORMAL` bypass the
+    event queue. They are kept in one FIFO lane per priority, which makes
+    scheduling them a constant time operation.
+
+    If *inline_limit* is greater than ``0``, a process that yields an event
+    which has already been triggered successfully (for example
+    a :class:`~simpy.resources.store.StoreGet` for a non-empty store or
+    a :class:`~simpy.resources.resource.Request` for a free resource) is
+    resumed immediately instead of after the event has been processed. At
+    most *inline_limit* events are resumed inline in a row before the process
+    waits for the event as usual, which gives other events a chance to run.
+    See :attr:`inline_limit` for the consequences on the order of events.
+
+    Cancelled events (see :meth:`~simpy.events.Event.cancel()`) are removed
+    lazily: they are skipped when they reach the front of the queue. Once
+    more than :attr:`COMPACT_MIN` entries and more than the fraction
+    :attr:`COMPACT_FRACTION` of all scheduled events (including the events
+    due now) are cancelled, all cancelled entries are removed at once.
+
     This class also provides aliases for common event types, for example
     :attr:`process`, :attr:`timeout` and :attr:`event`.
 
     """
-    def __init__(self, initial_time=0):
+    EventQueue = HeapQueue
+    """The default type of the event queue. See :mod:`simpy.queues` for
+    details."""
+
+    COMPACT_FRACTION = 0.5
+    """Fraction of cancelled entries in the event queue that triggers
+    a compaction."""
+
+    COMPACT_MIN = 64
+    """Minimum number of cancelled entries for a compaction."""
+
+    def __init__(self, initial_time=0, event_queue=None, inline_limit=0):
+        if inline_limit < 0:
+            raise ValueError('inline_limit(=%s) must be >= 0.' % inline_limit)
         self._now = initial_time
-        self._queue = []  # The list of all currently scheduled events.
+        # The queue of all currently scheduled events.
+        self._queue = (event_queue or self.EventQueue)()
+        self._push = self._queue.push
+        self._pop = self._queue.pop
+        self._peek = self._queue.peek
+        # FIFO lanes for events due now, indexed by priority.
+        self._lanes = (deque(), deque())
         self._eid = count()  # Counter for event IDs
         self._active_proc = None
+        self._inline_limit = inline_limit
+        self._dead = 0  # Cancelled events that are still scheduled
+        self._ncancelled = 0  # Number of cancelled events
+        self._ncompactions = 0  # Number of compactions of the event queue
 
         # Bind all BoundClass instances to "self" to improve performance.
         BoundClass.bind_early(self)
@@ -185,6 +319,29 @@ class Environment(BaseEnvironment):
         """The currently active process of the environment."""
         return self._active_proc
 
+    @property
+    def inline_limit(self):
+        """Maximum number of already triggered events a process is resumed
+        with in a row without waiting for them to be processed. ``0`` disables
+        inline resumption.
+
+        Inline resumption changes the order of events only at the current
+        simulation time:
+
+        - The process continues before events that are due at the same time
+          but were scheduled earlier. Simulation time never advances and
+          events with a delay (like timeouts) are never resumed inline.
+
+        - The process continues before the remaining callbacks of the event
+          (e.g. a resource trying to serve the next request) are invoked. The
+          event itself is still processed as usual.
+
+        - Only successful events are resumed inline. Failed events and
+          conditions always take the normal path.
+
+        """
+        return self._inline_limit
+
     process = BoundClass(Process)
     timeout = BoundClass(Timeout)
     event = BoundClass(Event)
@@ -193,31 +350,143 @@ class Environment(BaseEnvironment):
 
     def schedule(self, event, priority=NORMAL, delay=0):
         """Schedule an *event* with a given *priority* and a *delay*."""
-        heappush(self._queue,
-                 (self._now + delay, priority, next(self._eid), event))
+        at = self._now + delay
+        if at == self._now and (priority == NORMAL or priority == URGENT):
+            # The event is due now. Append it to the lane of its priority. An
+            # event ID is drawn nevertheless, so that IDs keep counting all
+            # scheduled events.
+            next(self._eid)
+            self._lanes[priority].append(event)
+        else:
+            self._push((at, priority, next(self._eid), event))
+
+    def schedule_many(self, events, times, priority=NORMAL):
+        """Schedule each of the *events* with the given *priority* at the
+        corresponding absolute simulation time in *times*.
+
+        The events must have been triggered (i.e. their value must have been
+        set) like for :meth:`schedule()`. Event IDs are drawn in the order of
+        *events*, so events at the same time and priority are processed in
+        that order. All future events are inserted into the event queue at
+        once (see :meth:`simpy.queues.EventQueue.push_many()`), which is
+        faster than scheduling them one by one.
+
+        Raise a :exc:`ValueError` if the lengths of *events* and *times* differ
+        or if a time lies in the past.
+
+        """
+        if len(events) != len(times):
+            raise ValueError('Got %d events but %d times.' %
+                             (len(events), len(times)))
+        now = self._now
+        if len(times) and min(times) < now:
+            raise ValueError('Time %s lies before the current time %s.' %
+                             (min(times), now))
+        eid = self._eid
+        lane = (self._lanes[priority]
+                if priority == NORMAL or priority == URGENT else None)
+        items = []
+        for event, at in zip(events, times):
+            if at == now and lane is not None:
+                next(eid)
+                lane.append(event)
+            else:
+                items.append((at, priority, next(eid), event))
+        self._queue.push_many(items)
 
     def peek(self):
         """Get the time of the next scheduled event. Return
         :data:`~simpy.core.Infinity` if there is no further event."""
+        if self._dead:
+            self._drop_cancelled()
+        if self._lanes[URGENT] or self._lanes[NORMAL]:
+            return self._now
         try:
-            return self._queue[0][0]
+            return self._peek()[0]
         except IndexError:
             return Infinity
 
+    def _drop_cancelled(self):
+        """Remove cancelled events from the heads of the lanes and the event
+        queue."""
+        for lane in self._lanes:
+            while lane and lane[0]._callbacks is CANCELLED:
+                lane.popleft()
+                self._dead -= 1
+        while self._dead:
+            try:
+                event = self._peek()[3]
+            except IndexError:
+                break
+            if event._callbacks is not CANCELLED:
+                break
+            self._pop()
+            self._dead -= 1
+
+    def _cancel(self, event):
+        """Account for the cancelled *event* and compact the event queue if
+        too many of its entries are cancelled."""
+        self._ncancelled += 1
+        self._dead += 1
+        if self._dead > self.COMPACT_MIN:
+            urgent, normal = self._lanes
+            scheduled = len(self._queue) + len(urgent) + len(normal)
+            if self._dead > self.COMPACT_FRACTION * scheduled:
+                self._compact()
+
+    def _compact(self):
+        """Remove all cancelled events from the event queue and the lanes."""
+        self._queue.remove_if(lambda item: item[3]._callbacks is CANCELLED)
+        for lane in self._lanes:
+            live = [event for event in lane if event._callbacks is not CANCELLED]
+            if len(live) < len(lane):
+                # Refill the lane in place, step() may hold a reference.
+                lane.clear()
+                lane.extend(live)
+        self._dead = 0
+        self._ncompactions += 1
+
     def step(self):
         """Process the next event.
 
         Raise an :exc:`EmptySchedule` if no further events are available.
 
         """
-        try:
-            self._now, _, _, event = heappop(self._queue)
-        except IndexError:
-            raise EmptySchedule()
+        urgent, normal = self._lanes
+        while True:
+            lane = urgent or normal
+            if lane:
+                # Events in the event queue that are due now with the same or
+                # a higher priority have been scheduled before the events in
+                # the lane and must be processed first.
+                priority = URGENT if lane is urgent else NORMAL
+                try:
+                    at, prio, _, _ = self._peek()
+                except IndexError:
+                    event = lane.popleft()
+                else:
+                    if at == self._now and prio <= priority:
+                        _, _, _, event = self._pop()
+                    else:
+                        event = lane.popleft()
+                at = self._now
+            else:
+                try:
+                    at, _, _, event = self._pop()
+                except IndexError:
+                    raise EmptySchedule()
+
+            callbacks = event._callbacks
+            if callbacks is not CANCELLED:
+                break
+            # Skip the cancelled event without advancing the time.
+            self._dead -= 1
+
+        self._now = at
 
         # Process callbacks of the event. Set the events callbacks to None
         # immediately to prevent concurrent modifications.
-        callbacks, event.callbacks = event.callbacks, None
+        event._callbacks = None
         for callback in callbacks:
             callback(event)
 
@@ -9,10 +9,14 @@ used, there are several specialized subclasses of it.
     ~simpy.events.Event
     ~simpy.events.Timeout
     ~simpy.events.Process
+    ~simpy.events.Actor
+    ~simpy.events.CountdownEvent
     ~simpy.events.AnyOf
     ~simpy.events.AllOf
 
 """
+from numbers import Real
+
 from ._compat import PY2
 from .exceptions import Interrupt, StopProcess
 
@@ -23,11 +27,29 @@ if PY2:
 PENDING = object()
 """Unique object to identify pending values of events."""
 
+NO_CALLBACKS = ()
+"""Placeholder for the callbacks of an event nobody has subscribed to yet.
+The callback list is only created once it is needed."""
+
+class _Cancelled(tuple):
+    """Type of :data:`CANCELLED`, an empty tuple with its own identity."""
+    __slots__ = ()
+
+
+CANCELLED = _Cancelled()
+"""Placeholder for the callbacks of a cancelled event (see
+:meth:`Event.cancel()`). The environment skips such events."""
+
 URGENT = 0
 """Priority of interrupts and process initialization events."""
 NORMAL = 1
 """Default priority used by events."""
 
+DELAY_TYPES = (float, int)
+"""Types of the values a process can yield to wait for a delay (see
+:class:`Process`). Other :class:`numbers.Real` types are accepted, too, but
+are detected more slowly."""
+
 
 class Event(object):
     """An event that may happen at some point in time.
@@ -48,6 +70,7 @@ class Event(object):
     Once an event gets processed, all callbacks will be invoked with the event
     as the single argument. Callbacks can check if the event was successful by
     examining *ok* and do further processing with the *value* it has produced.
+    The list is only created when a callback is added.
 
     Failed events are never silently ignored and will raise an exception upon
     being processed. If a callback handles an exception, it must set
@@ -59,11 +82,16 @@ class Event(object):
     of them.
 
     """
+    __slots__ = ('env', '_callbacks', '_value', '_ok', '_defused')
+
+    _inline = True
+    """Whether a process may be resumed with this event as soon as it is
+    triggered (see :attr:`~simpy.core.Environment.inline_limit`)."""
+
     def __init__(self, env):
         self.env = env
         """The :class:`~simpy.core.Environment` the event lives in."""
-        self.callbacks = []
-        """List of functions that are called when the event is processed."""
+        self._callbacks = NO_CALLBACKS
         self._value = PENDING
 
     def __repr__(self):
@@ -75,6 +103,18 @@ class Event(object):
         """Return a string *Event()*."""
         return '%s()' % self.__class__.__name__
 
+    @property
+    def callbacks(self):
+        """List of functions that are called when the event is processed.
+        Becomes ``None`` once the event has been processed."""
+        if self._callbacks is NO_CALLBACKS:
+            self._callbacks = []
+        return self._callbacks
+
+    @callbacks.setter
+    def callbacks(self, callbacks):
+        self._callbacks = callbacks
+
     @property
     def triggered(self):
         """Becomes ``True`` if the event has been triggered and its callbacks
@@ -85,7 +125,7 @@ class Event(object):
     def processed(self):
         """Becomes ``True`` if the event has been processed (e.g., its
         callbacks have been invoked)."""
-        return self.callbacks is None
+        return self._callbacks is None
 
     @property
     def ok(self):
@@ -177,6 +217,31 @@ class Event(object):
         self.env.schedule(self)
         return self
 
+    def cancel(self):
+        """Cancel the event. It stays in the event queue of the environment
+        but is skipped instead of being processed, so that its callbacks are
+        never invoked and the simulation time does not advance to it.
+
+        Cancel events that nobody waits for anymore, e.g. the timeout of an
+        interrupted process. Cancelling an event twice has no effect.
+        Resource events (requests, puts and gets) override this method to
+        withdraw an untriggered request from the resource instead.
+
+        Raise a :exc:`RuntimeError` if the event has not been triggered yet
+        or has already been processed.
+
+        """
+        callbacks = self._callbacks
+        if callbacks is CANCELLED:
+            return
+        if self._value is PENDING:
+            raise RuntimeError('%s has not been triggered and cannot be '
+                               'cancelled' % self)
+        if callbacks is None:
+            raise RuntimeError('%s has already been processed' % self)
+        self._callbacks = CANCELLED
+        self.env._cancel(self)
+
     def __and__(self, other):
         """Return a :class:`~simpy.events.Condition` that will be triggered if
         both, this event and *other*, have been processed."""
@@ -196,13 +261,19 @@ class Timeout(Event):
     This event is automatically triggered when it is created.
 
     """
+    __slots__ = ('_delay',)
+
+    # A timeout is triggered upon creation, but must not be resumed before its
+    # delay has passed.
+    _inline = False
+
     def __init__(self, env, delay, value=None):
         if delay < 0:
             raise ValueError('Negative delay %s' % delay)
         # NOTE: The following initialization code is inlined from
         # Event.__init__() for performance reasons.
         self.env = env
-        self.callbacks = []
+        self._callbacks = NO_CALLBACKS
         self._value = value
         self._delay = delay
         self._ok = True
@@ -221,11 +292,13 @@ class Initialize(Event):
     This event is automatically triggered when it is created.
 
     """
+    __slots__ = ()
+
     def __init__(self, env, process):
         # NOTE: The following initialization code is inlined from
         # Event.__init__() for performance reasons.
         self.env = env
-        self.callbacks = [process._resume]
+        self._callbacks = [process._resume]
         self._value = None
 
         # The initialization events needs to be scheduled as urgent so that it
@@ -242,11 +315,13 @@ class Interruption(Event):
     This event is automatically triggered when it is created.
 
     """
+    __slots__ = ('process',)
+
     def __init__(self, process, cause):
         # NOTE: The following initialization code is inlined from
         # Event.__init__() for performance reasons.
         self.env = process.env
-        self.callbacks = [self._interrupt]
+        self._callbacks = [self._interrupt]
         self._value = Interrupt(cause)
         self._ok = False
         self._defused = True
@@ -270,11 +345,40 @@ class Interruption(Event):
 
         # A process never expects an interrupt and is always waiting for a
         # target event. Remove the process from the callbacks of the target.
-        self.process._target.callbacks.remove(self.process._resume)
+        target = self.process._target
+        if target is self.process._wakeup:
+            # The process is waiting for a delay. Cancel the wakeup, which
+            # stays in the event queue, and use a new one for the next delay.
+            target.cancel()
+            self.process._wakeup = None
+        else:
+            target._callbacks.remove(self.process._resume)
 
         self.process._resume(self)
 
 
+class Wakeup(Event):
+    """Internal event that invokes *callback* after a delay, e.g. to resume
+    a process that has yielded a plain number.
+
+    Each process (or :class:`Actor`) reuses a single wakeup for all of its
+    delays, so that waiting for a delay creates no new objects.
+
+    """
+    __slots__ = ('_armed',)
+
+    # An armed wakeup looks triggered, but must not be resumed before its
+    # delay has passed.
+    _inline = False
+
+    def __init__(self, env, callback):
+        self.env = env
+        self._armed = (callback,)
+        self._callbacks = self._armed
+        self._value = None
+        self._ok = True
+
+
 class Process(Event):
     """Process an event yielding generator.
 
@@ -293,9 +397,15 @@ class Process(Event):
        generators. You can use :meth:~simpy.core.Environment.exit() as
        a workaround.
 
+    Instead of an event, a process can also yield a number (e.g. ``yield
+    2.5``) to wait for this delay. This is a faster equivalent of ``yield
+    env.timeout(2.5)`` for timeouts that no other process waits for.
+
     Processes can be interrupted during their execution by :meth:`interrupt`.
 
     """
+    __slots__ = ('_generator', '_target', '_wakeup')
+
     def __init__(self, env, generator):
         if not hasattr(generator, 'throw'):
             # Implementation note: Python implementations differ in the
@@ -312,10 +422,11 @@ class Process(Event):
         # NOTE: The following initialization code is inlined from
         # Event.__init__() for performance reasons.
         self.env = env
-        self.callbacks = []
+        self._callbacks = NO_CALLBACKS
         self._value = PENDING
 
         self._generator = generator
+        self._wakeup = None
 
         # Schedule the start of the execution of the process.
         self._target = Initialize(env, self)
@@ -329,7 +440,8 @@ class Process(Event):
         """The event that the process is currently waiting for.
 
         Returns ``None`` if the process is dead or it is currently being
-        interrupted.
+        interrupted. If the process waits for a delay, this is an internal
+        :class:`Wakeup` event, which other processes cannot wait for.
 
         """
         return self._target
@@ -355,6 +467,7 @@ class Process(Event):
         the return value or the exception of the generator."""
         # Mark the current process as active.
         self.env._active_proc = self
+        inline = self.env._inline_limit
 
         while True:
             # Get next event from process
@@ -394,19 +507,52 @@ class Process(Event):
                 self.env.schedule(self)
                 break
 
+            if type(event) in DELAY_TYPES:
+                # Process returned a delay to wait for.
+                event = self._sleep(event)
+                if event._ok:
+                    break
+                continue
+
             # Process returned another event to wait upon.
             try:
                 # Be optimistic and blindly access the callbacks attribute.
-                if event.callbacks is not None:
+                callbacks = event._callbacks
+                if callbacks is not None:
+                    if (inline and event._value is not PENDING and
+                            event._ok and event._inline and
+                            callbacks is not CANCELLED):
+                        # The event has already been triggered. Resume the
+                        # process immediately.
+                        inline -= 1
+                        continue
+
                     # The event has not yet been triggered. Register callback
                     # to resume the process if that happens.
-                    event.callbacks.append(self._resume)
+                    if callbacks is NO_CALLBACKS:
+                        event._callbacks = [self._resume]
+                    else:
+                        callbacks.append(self._resume)
                     break
             except AttributeError:
+                if isinstance(event, Real) and not isinstance(event, bool):
+                    # A delay of a less common numeric type.
+                    event = self._sleep(event)
+                    if event._ok:
+                        break
+                    continue
+
                 # Our optimism didn't work out, figure out what went wrong and
                 # inform the user.
-                if not hasattr(event, 'callbacks'):
+                if not hasattr(event, '_callbacks'):
                     msg = 'Invalid yield value "%s"' % event
+                elif event._callbacks is CANCELLED:
+                    msg = 'Cannot wait for the cancelled event %s' % event
+                elif isinstance(event, Wakeup):
+                    msg = ('Cannot wait for the internal wakeup %s of a process '
+                           'that waits for a delay' % event)
+                else:
+                    msg = 'Cannot wait for the event %s' % event
 
                 descr = _describe_frame(self._generator.gi_frame)
                 error = RuntimeError('\n%s%s' % (descr, msg))
@@ -417,6 +563,170 @@ class Process(Event):
         self._target = event
         self.env._active_proc = None
 
+    def _sleep(self, delay):
+        """Schedule the resumption of the process after *delay* and return
+        the event the process is waiting for. For a negative *delay*, return
+        a failed event with a :exc:`ValueError` instead."""
+        if delay < 0:
+            event = Event(self.env)
+            event._ok = False
+            event._value = ValueError('Negative delay %s' % delay)
+            return event
+
+        wakeup = self._wakeup
+        if wakeup is None:
+            wakeup = self._wakeup = Wakeup(self.env, self._resume)
+        else:
+            wakeup._callbacks = wakeup._armed
+        self.env.schedule(wakeup, NORMAL, delay)
+        return wakeup
+
+
+class Actor(Event):
+    """Lightweight alternative to a :class:`Process` for short-lived model
+    entities, implemented as a state machine driven by callbacks instead of
+    a generator.
+
+    Subclasses implement :meth:`start()`, which is called after the actor has
+    been created (at the same point in time and with the same priority as
+    a process would start). Each state is a method that registers the next
+    state as a callback with :meth:`wait()`, :meth:`request()` or
+    :meth:`sleep()`.
+
+    ``Actor`` itself is an event, too. The actor signals its completion by
+    triggering itself, usually with :meth:`succeed()`.
+
+    Unlike processes, actors cannot be interrupted. An exception raised by
+    a state propagates out of :meth:`~simpy.core.Environment.step()`.
+
+    """
+    __slots__ = ('_wakeup',)
+
+    def __init__(self, env):
+        # NOTE: The following initialization code is inlined from
+        # Event.__init__() for performance reasons.
+        self.env = env
+        self._callbacks = NO_CALLBACKS
+        self._value = PENDING
+
+        # Schedule the start of the actor.
+        self._wakeup = Wakeup(env, self._start)
+        env.schedule(self._wakeup, URGENT)
+
+    def _start(self, event):
+        self.start()
+
+    def start(self):
+        """Enter the initial state of the actor."""
+        raise NotImplementedError(self)
+
+    def wait(self, event, callback):
+        """Call *callback* with *event* once *event* has been processed or
+        immediately if it already has been.
+
+        If *event* fails, *callback* must set :attr:`Event.defused` or the
+        simulation crashes like for any other failed event.
+
+        Raise a :exc:`RuntimeError` if *event* has been cancelled or is the
+        internal wakeup of a sleeping process or actor.
+
+        """
+        callbacks = event._callbacks
+        if callbacks is NO_CALLBACKS:
+            event._callbacks = [callback]
+        elif callbacks is None:
+            callback(event)
+        else:
+            try:
+                callbacks.append(callback)
+            except AttributeError:
+                if callbacks is CANCELLED:
+                    raise RuntimeError('Cannot wait for the cancelled event '
+                                       '%s' % event)
+                raise RuntimeError('Cannot wait for the internal wakeup %s '
+                                   'of a sleeping process or actor' % event)
+
+    def request(self, resource, callback):
+        """Request *resource* and call *callback* with the request once it
+        has been granted. Return the request, which must eventually be
+        released with ``resource.release(request)``."""
+        request = resource.request()
+        self.wait(request, callback)
+        return request
+
+    def sleep(self, delay, callback):
+        """Call *callback* after *delay*. The callback receives an internal
+        :class:`Wakeup` event.
+
+        An actor can only sleep once at a time. Raise a :exc:`RuntimeError` if
+        it is already sleeping (or has not started yet) and
+        a :exc:`ValueError` if ``delay < 0``.
+
+        """
+        if delay < 0:
+            raise ValueError('Negative delay %s' % delay)
+        wakeup = self._wakeup
+        if wakeup._callbacks is not None:
+            raise RuntimeError('%s is already sleeping' % self)
+        wakeup._callbacks = (callback,)
+        self.env.schedule(wakeup, NORMAL, delay)
+
+
+class CountdownEvent(Event):
+    """A latch that succeeds once :meth:`count_down()` has been called *count*
+    times, e.g. to wait for a number of parallel activities to complete.
+
+    Unlike an :class:`AllOf` condition, the latch neither needs an event per
+    activity nor keeps track of the individual activities. Each completion
+    costs a single decrement. A latch with a *count* of ``0`` succeeds
+    immediately.
+
+    Raise a :exc:`ValueError` if ``count < 0``.
+
+    """
+    __slots__ = ('_remaining',)
+
+    def __init__(self, env, count):
+        if count < 0:
+            raise ValueError('count(=%s) must be >= 0.' % count)
+        # NOTE: The following initialization code is inlined from
+        # Event.__init__() for performance reasons.
+        self.env = env
+        self._callbacks = NO_CALLBACKS
+        self._value = PENDING
+        self._remaining = count
+        if not count:
+            self.succeed()
+
+    def _desc(self):
+        """Return a string *CountdownEvent(remaining)*."""
+        return '%s(%s)' % (self.__class__.__name__, self._remaining)
+
+    @property
+    def remaining(self):
+        """Number of :meth:`count_down()` calls until the latch succeeds."""
+        return self._remaining
+
+    def count_down(self, event=None):
+        """Decrement the latch and succeed once it reaches zero.
+
+        The method can be used directly as the callback of an event. If this
+        *event* has failed, the latch fails with the exception of the event
+        (and the event is defused) unless it has already been triggered.
+
+        Raise a :exc:`RuntimeError` if the latch has already reached zero.
+
+        """
+        if not self._remaining:
+            raise RuntimeError('%s has already reached zero' % self)
+        self._remaining -= 1
+        if event is not None and not event._ok:
+            event._defused = True
+            if self._value is PENDING:
+                self.fail(event._value)
+        elif not self._remaining and self._value is PENDING:
+            self.succeed()
+
 
 class ConditionValue(object):
     """Result of a :class:`~simpy.events.Condition`. It supports convenient
@@ -481,6 +791,11 @@ class Condition(Event):
     Condition events can be nested.
 
     """
+    __slots__ = ('_evaluate', '_events', '_count')
+
+    # The value of a condition is only built when it is processed.
+    _inline = False
+
     def __init__(self, env, evaluate, events):
         super(Condition, self).__init__(env)
         self._evaluate = evaluate
@@ -501,7 +816,7 @@ class Condition(Event):
         # Check if the condition is met for each processed event. Attach
         # _check() as a callback otherwise.
         for event in self._events:
-            if event.callbacks is None:
+            if event._callbacks is None:
                 self._check(event)
             else:
                 event.callbacks.append(self._check)
@@ -522,7 +837,7 @@ class Condition(Event):
         for event in self._events:
             if isinstance(event, Condition):
                 event._populate_value(value)
-            elif event.callbacks is None:
+            elif event._callbacks is None:
                 value.events.append(event)
 
     def _build_value(self, event):
@@ -542,8 +857,8 @@ class Condition(Event):
 
         """
         for event in self._events:
-            if event.callbacks and self._check in event.callbacks:
-                event.callbacks.remove(self._check)
+            if event._callbacks and self._check in event._callbacks:
+                event._callbacks.remove(self._check)
             if isinstance(event, Condition):
                 event._remove_check_callbacks()
 
@@ -583,6 +898,8 @@ class AllOf(Condition):
     any of *events* failed.
 
     """
+    __slots__ = ()
+
     def __init__(self, env, events):
         super(AllOf, self).__init__(env, Condition.all_events, events)
 
@@ -593,6 +910,8 @@ class AnyOf(Condition):
     any of *events* failed.
 
     """
+    __slots__ = ()
+
     def __init__(self, env, events):
         super(AnyOf, self).__init__(env, Condition.any_events, events)
 
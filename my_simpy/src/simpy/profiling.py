@@ -0,0 +1,202 @@
+"""
+Instrumentation for finding out where the wall time of a simulation goes.
+
+.. autosummary::
+
+    ~simpy.profiling.Profiler
+
+"""
+try:
+    from time import perf_counter
+except ImportError:  # Python 2
+    from time import time as perf_counter
+
+from .core import EmptySchedule
+from .events import CANCELLED, NORMAL, URGENT
+
+
+def _instrumented(env):
+    """Return whether *env* uses an instrumented step(). Unlike looking for
+    ``step`` in ``env.__dict__``, this keeps the attributes of *env* in the
+    compact layout that CPython accesses fastest."""
+    return getattr(env.step, '__self__', None) is not env
+
+
+class Profiler(object):
+    """Collect statistics about the events processed by the
+    :class:`~simpy.core.Environment` *env*.
+
+    While the profiler is active (between :meth:`start()` and :meth:`stop()`
+    or within a :keyword:`with` block), the environment uses an instrumented
+    copy of :meth:`~simpy.core.Environment.step()`. The profiler records:
+
+    - the number of processed events and the wall time spent in their
+      callbacks per event type (see :attr:`events`),
+    - the number of callback invocations and their wall time per process
+      generator or, for other callbacks, per callback function (see
+      :attr:`callbacks`),
+    - the maximum number of scheduled events (see :attr:`max_queue_size`),
+    - the number of cancelled events and of compactions of the event queue
+      (see :attr:`cancelled` and :attr:`compactions`) and
+    - the ratio of simulated time to wall time (see :attr:`speed`).
+
+    The regular :meth:`~simpy.core.Environment.step()` is not modified, so
+    the profiler costs nothing while it is not active.
+
+    The instrumented step does not synchronize with the wall clock, so
+    a :class:`~simpy.rt.RealtimeEnvironment` runs as fast as possible while it
+    is profiled.
+
+    """
+    def __init__(self, env):
+        self.env = env
+        self.events = {}
+        """Map the name of an event type to a list ``[count, wall time]``."""
+        self.callbacks = {}
+        """Map the name of a process generator or a callback to a list
+        ``[count, wall time]``."""
+        self.max_queue_size = 0
+        """Maximum number of events that were scheduled at the same time."""
+        self.cancelled = 0
+        """Number of events that were cancelled."""
+        self.compactions = 0
+        """Number of compactions of the event queue."""
+        self.sim_time = 0
+        """Simulated time that passed while the profiler was active."""
+        self.wall_time = 0.0
+        """Wall time in seconds that passed while the profiler was active."""
+        self._started = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def speed(self):
+        """Simulated time per second of wall time."""
+        return self.sim_time / self.wall_time if self.wall_time else 0.0
+
+    def start(self):
+        """Start to profile the environment. Raise a :exc:`RuntimeError` if
+        the environment is already profiled."""
+        if _instrumented(self.env):
+            raise RuntimeError('%s is already profiled.' % self.env)
+        self._started = (self.env.now, perf_counter(), self.env._ncancelled,
+                         self.env._ncompactions)
+        self.env.step = self._step
+
+    def stop(self):
+        """Stop to profile the environment."""
+        if self._started is None:
+            return
+        del self.env.step
+        now, wall, cancelled, compactions = self._started
+        self.sim_time += self.env.now - now
+        self.wall_time += perf_counter() - wall
+        self.cancelled += self.env._ncancelled - cancelled
+        self.compactions += self.env._ncompactions - compactions
+        self._started = None
+
+    def _step(self):
+        """Instrumented copy of :meth:`simpy.core.Environment.step()`."""
+        env = self.env
+        urgent, normal = env._lanes
+        size = len(env._queue) + len(urgent) + len(normal)
+        if size > self.max_queue_size:
+            self.max_queue_size = size
+
+        while True:
+            lane = urgent or normal
+            if lane:
+                priority = URGENT if lane is urgent else NORMAL
+                try:
+                    at, prio, _, _ = env._peek()
+                except IndexError:
+                    event = lane.popleft()
+                else:
+                    if at == env._now and prio <= priority:
+                        _, _, _, event = env._pop()
+                    else:
+                        event = lane.popleft()
+                at = env._now
+            else:
+                try:
+                    at, _, _, event = env._pop()
+                except IndexError:
+                    raise EmptySchedule()
+
+            callbacks = event._callbacks
+            if callbacks is not CANCELLED:
+                break
+            env._dead -= 1
+
+        env._now = at
+        event._callbacks = None
+        stats = self.callbacks
+        total = 0.0
+        for callback in callbacks:
+            start = perf_counter()
+            callback(event)
+            duration = perf_counter() - start
+            total += duration
+            name = self._name(callback)
+            try:
+                entry = stats[name]
+            except KeyError:
+                entry = stats[name] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += duration
+
+        name = type(event).__name__
+        try:
+            entry = self.events[name]
+        except KeyError:
+            entry = self.events[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += total
+
+        if not event._ok and not hasattr(event, '_defused'):
+            exc = type(event._value)(*event._value.args)
+            exc.__cause__ = event._value
+            raise exc
+
+    @staticmethod
+    def _name(callback):
+        """Return the name of the process generator resumed by *callback* or
+        else the name of *callback* itself. Methods are named after the type
+        of their instance."""
+        owner = getattr(callback, '__self__', None)
+        if owner is None:
+            return getattr(callback, '__qualname__',
+                           getattr(callback, '__name__', repr(callback)))
+        generator = getattr(owner, '_generator', None)
+        if generator is not None:
+            return getattr(generator, '__qualname__', generator.__name__)
+        return '%s.%s' % (type(owner).__name__, callback.__name__)
+
+    def report(self, limit=20):
+        """Return a summary table of the collected statistics. Only the
+        *limit* entries with the most wall time are listed per table."""
+        lines = [
+            'Simulated time: %s, wall time: %.3f s, speed: %.1f time units '
+            'per second' % (self.sim_time, self.wall_time, self.speed),
+            'Max. scheduled events: %d' % self.max_queue_size,
+            'Cancelled events: %d, compactions: %d' % (self.cancelled,
+                                                      self.compactions),
+        ]
+        for title, stats in (('Event type', self.events),
+                             ('Process / callback', self.callbacks)):
+            width = max([len(title)] + [len(name) for name in stats])
+            lines.append('')
+            lines.append('%-*s %10s %10s %14s' % (
+                width, title, 'count', 'wall [s]', 'per call [us]'))
+            entries = sorted(stats.items(), key=lambda item: -item[1][1])
+            for name, (count, wall) in entries[:limit]:
+                lines.append('%-*s %10d %10.3f %14.2f' % (
+                    width, name, count, wall, 1e6 * wall / count))
+            if len(entries) > limit:
+                lines.append('... %d more' % (len(entries) - limit))
+        return '\n'.join(lines)
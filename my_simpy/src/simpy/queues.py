@@ -0,0 +1,250 @@
+"""
+Event queue backends for :class:`~simpy.core.Environment`.
+
+An environment keeps all scheduled events in an event queue. Each entry of
+the queue is a tuple ``(time, priority, event_id, event)`` and entries are
+retrieved in ascending order of these tuples, i.e. ordered by time, then by
+priority and finally by the (unique) event ID.
+
+.. autosummary::
+
+    ~simpy.queues.EventQueue
+    ~simpy.queues.HeapQueue
+    ~simpy.queues.CalendarQueue
+
+"""
+from functools import partial
+from heapq import heapify, heappush, heappop, nsmallest
+from operator import getitem
+
+
+class EventQueue(object):
+    """Base class for event queue backends.
+
+    An implementation must provide :meth:`push()` to insert an entry,
+    :meth:`pop()` to remove and return the smallest entry and :meth:`peek()`
+    to return the smallest entry without removing it. :meth:`pop()` and
+    :meth:`peek()` raise an :exc:`IndexError` if the queue is empty.
+
+    Entries are never pushed with a time that is smaller than the time of the
+    last popped entry, because the simulation time cannot go backwards.
+
+    """
+    def __len__(self):
+        raise NotImplementedError(self)
+
+    def push(self, item):
+        """Insert *item* into the queue."""
+        raise NotImplementedError(self)
+
+    def push_many(self, items):
+        """Insert all *items* into the queue. Backends may override this with
+        a faster bulk insertion."""
+        push = self.push
+        for item in items:
+            push(item)
+
+    def remove_if(self, predicate):
+        """Remove all items for which *predicate(item)* is true."""
+        raise NotImplementedError(self)
+
+    def pop(self):
+        """Remove and return the smallest item of the queue."""
+        raise NotImplementedError(self)
+
+    def peek(self):
+        """Return the smallest item of the queue without removing it."""
+        raise NotImplementedError(self)
+
+
+class HeapQueue(EventQueue):
+    """Binary heap event queue based on :mod:`heapq`. This is the default
+    backend of :class:`~simpy.core.Environment`.
+
+    """
+    def __init__(self):
+        self._heap = []
+        # Bind the heapq functions to the heap to save a Python level call for
+        # every push, pop and peek.
+        self.push = partial(heappush, self._heap)
+        self.pop = partial(heappop, self._heap)
+        self.peek = partial(getitem, self._heap, 0)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push_many(self, items):
+        """Insert all *items*. Large blocks are appended and the heap is
+        rebuilt with a single :func:`heapq.heapify` in linear time, small
+        blocks are pushed one by one."""
+        heap = self._heap
+        if 4 * len(items) >= len(heap):
+            heap.extend(items)
+            heapify(heap)
+        else:
+            for item in items:
+                heappush(heap, item)
+
+    def remove_if(self, predicate):
+        # Filter in place, the bound heapq functions refer to this list.
+        heap = self._heap
+        heap[:] = [item for item in heap if not predicate(item)]
+        heapify(heap)
+
+
+class CalendarQueue(EventQueue):
+    """Calendar queue (R. Brown, 1988) which sorts entries into buckets of
+    a fixed time *width*.
+
+    The buckets form a "year" that is scanned in a round-robin fashion, so
+    that push and pop take constant time on average if the bucket width
+    matches the typical distance between scheduled events. The number of
+    buckets and their width are adapted to the queue size and the event time
+    distribution as the queue grows and shrinks. Each bucket is a small
+    :mod:`heapq` heap, so that its smallest entry is removed without moving
+    the others.
+
+    Unlike the operations of a :class:`HeapQueue`, push and pop are Python
+    methods. The calendar therefore only pays off for queues of about
+    :math:`10^5` entries and more, where the heap operations take longer.
+
+    Entries with an infinite time are kept apart and are only returned once
+    all finite entries have been popped.
+
+    """
+    MIN_BUCKETS = 16
+    """The calendar never shrinks below this number of buckets."""
+
+    SAMPLE_SIZE = 25
+    """Number of entries sampled to estimate a new bucket width on resize."""
+
+    def __init__(self, width=1.0):
+        if width <= 0:
+            raise ValueError('width(=%s) must be > 0.' % width)
+        self._width = float(width)
+        self._size = 0
+        # Number of the (virtual) bucket where the scan for the next entry
+        # starts. Bucket *n* holds all entries with ``n <= t // width < n + 1``
+        # and is stored at index ``n % nbuckets``.
+        self._cursor = 0
+        self._far = []  # Heap of the entries with an infinite time.
+        self._setup(self.MIN_BUCKETS)
+        self._move(0)
+
+    def __len__(self):
+        return self._size + len(self._far)
+
+    @property
+    def width(self):
+        """The current width of a bucket."""
+        return self._width
+
+    @property
+    def nbuckets(self):
+        """The current number of buckets."""
+        return self._nbuckets
+
+    def push(self, item):
+        try:
+            n = int(item[0] // self._width)
+        except (OverflowError, ValueError):  # The time is infinite.
+            heappush(self._far, item)
+            return
+
+        heappush(self._buckets[n % self._nbuckets], item)
+        self._size += 1
+        if n < self._cursor:
+            # The item precedes the current scan position (possible after
+            # a peek() that moved the cursor ahead).
+            self._move(n)
+        if self._size > self._grow_at:
+            self._resize(2 * self._nbuckets)
+
+    def remove_if(self, predicate):
+        # The calendar shrinks with the next pop() if it has become too
+        # sparse.
+        for bucket in self._buckets:
+            bucket[:] = [item for item in bucket if not predicate(item)]
+            heapify(bucket)
+        self._far[:] = [item for item in self._far if not predicate(item)]
+        heapify(self._far)
+        self._size = sum(len(bucket) for bucket in self._buckets)
+
+    def pop(self):
+        # Most of the time, the next entry is in the bucket of the cursor.
+        bucket = self._current
+        if not bucket or bucket[0][0] >= self._end:
+            bucket = self._find()
+            if bucket is self._far:
+                return heappop(bucket)
+
+        self._size -= 1
+        if self._size < self._shrink_at:
+            item = heappop(bucket)
+            self._resize(self._nbuckets // 2)
+            return item
+        return heappop(bucket)
+
+    def peek(self):
+        return self._find()[0]
+
+    def _find(self):
+        """Return the bucket holding the smallest entry and move the cursor to
+        it. Raise an :exc:`IndexError` if the queue is empty."""
+        if not self._size:
+            if self._far:
+                return self._far
+            raise IndexError('The calendar queue is empty.')
+
+        buckets, nbuckets, width = self._buckets, self._nbuckets, self._width
+        cursor = self._cursor
+        for cursor in range(cursor, cursor + nbuckets):
+            bucket = buckets[cursor % nbuckets]
+            if bucket and bucket[0][0] // width <= cursor:
+                self._move(cursor)
+                return bucket
+
+        # There is no entry within the next year. Jump directly to the bucket
+        # with the smallest entry.
+        bucket = min((bucket for bucket in buckets if bucket),
+                     key=lambda bucket: bucket[0])
+        self._move(int(bucket[0][0] // width))
+        return bucket
+
+    def _move(self, cursor):
+        """Move the scan position to the (virtual) bucket *cursor*."""
+        self._cursor = cursor
+        self._current = self._buckets[cursor % self._nbuckets]
+        # The entries of the bucket that are due in this year lie before its
+        # end.
+        self._end = (cursor + 1) * self._width
+
+    def _setup(self, nbuckets):
+        """Create *nbuckets* empty buckets and the size limits at which they
+        are resized."""
+        self._nbuckets = nbuckets
+        self._buckets = [[] for _ in range(nbuckets)]
+        self._grow_at = 2 * nbuckets
+        self._shrink_at = (nbuckets // 2 if nbuckets > self.MIN_BUCKETS
+                           else 0)
+
+    def _resize(self, nbuckets):
+        """Redistribute all entries into *nbuckets* buckets with a width
+        estimated from the smallest entries in the queue."""
+        items = [item for bucket in self._buckets for item in bucket]
+        sample = [item[0] for item in nsmallest(self.SAMPLE_SIZE, items)]
+        gaps = [b - a for a, b in zip(sample, sample[1:]) if b > a]
+        if gaps:
+            # Brown suggests a width of about three times the average
+            # separation of consecutive events for sorted buckets. Heaps keep
+            # larger buckets cheap, and wider buckets mean fewer empty ones
+            # to scan.
+            self._width = 12.0 * sum(gaps) / len(gaps)
+
+        self._setup(nbuckets)
+        buckets, width = self._buckets, self._width
+        for item in items:
+            buckets[int(item[0] // width) % nbuckets].append(item)
+        for bucket in buckets:
+            heapify(bucket)
+        self._move(int(sample[0] // width) if sample else self._cursor)
@@ -14,4 +14,7 @@ They are derived from the base classes defined in the
 :mod:`~simpy.resources.base` module. These classes are also meant to support
 the implementation of custom resource types.
 
+Stores and resources can collect time-weighted statistics of their queues,
+see :mod:`~simpy.resources.stats`.
+
 """
@@ -6,6 +6,8 @@ Base classes of for SimPy's shared resource types.
 These events are triggered once the request has been completed.
 
 """
+from collections import deque
+
 from ..core import BoundClass
 from ..events import Event, Interrupt
 
@@ -23,13 +25,15 @@ class Put(Event):
             yield request
 
     """
+    __slots__ = ('resource', 'proc')
+
     def __init__(self, resource):
         super(Put, self).__init__(resource._env)
         self.resource = resource
         self.proc = self.env.active_process
 
         resource.put_queue.append(self)
-        self.callbacks.append(resource._trigger_get)
+        self._callbacks = [resource._trigger_get]
         resource._trigger_put(None)
 
     def __enter__(self):
@@ -51,18 +55,23 @@ class Put(Event):
         """
         if not self.triggered:
             self.resource.put_queue.remove(self)
+            if self.resource.stats is not None:
+                self.resource.stats.update()
 
 class FiniteCapacityPut(Event):
+    __slots__ = ('resource', 'proc')
+
     def __init__(self, resource):
         super(FiniteCapacityPut, self).__init__(resource._env)
         self.resource = resource
         self.proc = self.env.active_process
 
-        if self.resource.currentQDepth() > self.resource.maxQDepth:
+        if resource.queueFull():
+            resource.rejections += 1
             self.fail(Interrupt('maxQDepthExceeded'))
         else:
             resource.put_queue.append(self)
-            self.callbacks.append(resource._trigger_get)
+            self._callbacks = [resource._trigger_get]
             resource._trigger_put(None)
 
     def __enter__(self):
@@ -84,6 +93,8 @@ class FiniteCapacityPut(Event):
         """
         if not self.triggered:
             self.resource.put_queue.remove(self)
+            if self.resource.stats is not None:
+                self.resource.stats.update()
 
 
 class Get(Event):
@@ -100,13 +111,15 @@ class Get(Event):
             item = yield request
 
     """
+    __slots__ = ('resource', 'proc')
+
     def __init__(self, resource):
         super(Get, self).__init__(resource._env)
         self.resource = resource
         self.proc = self.env.active_process
 
         resource.get_queue.append(self)
-        self.callbacks.append(resource._trigger_put)
+        self._callbacks = [resource._trigger_put]
         resource._trigger_get(None)
 
     def __enter__(self):
@@ -128,6 +141,8 @@ class Get(Event):
         """
         if not self.triggered:
             self.resource.get_queue.remove(self)
+            if self.resource.stats is not None:
+                self.resource.stats.update()
 
 
 class BaseResource(object):
@@ -144,21 +159,36 @@ class BaseResource(object):
 
     - providing custom :attr:`PutQueue` and :attr:`GetQueue` types,
     - providing custom :class:`Put` respectively :class:`Get` events,
-    - and implementing the request processing behaviour through the methods
-      ``_do_get()`` and ``_do_put()``.
+    - implementing the request processing behaviour through the methods
+      ``_do_get()`` and ``_do_put()``,
+    - and setting :attr:`scan_put_queue` or :attr:`scan_get_queue` if
+      a request may succeed while an earlier one in the same queue waits.
 
     """
-    PutQueue = list
-    """The type to be used for the :attr:`put_queue`. It is a plain
-    :class:`list` by default. The type must support index access (e.g.
-    ``__getitem__()`` and ``__len__()``) as well as provide ``append()`` and
-    ``pop()`` operations."""
-
-    GetQueue = list
-    """The type to be used for the :attr:`get_queue`. It is a plain
-    :class:`list` by default. The type must support index access (e.g.
-    ``__getitem__()`` and ``__len__()``) as well as provide ``append()`` and
-    ``pop()`` operations."""
+    PutQueue = deque
+    """The type to be used for the :attr:`put_queue`. It is
+    a :class:`~collections.deque` by default. The type must support index
+    access (``__getitem__()``, ``__delitem__()`` and ``__len__()``) as well as
+    provide ``append()`` and ``remove()`` operations. Deleting the first
+    element should be cheap."""
+
+    GetQueue = deque
+    """The type to be used for the :attr:`get_queue`. It is
+    a :class:`~collections.deque` by default and has the same requirements
+    as the :attr:`PutQueue`."""
+
+    scan_put_queue = False
+    """If ``False`` (the default), only the first request of the
+    :attr:`put_queue` can proceed: :meth:`_trigger_put` stops at the first
+    request that :meth:`_do_put` does not trigger. If ``True``, it goes on
+    with the next requests as long as :meth:`_do_put` returns ``True``."""
+
+    scan_get_queue = False
+    """Like :attr:`scan_put_queue` for the :attr:`get_queue`."""
+
+    stats = None
+    """The :class:`~simpy.resources.stats.QueueStats` of the resource or
+    ``None`` if it does not collect statistics (the default)."""
 
     def __init__(self, env, capacity):
         self._env = env
@@ -191,9 +221,9 @@ class BaseResource(object):
         for the put *event* are met, the method must trigger the event (e.g.
         call :meth:`Event.succeed()` with an apropriate value).
 
-        This method is called by :meth:`_trigger_put` for every event in the
-        :attr:`put_queue`, as long as the return value does not evaluate
-        ``False``.
+        This method is called by :meth:`_trigger_put` for the events in the
+        :attr:`put_queue` in order, as long as the return value does not
+        evaluate ``False`` (see also :attr:`scan_put_queue`).
         """
         raise NotImplementedError(self)
 
@@ -201,26 +231,15 @@ class BaseResource(object):
         """This method is called once a new put event has been created or a get
         event has been processed.
 
-        The method iterates over all put events in the :attr:`put_queue` and
-        calls :meth:`_do_put` to check if the conditions for the event are met.
-        If :meth:`_do_put` returns ``False``, the iteration is stopped early.
+        The method calls :meth:`_do_put` for the put events in the
+        :attr:`put_queue` to check if the conditions for the event are met.
+        The iteration stops if :meth:`_do_put` returns ``False`` and, unless
+        :attr:`scan_put_queue` is set, at the first event that was not
+        triggered.
         """
-
-        # Maintain queue invariant: All put requests must be untriggered.
-        # This code is not very pythonic because the queue interface should be
-        # simple (only append(), pop(), __getitem__() and __len__() are
-        # required).
-        idx = 0
-        while idx < len(self.put_queue):
-            put_event = self.put_queue[idx]
-            proceed = self._do_put(put_event)
-            if not put_event.triggered:
-                idx += 1
-            elif self.put_queue.pop(idx) != put_event:
-                raise RuntimeError('Put queue invariant violated')
-
-            if not proceed:
-                break
+        _trigger(self.put_queue, self._do_put, self.scan_put_queue, 'Put')
+        if self.stats is not None:
+            self.stats.update()
 
     def _do_get(self, event):
         """Perform the *get* operation.
@@ -229,9 +248,9 @@ class BaseResource(object):
         for the get *event* are met, the method must trigger the event (e.g.
         call :meth:`Event.succeed()` with an apropriate value).
 
-        This method is called by :meth:`_trigger_get` for every event in the
-        :attr:`get_queue`, as long as the return value does not evaluate
-        ``False``.
+        This method is called by :meth:`_trigger_get` for the events in the
+        :attr:`get_queue` in order, as long as the return value does not
+        evaluate ``False`` (see also :attr:`scan_get_queue`).
         """
         raise NotImplementedError(self)
 
@@ -241,23 +260,63 @@ class BaseResource(object):
         This method is called once a new get event has been created or a put
         event has been processed.
 
-        The method iterates over all get events in the :attr:`get_queue` and
-        calls :meth:`_do_get` to check if the conditions for the event are met.
-        If :meth:`_do_get` returns ``False``, the iteration is stopped early.
+        The method calls :meth:`_do_get` for the get events in the
+        :attr:`get_queue` to check if the conditions for the event are met.
+        The iteration stops if :meth:`_do_get` returns ``False`` and, unless
+        :attr:`scan_get_queue` is set, at the first event that was not
+        triggered.
         """
+        departures = _trigger(self.get_queue, self._do_get,
+                              self.scan_get_queue, 'Get')
+        if self.stats is not None:
+            self.stats.update(departures)
 
-        # Maintain queue invariant: All get requests must be untriggered.
-        # This code is not very pythonic because the queue interface should be
-        # simple (only append(), pop(), __getitem__() and __len__() are
-        # required).
-        idx = 0
-        while idx < len(self.get_queue):
-            get_event = self.get_queue[idx]
-            proceed = self._do_get(get_event)
-            if not get_event.triggered:
-                idx += 1
-            elif self.get_queue.pop(idx) != get_event:
-                raise RuntimeError('Get queue invariant violated')
+    def _queue_state(self):
+        """Return the queue length and the number of busy servers for the
+        :attr:`stats`. Resources that support statistics implement this
+        method."""
+        raise NotImplementedError(
+            '%s does not support statistics.' % type(self).__name__)
 
+
+def _trigger(queue, do, scan, name):
+    """Call *do* for the events of *queue* and remove the triggered ones.
+    Return the number of triggered events.
+
+    Maintains the queue invariant: all queued requests are untriggered. The
+    queue interface is kept simple (only append(), __getitem__(),
+    __delitem__() and __len__() are required).
+
+    """
+    triggered = 0
+    if not scan:
+        # Only the head can proceed, so each triggered event is removed from
+        # the front of the queue, which is O(1) for a deque.
+        while queue:
+            event = queue[0]
+            proceed = do(event)
+            if not event.triggered:
+                break
+            if queue[0] is not event:
+                raise RuntimeError('%s queue invariant violated' % name)
+            del queue[0]
+            triggered += 1
             if not proceed:
                 break
+        return triggered
+
+    idx = 0
+    while idx < len(queue):
+        event = queue[idx]
+        proceed = do(event)
+        if not event.triggered:
+            idx += 1
+        elif queue[idx] is not event:
+            raise RuntimeError('%s queue invariant violated' % name)
+        else:
+            del queue[idx]
+            triggered += 1
+
+        if not proceed:
+            break
+    return triggered
@@ -18,6 +18,8 @@ class ContainerPut(base.Put):
     Raise a :exc:`ValueError` if ``amount <= 0``.
 
     """
+    __slots__ = ('amount',)
+
     def __init__(self, container, amount):
         if amount <= 0:
             raise ValueError('amount(=%s) must be > 0.' % amount)
@@ -34,6 +36,8 @@ class ContainerGet(base.Get):
     Raise a :exc:`ValueError` if ``amount <= 0``.
 
     """
+    __slots__ = ('amount',)
+
     def __init__(self, container, amount):
         if amount <= 0:
             raise ValueError('amount(=%s) must be > 0.' % amount)
@@ -28,6 +28,10 @@ processes can define a request priority, and a :class:`PreemptiveResource`
 whose resource users can be preempted by requests with a higher priority.
 
 """
+from collections import OrderedDict, deque
+from heapq import heapify, heappop, heappush
+from itertools import count
+
 from ..core import BoundClass, Infinity
 from ..resources import base
 from ..exceptions import Interrupt
@@ -61,6 +65,11 @@ class Request(base.Put):
     a :keyword:`with` statement.
 
     """
+    __slots__ = ('usage_since',)
+
+    amount = 1
+    """Number of usage slots requested."""
+
     def __exit__(self, exc_type, value, traceback):
         super(Request, self).__exit__(exc_type, value, traceback)
         # Don't release the resource on generator cleanups. This seems to
@@ -68,7 +77,46 @@ class Request(base.Put):
         if exc_type is not GeneratorExit:
             self.resource.release(self)
 
+
+def _check_amount(resource, amount):
+    if amount <= 0:
+        raise ValueError('amount(=%s) must be > 0.' % amount)
+    if amount > resource.capacity:
+        raise ValueError('amount(=%s) must be <= capacity(=%s).' %
+                         (amount, resource.capacity))
+
+
+class BatchRequest(Request):
+    """Request *amount* usage slots of the *resource* at once. The event is
+    triggered once all of them are granted and releasing it frees all of
+    them.
+
+    Raise a :exc:`ValueError` if ``amount <= 0`` or if *amount* exceeds the
+    capacity of the *resource*.
+
+    """
+    __slots__ = ('amount',)
+
+    def __init__(self, resource, amount):
+        _check_amount(resource, amount)
+        self.amount = amount
+        super(BatchRequest, self).__init__(resource)
+
+    def cancel(self):
+        """Cancel this request. The requests queued behind it may take the
+        slots it waited for."""
+        triggered = self.triggered
+        super(BatchRequest, self).cancel()
+        if not triggered:
+            self.resource._trigger_put(None)
+
+
 class FiniteCapacityRequest(base.FiniteCapacityPut):
+    __slots__ = ('usage_since',)
+
+    amount = 1
+    """Number of usage slots requested."""
+
     def __exit__(self, exc_type, value, traceback):
         super(FiniteCapacityRequest, self).__exit__(exc_type, value, traceback)
         # Don't release the resource on generator cleanups. This seems to
@@ -77,11 +125,32 @@ class FiniteCapacityRequest(base.FiniteCapacityPut):
             self.resource.release(self)
 
 
+class FiniteCapacityBatchRequest(FiniteCapacityRequest):
+    """Like :class:`BatchRequest` for a :class:`FiniteQueueResource`. The
+    request fails like a single one if the queue is full."""
+    __slots__ = ('amount',)
+
+    def __init__(self, resource, amount):
+        _check_amount(resource, amount)
+        self.amount = amount
+        super(FiniteCapacityBatchRequest, self).__init__(resource)
+
+    def cancel(self):
+        """Cancel this request. The requests queued behind it may take the
+        slots it waited for."""
+        triggered = self.triggered
+        super(FiniteCapacityBatchRequest, self).cancel()
+        if not triggered:
+            self.resource._trigger_put(None)
+
+
 class Release(base.Get):
     """Releases the usage of *resource* granted by *request*. This event is
     triggered immediately. Subclass of :class:`simpy.resources.base.Get`.
 
     """
+    __slots__ = ('request',)
+
     def __init__(self, resource, request):
         self.request = request
         """The request (:class:`Request`) that is to be released."""
@@ -98,6 +167,8 @@ class PriorityRequest(Request):
     :class:`PreemptiveResource`
 
     """
+    __slots__ = ('priority', 'preempt', 'time', 'key')
+
     def __init__(self, resource, priority=0, preempt=True):
         self.priority = priority
         """The priority of this request. A smaller number means higher
@@ -122,15 +193,74 @@ class PriorityRequest(Request):
         super(PriorityRequest, self).__init__(resource)
 
 
-class SortedQueue(list):
+class PriorityBatchRequest(PriorityRequest):
+    """Request *amount* usage slots of the *resource* at once with a given
+    *priority*. Like :class:`BatchRequest`, it is triggered once all of the
+    slots are granted and releasing it frees all of them. With *preempt* set,
+    a :class:`PreemptiveResource` preempts as many users with a lower
+    priority as needed, but only if that frees enough slots.
+
+    Raise a :exc:`ValueError` if ``amount <= 0`` or if *amount* exceeds the
+    capacity of the *resource*.
+
+    """
+    __slots__ = ('amount',)
+
+    def __init__(self, resource, amount, priority=0, preempt=True):
+        _check_amount(resource, amount)
+        self.amount = amount
+        super(PriorityBatchRequest, self).__init__(resource, priority, preempt)
+
+    def cancel(self):
+        """Cancel this request. The requests queued behind it may take the
+        slots it waited for."""
+        triggered = self.triggered
+        super(PriorityBatchRequest, self).cancel()
+        if not triggered:
+            self.resource._trigger_put(None)
+
+
+class SortedQueue(object):
     """Queue for sorting events by their :attr:`~PriorityRequest.key`
     attribute.
 
+    The events are kept in a binary heap, so that appending an event and
+    removing the first one take ``O(log n)`` time. Events with equal keys
+    keep the order in which they were appended. Events removed from the
+    middle of the queue (e.g. canceled requests) are only marked and dropped
+    from the heap once they reach its top or once they make up more than half
+    of it.
+
+    Iterating over the queue and accessing any other than the first event
+    sort the queue, which takes ``O(n log n)`` time.
+
     """
     def __init__(self, maxlen=None):
-        super(SortedQueue, self).__init__()
         self.maxlen = maxlen
         """Maximum length of the queue."""
+        # Heap of [key, seq, event] entries, removed entries have no event.
+        self._heap = []
+        self._entries = {}
+        self._seq = count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self._entries.values()))
+
+    def __getitem__(self, index):
+        if index == 0:
+            return self._top()[2]
+        return list(self)[index]
+
+    def __delitem__(self, index):
+        if index == 0:
+            entry = self._top()
+            heappop(self._heap)
+            del self._entries[entry[2]]
+        else:
+            self.remove(self[index])
 
     def append(self, item):
         """Sort *item* into the queue.
@@ -141,8 +271,31 @@ class SortedQueue(list):
         if self.maxlen is not None and len(self) >= self.maxlen:
             raise RuntimeError('Cannot append event. Queue is full.')
 
-        super(SortedQueue, self).append(item)
-        super(SortedQueue, self).sort(key=lambda e: e.key)
+        entry = [item.key, next(self._seq), item]
+        self._entries[item] = entry
+        heappush(self._heap, entry)
+
+    def remove(self, item):
+        """Remove *item* from the queue. Raise a :exc:`ValueError` if it is
+        not in the queue."""
+        try:
+            entry = self._entries.pop(item)
+        except KeyError:
+            raise ValueError('%s is not in the queue.' % item)
+        entry[2] = None
+        if len(self._heap) > 2 * len(self._entries):
+            self._heap = list(self._entries.values())
+            heapify(self._heap)
+
+    def _top(self):
+        """Return the entry of the first event. Raise an :exc:`IndexError` if
+        the queue is empty."""
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heappop(heap)
+        if not heap:
+            raise IndexError('The queue is empty.')
+        return heap[0]
 
 
 class Resource(base.BaseResource):
@@ -150,7 +303,9 @@ class Resource(base.BaseResource):
     processes.
 
     If all slots are taken, requests are enqueued. Once a usage request is
-    released, a pending request will be triggered.
+    released, a pending request will be triggered. A request made with
+    :meth:`request_many()` takes several slots at once. Like all requests, it
+    waits until the requests queued before it are granted.
 
     The *env* parameter is the :class:`~simpy.core.Environment` instance the
     resource is bound to.
@@ -162,42 +317,65 @@ class Resource(base.BaseResource):
 
         super(Resource, self).__init__(env, capacity)
 
-        self.users = []
-        """List of :class:`Request` events for the processes that are currently
-        using the resource."""
+        # The users in the order in which they got the resource, mapped to
+        # their number of slots. Adding and removing a user takes constant
+        # time.
+        self._users = OrderedDict()
+        self._used = 0
         self.queue = self.put_queue
         """Queue of pending :class:`Request` events. Alias of
         :attr:`~simpy.resources.base.BaseResource.put_queue`.
         """
 
+    @property
+    def users(self):
+        """Read-only view of the :class:`Request` events for the processes that
+        are currently using the resource, in the order in which they got it.
+        """
+        return self._users.keys()
+
     @property
     def count(self):
-        """Number of users currently using the resource."""
-        return len(self.users)
+        """Number of usage slots currently taken (the number of users unless
+        there are batch requests among them)."""
+        return self._used
 
     request = BoundClass(Request)
     """Request a usage slot."""
 
+    request_many = BoundClass(BatchRequest)
+    """Request *amount* usage slots at once."""
+
     release = BoundClass(Release)
     """Release a usage slot."""
 
     def _do_put(self, event):
-        if len(self.users) < self.capacity:
-            self.users.append(event)
+        amount = event.amount
+        if self._used + amount <= self._capacity:
+            self._users[event] = amount
+            self._used += amount
             event.usage_since = self._env.now
             event.succeed()
+            # Go on with the next request, the trigger pass stops at the
+            # first one that does not fit.
+            return True
 
     def _do_get(self, event):
-        try:
-            self.users.remove(event.request)
-        except ValueError:
-            pass
+        self._used -= self._users.pop(event.request, 0)
         event.succeed()
 
+    def _queue_state(self):
+        return len(self.put_queue), self._used
+
 ## MSUTHERL: Resource with finite queue size
 class FiniteQueueResource(Resource):
     """A :class:`~simpy.resources.resource.Resource` that only allows finite amt
     of requests to be queued waiting for it.
+
+    A :meth:`request()` made while the queue is full fails with an
+    :class:`~simpy.exceptions.Interrupt` whose cause is
+    ``'maxQDepthExceeded'``. :meth:`try_request()` returns ``None`` instead,
+    which avoids raising and catching the exception in the requesting process.
     """
     def __init__(self, env, capacity=1, queueDepth=Infinity):
         if capacity <= 0:
@@ -209,20 +387,19 @@ class FiniteQueueResource(Resource):
 
         self._maxQDepth = queueDepth
 
-        self.users = []
-        """List of :class:`Request` events for the processes that are currently
-        using the resource."""
+        self.rejections = 0
+        """Number of requests rejected because the queue was full."""
+        self.retries = 0
+        """Number of requests made by :meth:`try_request()` with *retry*
+        set."""
+
+        self._users = OrderedDict()
+        self._used = 0
         self.queue = self.put_queue
         """Queue of pending :class:`Request` events. Alias of
         :attr:`~simpy.resources.base.BaseResource.put_queue`.
         """
 
-    def _do_put(self, event):
-        if len(self.users) < self.capacity:
-            self.users.append(event)
-            event.usage_since = self._env.now
-            event.succeed()
-
     def currentQDepth(self):
         """Number of :class:`Request` events currently queued."""
         return len(self.queue)
@@ -232,9 +409,28 @@ class FiniteQueueResource(Resource):
         """Number of :class:`Request` events currently queued."""
         return self._maxQDepth
 
+    def queueFull(self):
+        """Whether a new request would be rejected."""
+        return len(self.queue) > self._maxQDepth
+
+    def try_request(self, retry=False):
+        """Request a usage slot if the queue is not full. Return the
+        :class:`FiniteCapacityRequest` or ``None`` if the request was
+        rejected. Set *retry* if the requester was rejected before, to count
+        the request in :attr:`retries`."""
+        if retry:
+            self.retries += 1
+        if self.queueFull():
+            self.rejections += 1
+            return None
+        return self.request()
+
     request = BoundClass(FiniteCapacityRequest)
     """Request a usage slot."""
 
+    request_many = BoundClass(FiniteCapacityBatchRequest)
+    """Request *amount* usage slots at once."""
+
     release = BoundClass(Release)
     """Release a usage slot."""
 
@@ -245,11 +441,14 @@ class PriorityResource(Resource):
     Pending requests in the :attr:`~Resource.queue` are sorted in ascending
     order by their *priority* (that means lower values are more important).
 
+    Batch requests made with :meth:`request_many()` are sorted by their
+    *priority* like single ones.
+
     """
     PutQueue = SortedQueue
     """Type of the put queue. See
     :attr:`~simpy.resources.base.BaseResource.put_queue` for details."""
-    GetQueue = list
+    GetQueue = deque
     """Type of the get queue. See
     :attr:`~simpy.resources.base.BaseResource.get_queue` for details."""
 
@@ -262,6 +461,9 @@ class PriorityResource(Resource):
     release = BoundClass(Release)
     """Release a usage slot."""
 
+    request_many = BoundClass(PriorityBatchRequest)
+    """Request *amount* usage slots at once with the given *priority*."""
+
 
 class PreemptiveResource(PriorityResource):
     """A :class:`~simpy.resources.resource.PriorityResource` with preemption.
@@ -271,14 +473,67 @@ class PreemptiveResource(PriorityResource):
     cause.
 
     """
+    def __init__(self, env, capacity=1):
+        super(PreemptiveResource, self).__init__(env, capacity)
+        # Max-heap of the users by their key, the first entry belongs to the
+        # user that gets preempted first. Like in the SortedQueue, released
+        # users are only marked and dropped lazily.
+        self._victims = []
+        self._victim_entries = {}
+        self._seq = count()
+
     def _do_put(self, event):
-        if len(self.users) >= self.capacity and event.preempt:
-            # Check if we can preempt another process
-            preempt = sorted(self.users, key=lambda e: e.key)[-1]
-            if preempt.key > event.key:
-                self.users.remove(preempt)
+        if self._used + event.amount > self._capacity and event.preempt:
+            # Check if we can preempt other processes
+            for preempt in self._victims_for(event):
+                self._used -= self._users.pop(preempt)
+                self._victim_entries.pop(preempt)[-1] = None
                 preempt.proc.interrupt(Preempted(
                     by=event.proc, usage_since=preempt.usage_since,
                     resource=self))
 
-        return super(PreemptiveResource, self)._do_put(event)
+        result = super(PreemptiveResource, self)._do_put(event)
+        if event.triggered:
+            # Negate the key (priority, time, not preempt) to get the largest
+            # key first. Among equal keys, the latest user comes first.
+            entry = [(-event.priority, -event.time, event.preempt),
+                     -next(self._seq), event]
+            self._victim_entries[event] = entry
+            heappush(self._victims, entry)
+        return result
+
+    def _do_get(self, event):
+        super(PreemptiveResource, self)._do_get(event)
+        entry = self._victim_entries.pop(event.request, None)
+        if entry is not None:
+            entry[-1] = None
+            if len(self._victims) > 2 * len(self._victim_entries):
+                self._victims = list(self._victim_entries.values())
+                heapify(self._victims)
+
+    def _victim(self):
+        """Return the user with the largest key."""
+        victims = self._victims
+        while victims[0][-1] is None:
+            heappop(victims)
+        return victims[0][-1]
+
+    def _victims_for(self, event):
+        """Return the users with a larger key than *event* that have to be
+        preempted to free its slots, or an empty list if they do not hold
+        enough slots."""
+        if event.amount == 1:
+            preempt = self._victim()
+            return [preempt] if preempt.key > event.key else []
+        # Batch requests are rare, so the users are simply sorted.
+        missing = self._used + event.amount - self._capacity
+        victims = []
+        for entry in sorted(self._victim_entries.values()):
+            preempt = entry[-1]
+            if not preempt.key > event.key:
+                break
+            victims.append(preempt)
+            missing -= self._users[preempt]
+            if missing <= 0:
+                return victims
+        return []
@@ -0,0 +1,133 @@
+"""
+Time-weighted statistics of the queue of a resource.
+
+A :class:`QueueStats` instance attached to a :class:`~simpy.resources.store.Store`
+or a :class:`~simpy.resources.resource.Resource` is updated whenever a request
+is made, triggered or canceled. Each update takes constant time. The
+statistics can be read at any time during the run.
+
+The *queue length* of a store is the number of items it holds. The queue
+length of a resource is the number of requests waiting in its
+:attr:`~simpy.resources.resource.Resource.queue` and its *busy servers* are
+its current users.
+
+"""
+
+
+class QueueStats(object):
+    """Collect time-weighted statistics of the queue of *resource*.
+
+    The statistics start at the current simulation time. Only state changes
+    made through requests are observed: items added to
+    :attr:`~simpy.resources.store.Store.items` directly are only seen with the
+    next request.
+
+    Raise a :exc:`RuntimeError` if the resource already has statistics.
+
+    """
+    def __init__(self, resource):
+        if resource.stats is not None:
+            raise RuntimeError('%s already has statistics.' % resource)
+        self.resource = resource
+        self.env = resource._env
+        self.reset()
+        resource.stats = self
+
+    def reset(self):
+        """Drop the statistics collected so far and start anew at the current
+        simulation time (e.g. after a warm-up phase)."""
+        self.start = self.env.now
+        """Simulation time at which the statistics started."""
+        self.departures = 0
+        """Number of completed get requests (items retrieved from a store or
+        releases of a resource)."""
+        self._last = self.start
+        self._length, self._busy = self.resource._queue_state()
+        self.max_length = self._length
+        """Maximum observed queue length."""
+        self._length_area = 0
+        self._busy_area = 0
+        self._time_at = {}
+
+    def update(self, departures=0):
+        """Account for the time since the last update and observe the current
+        state of the resource. Called by the resource after each change, with
+        the number of completed get requests in *departures*."""
+        now = self.env.now
+        elapsed = now - self._last
+        if elapsed:
+            length = self._length
+            self._length_area += length * elapsed
+            self._busy_area += self._busy * elapsed
+            self._time_at[length] = self._time_at.get(length, 0) + elapsed
+            self._last = now
+        self._length, self._busy = self.resource._queue_state()
+        if self._length > self.max_length:
+            self.max_length = self._length
+        self.departures += departures
+
+    @property
+    def elapsed(self):
+        """Simulation time covered by the statistics."""
+        return self.env.now - self.start
+
+    @property
+    def mean_length(self):
+        """Time-weighted mean queue length."""
+        elapsed = self.elapsed
+        if not elapsed:
+            return float(self._length)
+        pending = self.env.now - self._last
+        return (self._length_area + self._length * pending) / elapsed
+
+    @property
+    def mean_busy(self):
+        """Time-weighted mean number of busy servers."""
+        elapsed = self.elapsed
+        if not elapsed:
+            return float(self._busy)
+        pending = self.env.now - self._last
+        return (self._busy_area + self._busy * pending) / elapsed
+
+    @property
+    def utilization(self):
+        """Time-weighted fraction of busy servers (:attr:`mean_busy` divided
+        by the capacity of the resource)."""
+        return self.mean_busy / self.resource.capacity
+
+    @property
+    def throughput(self):
+        """Number of :attr:`departures` per unit of simulation time."""
+        elapsed = self.elapsed
+        return self.departures / elapsed if elapsed else 0.0
+
+    def histogram(self):
+        """Return a dictionary that maps each observed queue length to the
+        simulation time spent at that length."""
+        time_at = dict(self._time_at)
+        pending = self.env.now - self._last
+        if pending:
+            time_at[self._length] = time_at.get(self._length, 0) + pending
+        return time_at
+
+    def percentile(self, percentile):
+        """Return the smallest queue length the queue was at or below for at
+        least *percentile* percent of the time."""
+        return length_percentile(self.histogram(), percentile)
+
+
+def length_percentile(histogram, percentile):
+    """Return the smallest queue length in the *histogram* (see
+    :meth:`QueueStats.histogram()`) that covers at least *percentile* percent
+    of the time. Histograms of several queues can be combined by adding up
+    their times per length."""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    limit = total * percentile / 100.0
+    covered = 0
+    for length in sorted(histogram):
+        covered += histogram[length]
+        if covered >= limit:
+            return length
+    return length
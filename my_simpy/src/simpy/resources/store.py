@@ -5,11 +5,13 @@ requests for specific objects.
 The :class:`Store` operates in a FIFO (first-in, first-out) order. Objects are
 retrieved from the store in the order they were put in. The *get* requests of a
 :class:`FilterStore` can be customized by a filter to only retrieve objects
-matching a given criterion.
+matching a given criterion. A :class:`KeyedStore` keeps a FIFO queue of
+objects per key and serves get requests for a given key or for any key.
 
 """
-from heapq import heappush, heappop
-from collections import namedtuple
+from heapq import heappush, heappop, merge
+from collections import OrderedDict, deque, namedtuple
+from itertools import count
 
 from ..core import BoundClass
 from ..resources import base
@@ -20,18 +22,69 @@ class StorePut(base.Put):
     there is space for the item in the store.
 
     """
+    __slots__ = ('item',)
+
+    batch = False
+
     def __init__(self, store, item):
         self.item = item
         """The item to put into the store."""
         super(StorePut, self).__init__(store)
 
 
+class StorePutMany(base.Put):
+    """Request to put the *items* into the *store* at once. The request is
+    triggered once there is space for all of them in the store.
+
+    Raise a :exc:`ValueError` if there are no *items* or more than the
+    capacity of the store.
+
+    """
+    __slots__ = ('items',)
+
+    batch = True
+
+    def __init__(self, store, items):
+        items = list(items)
+        if not items:
+            raise ValueError('items must not be empty.')
+        if len(items) > store.capacity:
+            raise ValueError('len(items)(=%s) must be <= capacity(=%s).' %
+                             (len(items), store.capacity))
+        self.items = items
+        """The items to put into the store."""
+        super(StorePutMany, self).__init__(store)
+
+
 class StoreGet(base.Get):
     """Request to get an *item* from the *store*. The request is triggered
     once there is an item available in the store.
 
     """
-    pass
+    __slots__ = ()
+
+    batch = False
+
+
+class StoreGetMany(base.Get):
+    """Request to get up to *max_n* items from the *store* at once. The
+    request is triggered once there is an item available in the store. Its
+    value is the list of the items, in the order they would be retrieved one
+    by one.
+
+    Raise a :exc:`ValueError` if ``max_n <= 0``.
+
+    """
+    __slots__ = ('max_n',)
+
+    batch = True
+
+    def __init__(self, store, max_n):
+        if max_n <= 0:
+            raise ValueError('max_n(=%s) must be > 0.' % max_n)
+        self.max_n = max_n
+        """The maximum number of items to get."""
+        super(StoreGetMany, self).__init__(store)
 
 
 class FilterStoreGet(StoreGet):
@@ -44,12 +97,55 @@ class FilterStoreGet(StoreGet):
     :class:`StoreGet`.
 
     """
+    __slots__ = ('filter',)
+
     def __init__(self, resource, filter=lambda item: True):
         self.filter = filter
         """The filter function to filter items in the store."""
         super(FilterStoreGet, self).__init__(resource)
 
 
+class KeyedStorePut(StorePut):
+    """Request to put *item* with *key* into the *store*. The request is
+    triggered once there is space for the item in the store.
+
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, store, key, item):
+        self.key = key
+        """The key of the item."""
+        super(KeyedStorePut, self).__init__(store, item)
+
+
+#: Key of the get requests of a :class:`KeyedStore` that accept any key.
+ANY_KEY = object()
+
+
+class KeyedStoreGet(StoreGet):
+    """Request to get the oldest *item* with *key* from the *store*. The
+    request is triggered once there is such an item available in the store.
+
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, store, key):
+        self.key = key
+        """The key of the requested item or :data:`ANY_KEY`."""
+        super(KeyedStoreGet, self).__init__(store)
+
+
+class KeyedStoreGetAny(KeyedStoreGet):
+    """Request to get an *item* with any key from the *store*. The request is
+    triggered once there is an item available in the store.
+
+    """
+    __slots__ = ()
+
+    def __init__(self, store):
+        super(KeyedStoreGetAny, self).__init__(store, ANY_KEY)
+
+
 class Store(base.BaseResource):
     """Resource with *capacity* slots for storing arbitrary objects. By
     default, the *capacity* is unlimited and objects are put and retrieved from
@@ -58,6 +154,14 @@ class Store(base.BaseResource):
     The *env* parameter is the :class:`~simpy.core.Environment` instance the
     container is bound to.
 
+    Getting the oldest item takes constant time. A get request that is
+    already waiting receives a new item when the put request is processed,
+    so the events keep the order of a list-based store.
+
+    :meth:`put_many()` and :meth:`get_many()` move several items with a single
+    event, which saves the events and trigger passes of the single requests.
+    They are queued in the same order as the single requests.
+
     """
     def __init__(self, env, capacity=float('inf')):
         if capacity <= 0:
@@ -65,8 +169,9 @@ class Store(base.BaseResource):
 
         super(Store, self).__init__(env, capacity)
 
-        self.items = []
-        """List of the items available in the store."""
+        self.items = deque()
+        """Deque of the items available in the store. Use ``list(items)``
+        to slice or sort them."""
 
     put = BoundClass(StorePut)
     """Request to put *item* into the store."""
@@ -74,14 +179,34 @@ class Store(base.BaseResource):
     get = BoundClass(StoreGet)
     """Request to get an *item* out of the store."""
 
+    put_many = BoundClass(StorePutMany)
+    """Request to put all *items* into the store at once."""
+
+    get_many = BoundClass(StoreGetMany)
+    """Request to get a list of up to *max_n* items out of the store."""
+
     def _do_put(self, event):
-        if len(self.items) < self._capacity:
+        if event.batch:
+            if len(self.items) + len(event.items) <= self._capacity:
+                # Waiting get requests are served once the event is
+                # processed.
+                self.items.extend(event.items)
+                event.succeed()
+        elif len(self.items) < self._capacity:
             self.items.append(event.item)
             event.succeed()
 
     def _do_get(self, event):
-        if self.items:
-            event.succeed(self.items.pop(0))
+        items = self.items
+        if items:
+            if event.batch:
+                event.succeed([items.popleft()
+                               for _ in range(min(event.max_n, len(items)))])
+            else:
+                event.succeed(items.popleft())
+
+    def _queue_state(self):
+        return len(self.items), 0
 
 
 class PriorityItem(namedtuple('PriorityItem', 'priority item')):
@@ -109,15 +234,30 @@ class PriorityStore(Store):
     items with *PriorityStore*, use :class:`PriorityItem`.
 
     """
+    def __init__(self, env, capacity=float('inf')):
+        super(PriorityStore, self).__init__(env, capacity)
+
+        self.items = []
+        """Heap of the items available in the store."""
 
     def _do_put(self, event):
-        if len(self.items) < self._capacity:
+        if event.batch:
+            if len(self.items) + len(event.items) <= self._capacity:
+                for item in event.items:
+                    heappush(self.items, item)
+                event.succeed()
+        elif len(self.items) < self._capacity:
             heappush(self.items, event.item)
             event.succeed()
 
     def _do_get(self, event):
-        if self.items:
-            event.succeed(heappop(self.items))
+        items = self.items
+        if items:
+            if event.batch:
+                event.succeed([heappop(items)
+                               for _ in range(min(event.max_n, len(items)))])
+            else:
+                event.succeed(heappop(items))
 
 
 class FilterStore(Store):
@@ -127,7 +267,8 @@ class FilterStore(Store):
     first-out order.
 
     Get requests can be customized with a filter function to only trigger for
-    items for which said filter function returns ``True``.
+    items for which said filter function returns ``True``. Requests made with
+    :meth:`~Store.get_many()` take the first items of the store.
 
     .. note::
 
@@ -142,6 +283,9 @@ class FilterStore(Store):
 
     """
 
+    scan_get_queue = True
+    """Later get requests may match an item that earlier ones reject."""
+
     put = BoundClass(StorePut)
     """Request a to put *item* into the store."""
 
@@ -149,10 +293,215 @@ class FilterStore(Store):
     """Request a to get an *item*, for which *filter* returns ``True``, out of
     the store."""
 
+    def _do_put(self, event):
+        # Items are not handed over to the getters like in Store, every put
+        # item is checked against the filters of all waiting getters.
+        if event.batch:
+            if len(self.items) + len(event.items) <= self._capacity:
+                self.items.extend(event.items)
+                event.succeed()
+        elif len(self.items) < self._capacity:
+            self.items.append(event.item)
+            event.succeed()
+
     def _do_get(self, event):
-        for item in self.items:
+        if event.batch:
+            super(FilterStore, self)._do_get(event)
+            return True
+        # Removing the first item of the deque (the common FIFO case) takes
+        # constant time.
+        for idx, item in enumerate(self.items):
             if event.filter(item):
-                self.items.remove(item)
+                del self.items[idx]
                 event.succeed(item)
                 break
         return True
+
+
+class KeyedGetQueue(object):
+    """Queue of the get requests of a :class:`KeyedStore`, with one FIFO
+    queue per requested key.
+
+    Appending a request and removing the oldest one for a key (or for any
+    key) take constant time. Iterating over the queue merges the queues of
+    all keys and accessing a request by index builds a list of all of them.
+
+    """
+    def __init__(self):
+        # Deques of [seq, event] entries by key, empty deques are removed.
+        self._waiting = {}
+        self._len = 0
+        self._seq = count()
+        self.last = None
+        """The most recently appended event."""
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (entry[1] for entry in merge(*self._waiting.values()))
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __delitem__(self, index):
+        self.remove(self[index])
+
+    def append(self, event):
+        """Append *event* to the queue of its key."""
+        try:
+            waiting = self._waiting[event.key]
+        except KeyError:
+            waiting = self._waiting[event.key] = deque()
+        waiting.append([next(self._seq), event])
+        self._len += 1
+        self.last = event
+
+    def remove(self, event):
+        """Remove *event* from the queue. Raise a :exc:`ValueError` if it is
+        not in the queue."""
+        waiting = self._waiting.get(event.key, ())
+        for idx, entry in enumerate(waiting):
+            if entry[1] is event:
+                break
+        else:
+            raise ValueError('%s is not in the queue.' % event)
+        del waiting[idx]
+        if not waiting:
+            del self._waiting[event.key]
+        self._len -= 1
+
+    def pop(self, key):
+        """Remove and return the oldest request for *key* or for any key.
+        Return ``None`` if there is no such request."""
+        waiting = self._waiting
+        keyed = waiting.get(key)
+        any_key = waiting.get(ANY_KEY)
+        if keyed is None:
+            if any_key is None:
+                return None
+            key, queue = ANY_KEY, any_key
+        elif any_key is not None and any_key[0][0] < keyed[0][0]:
+            key, queue = ANY_KEY, any_key
+        else:
+            queue = keyed
+        event = queue.popleft()[1]
+        if not queue:
+            del waiting[key]
+        self._len -= 1
+        return event
+
+    def pop_last(self):
+        """Remove the most recently appended event (see :attr:`last`)."""
+        event = self.last
+        waiting = self._waiting[event.key]
+        waiting.pop()
+        if not waiting:
+            del self._waiting[event.key]
+        self._len -= 1
+        self.last = None
+
+
+class KeyedStore(base.BaseResource):
+    """Resource with *capacity* slots for storing objects by key, e.g. the
+    requests of several partitions. The *capacity* is unlimited by default.
+
+    The items of each key are retrieved in the order they were put in.
+    A :meth:`get()` request waits for an item with the given key and
+    a :meth:`get_any()` request takes an item of any key. Keys that hold
+    items are served by :meth:`get_any()` in turn, starting with the key that
+    has held items for the longest time.
+
+    Putting an item and getting one (with or without a key) take constant
+    time, independent of the number of keys, items and waiting requests. An
+    item for which a get request is waiting is handed to the oldest such
+    request directly when the put request is triggered. Get requests thus
+    only wait for keys without items, so that no request has to be searched.
+    Unlike with a :class:`Store`, whose waiting get requests receive new
+    items once the put request is processed, such a get request is processed
+    before the put request.
+
+    """
+    GetQueue = KeyedGetQueue
+
+    def __init__(self, env, capacity=float('inf')):
+        if capacity <= 0:
+            raise ValueError('"capacity" must be > 0.')
+
+        super(KeyedStore, self).__init__(env, capacity)
+
+        self.items = OrderedDict()
+        """Deques of the items available in the store by key. Only the keys
+        that hold items are present."""
+        self._size = 0
+
+    put = BoundClass(KeyedStorePut)
+    """Request to put *item* with *key* into the store."""
+
+    get = BoundClass(KeyedStoreGet)
+    """Request to get the oldest *item* with *key* out of the store."""
+
+    get_any = BoundClass(KeyedStoreGetAny)
+    """Request to get an *item* with any key out of the store."""
+
+    @property
+    def size(self):
+        """Number of items in the store."""
+        return self._size
+
+    def count(self, key):
+        """Return the number of items with *key* in the store."""
+        items = self.items.get(key)
+        return len(items) if items is not None else 0
+
+    def _do_put(self, event):
+        get_event = self.get_queue.pop(event.key)
+        if get_event is not None:
+            get_event.succeed(event.item)
+            event.succeed()
+            if self.stats is not None:
+                self.stats.departures += 1
+        elif self._size < self._capacity:
+            try:
+                self.items[event.key].append(event.item)
+            except KeyError:
+                self.items[event.key] = deque((event.item,))
+            self._size += 1
+            event.succeed()
+
+    def _do_get(self, event):
+        items = self.items
+        key = event.key
+        if key is ANY_KEY:
+            if not items:
+                return
+            key = next(iter(items))
+        elif key not in items:
+            return
+        queue = items.pop(key)
+        event.succeed(queue.popleft())
+        self._size -= 1
+        if queue:
+            # Reinserting the key moves it behind the other ready keys.
+            items[key] = queue
+
+    def _trigger_get(self, put_event):
+        """Trigger a new get request if there is an item for it.
+
+        Put requests hand their items to the waiting get requests directly, so
+        the requests in the :attr:`get_queue` wait for keys without items.
+        Only a new get request (*put_event* is ``None``) can be triggered.
+
+        """
+        departures = 0
+        if put_event is None:
+            event = self.get_queue.last
+            self._do_get(event)
+            if event.triggered:
+                self.get_queue.pop_last()
+                departures = 1
+        if self.stats is not None:
+            self.stats.update(departures)
+
+    def _queue_state(self):
+        return self._size, 0
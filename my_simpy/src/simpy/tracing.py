@@ -0,0 +1,372 @@
+"""
+Compact binary traces of the events processed by an environment.
+
+A :class:`Tracer` appends one fixed-width record per processed event to
+a preallocated, memory-mapped ring file. A :class:`TraceReader` loads the
+records of a time window of such a file without reading all of it.
+
+Both classes require :mod:`numpy`.
+
+.. autosummary::
+
+    ~simpy.tracing.Tracer
+    ~simpy.tracing.TraceReader
+
+"""
+import json
+from array import array
+
+try:
+    import numpy
+except ImportError:  # numpy is optional for SimPy itself
+    numpy = None
+
+from .core import EmptySchedule
+from .events import CANCELLED, NORMAL, URGENT, Actor, Process
+from .profiling import _instrumented
+from .resources.base import BaseResource, FiniteCapacityPut, Get, Put
+
+#: Event types that belong to a resource.
+_RESOURCE_EVENTS = (Put, FiniteCapacityPut, Get)
+
+
+def record_dtype():
+    """Return the :class:`numpy.dtype` of a trace record. Its fields are:
+
+    - ``time``: simulation time at which the event was processed,
+    - ``seq``: sequence number of the event among all traced events, which is
+      the order in which the events were processed. It is not the event id
+      of the environment, which numbers the events in the order they were
+      scheduled (including untraced and cancelled ones) and is not kept for
+      events that are due now,
+    - ``type``: code of the event type (see :attr:`TraceReader.types`),
+    - ``proc``: ``id()`` of the process or actor resumed by the event or
+      ``0`` if the event did not resume any,
+    - ``resource``: code of the resource a put or get event belongs to (see
+      :attr:`TraceReader.resources`) or ``-1`` for other events.
+
+    """
+    _require_numpy()
+    return numpy.dtype([('time', '<f8'), ('seq', '<i8'), ('type', '<u2'),
+                        ('proc', '<i8'), ('resource', '<i4')])
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('Event tracing requires numpy.')
+
+
+def _meta_path(path):
+    return '%s.json' % path
+
+
+class Tracer(object):
+    """Record the events processed by the
+    :class:`~simpy.core.Environment` *env* in the file *path*.
+
+    The file holds *capacity* records (see :func:`record_dtype()`) and is
+    allocated when the tracer is created. Once it is full, the oldest records
+    are overwritten, so that the file always holds the most recent events.
+    Records are collected in memory and copied to the file once at least
+    *buffer_size* records were collected and the next event is not due at the
+    current time. The names of the event types and resources are
+    written to ``path + '.json'`` by :meth:`flush()` and :meth:`stop()`.
+
+    While the tracer is active (between :meth:`start()` and :meth:`stop()`
+    or within a :keyword:`with` block), the environment uses an instrumented
+    copy of :meth:`~simpy.core.Environment.step()`, like
+    a :class:`~simpy.profiling.Profiler`. An environment cannot be traced and
+    profiled at the same time.
+
+    """
+    def __init__(self, env, path, capacity=1 << 20, buffer_size=4096):
+        _require_numpy()
+        if capacity < 1:
+            raise ValueError('capacity(=%s) must be >= 1.' % capacity)
+        if buffer_size < 1:
+            raise ValueError('buffer_size(=%s) must be >= 1.' % buffer_size)
+        self.env = env
+        self.path = path
+        self.capacity = capacity
+        self.buffer_size = buffer_size
+        self.count = 0
+        """Number of records written so far (including overwritten ones)."""
+        self.types = []
+        """Names of the event types, indexed by their code."""
+        self.resources = []
+        """Names of the resources, indexed by their code."""
+        self._type_codes = _Codes(self.types, self._describe_type)
+        self._type_has_resource = []
+        self._resource_codes = _ResourceCodes(
+            self.resources,
+            lambda r: '%s#%d' % (type(r).__name__, len(self.resources)))
+        # The owners of callbacks are numbered by slots, which map to their
+        # proc field and resource code. Each owner is only looked up once
+        # until there are too many slots to convert them quickly.
+        self._slot_fields = []
+        self._owner_slots = _Codes(self._slot_fields, self._describe_owner)
+        self._records = numpy.memmap(path, dtype=record_dtype(), mode='w+',
+                                     shape=(capacity,))
+        # Structured assignment copies field by field, so the records are
+        # copied to the file as raw bytes.
+        self._bytes = self._records.view(numpy.uint8)
+        # For each event, the instrumented step only buffers the time, its
+        # type and the owners of its last and first callback (usually the
+        # resumed process and, for put and get events, the resource). The
+        # fields of the records are derived from them in bulk by
+        # _write_buffer(). The events themselves are not kept, as holding on
+        # to many short-lived objects makes the garbage collector run much
+        # more often.
+        self._buffer = []
+        self._active = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start to trace the environment. Raise a :exc:`RuntimeError` if the
+        environment is already traced or profiled."""
+        if _instrumented(self.env):
+            raise RuntimeError('%s is already instrumented.' % self.env)
+        self.env.step = self._make_step()
+        self._active = True
+
+    def stop(self):
+        """Stop to trace the environment and write all records and the
+        metadata to disk."""
+        if not self._active:
+            return
+        del self.env.step
+        self._active = False
+        self.flush()
+
+    def flush(self):
+        """Write the buffered records and the metadata to disk."""
+        # The records are copied to the pages of the mapped file, which
+        # readers of the file see right away. The operating system writes
+        # them back to disk, as forcing this with msync() would take longer
+        # than tracing a few thousand events.
+        self._write_buffer()
+        with open(_meta_path(self.path), 'w') as f:
+            json.dump({'capacity': self.capacity, 'count': self.count,
+                       'types': self.types, 'resources': self.resources}, f)
+
+    def _write_buffer(self):
+        """Convert the buffered events into records and copy them into the
+        memory-mapped file."""
+        buffer = self._buffer
+        n = len(buffer) // 4
+        if not n:
+            return
+        records = numpy.empty(n, dtype=self._records.dtype)
+        records['time'] = _times(buffer[0::4])
+        records['seq'] = numpy.arange(self.count, self.count + n)
+        types = _small_ints(map(self._type_codes.__getitem__, buffer[1::4]))
+        records['type'] = types
+        # The last callback of an event belongs to its process and the first
+        # callback of put and get events to their resource, unless a request
+        # was rejected.
+        fields = self._owner_fields(buffer[2::4] + buffer[3::4])
+        records['proc'] = fields[:n, 0]
+        has_resource = numpy.array(self._type_has_resource,
+                                   dtype=bool).take(types)
+        records['resource'] = numpy.where(has_resource, fields[n:, 1], -1)
+        data = records.view(numpy.uint8)
+        width = records.itemsize
+        start = 0
+        while start < n:
+            pos = (self.count + start) % self.capacity
+            size = min(n - start, self.capacity - pos)
+            self._bytes[pos * width:(pos + size) * width] = \
+                data[start * width:(start + size) * width]
+            start += size
+        self.count += n
+        del buffer[:]
+
+    def _owner_fields(self, owners):
+        """Return the ``proc`` field and the resource code (or ``-1``) of each
+        of the callback *owners* as an array of shape ``(len(owners), 2)``."""
+        try:
+            slots = _small_ints(map(self._owner_slots.__getitem__, owners))
+        except TypeError:  # An owner is not hashable.
+            return numpy.array(list(map(self._describe_owner, owners)),
+                               dtype='<i8').reshape(-1, 2)
+        # take() is much faster than indexing with an array of bytes.
+        fields = numpy.array(self._slot_fields, dtype='<i8').take(slots, 0)
+        if len(self._slot_fields) > 255:
+            self._owner_slots.clear()
+            del self._slot_fields[:]
+        return fields
+
+    def _describe_owner(self, owner):
+        proc = id(owner) if isinstance(owner, (Process, Actor)) else 0
+        return proc, self._resource_codes[owner]
+
+    def _describe_type(self, event_type):
+        self._type_has_resource.append(
+            issubclass(event_type, _RESOURCE_EVENTS))
+        return event_type.__name__
+
+    def _make_step(self):
+        """Return an instrumented copy of
+        :meth:`simpy.core.Environment.step()`. Frequently used objects are
+        bound to local variables to keep the overhead low."""
+        env = self.env
+        urgent, normal = env._lanes
+        peek, pop = env._peek, env._pop
+        buffer = self._buffer
+        add = buffer.extend
+        limit = 4 * self.buffer_size
+        write_buffer = self._write_buffer
+
+        def step():
+            while True:
+                lane = urgent or normal
+                if lane:
+                    priority = URGENT if lane is urgent else NORMAL
+                    try:
+                        at, prio, _, _ = peek()
+                    except IndexError:
+                        event = lane.popleft()
+                    else:
+                        if at == env._now and prio <= priority:
+                            _, _, _, event = pop()
+                        else:
+                            event = lane.popleft()
+                    at = env._now
+                else:
+                    # The buffer is only checked when the simulation may
+                    # advance in time, which is cheaper than checking it for
+                    # every event.
+                    if len(buffer) >= limit:
+                        write_buffer()
+                    try:
+                        at, _, _, event = pop()
+                    except IndexError:
+                        raise EmptySchedule()
+
+                callbacks = event._callbacks
+                if callbacks is not CANCELLED:
+                    break
+                env._dead -= 1
+
+            env._now = at
+            event._callbacks = None
+
+            try:
+                add((at, type(event), callbacks[-1].__self__,
+                     callbacks[0].__self__))
+            except (IndexError, AttributeError):
+                add((at, type(event),
+                     getattr(callbacks[-1], '__self__', None)
+                     if callbacks else None,
+                     getattr(callbacks[0], '__self__', None)
+                     if callbacks else None))
+
+            for callback in callbacks:
+                callback(event)
+
+            if not event._ok and not hasattr(event, '_defused'):
+                exc = type(event._value)(*event._value.args)
+                exc.__cause__ = event._value
+                raise exc
+
+        return step
+
+
+def _times(times):
+    """Return a :mod:`numpy` array of the simulation *times*. Integer times,
+    which are common, are converted via :class:`array.array`, which is much
+    faster."""
+    try:
+        return numpy.frombuffer(array('q', times), dtype='<i8')
+    except (TypeError, ValueError, OverflowError):
+        # A time is not an integer (or Python 2 lacks the type code q).
+        return numpy.fromiter(times, dtype='<f8', count=len(times))
+
+
+def _small_ints(ints):
+    """Return a :mod:`numpy` array of the non-negative integers *ints*.
+    Integers below 256, like most codes, are converted via
+    :class:`bytearray`, which is much faster."""
+    ints = list(ints)
+    try:
+        return numpy.frombuffer(bytearray(ints), dtype=numpy.uint8)
+    except ValueError:
+        return numpy.array(ints)
+
+
+class _Codes(dict):
+    """Map keys to consecutive integer codes, which are assigned on first
+    access. The description of each new key is appended to *names*."""
+    def __init__(self, names, describe):
+        super(_Codes, self).__init__()
+        self.names = names
+        self.describe = describe
+
+    def __missing__(self, key):
+        code = self[key] = len(self.names)
+        self.names.append(self.describe(key))
+        return code
+
+
+class _ResourceCodes(_Codes):
+    """Like :class:`_Codes` for resources. Other keys map to ``-1`` and are
+    not stored."""
+    def __missing__(self, key):
+        if not isinstance(key, BaseResource):
+            return -1
+        return super(_ResourceCodes, self).__missing__(key)
+
+
+class TraceReader(object):
+    """Read the trace file *path* written by a :class:`Tracer`.
+
+    The file is memory-mapped, so only the pages of the requested records
+    are read from disk.
+
+    """
+    def __init__(self, path):
+        _require_numpy()
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+        self.types = meta['types']
+        """Names of the event types, indexed by their code."""
+        self.resources = meta['resources']
+        """Names of the resources, indexed by their code."""
+        self.count = meta['count']
+        """Number of records written (including overwritten ones)."""
+        capacity = meta['capacity']
+        records = numpy.memmap(path, dtype=record_dtype(), mode='r',
+                               shape=(capacity,))
+        # The records in chronological order form up to two segments of
+        # the ring, each sorted by time.
+        if self.count <= capacity:
+            self._segments = (records[:self.count],)
+        else:
+            pos = self.count % capacity
+            self._segments = (records[pos:], records[:pos])
+
+    def __len__(self):
+        """Number of records in the file."""
+        return sum(len(segment) for segment in self._segments)
+
+    def records(self):
+        """Return all records in chronological order."""
+        return numpy.concatenate(self._segments)
+
+    def window(self, start, end):
+        """Return the records of the events processed at a simulation time
+        in ``[start, end)`` in chronological order. The window is located by
+        binary search."""
+        parts = []
+        for segment in self._segments:
+            times = segment['time']
+            lo = numpy.searchsorted(times, start, side='left')
+            hi = numpy.searchsorted(times, end, side='left')
+            parts.append(numpy.array(segment[lo:hi]))
+        return numpy.concatenate(parts)
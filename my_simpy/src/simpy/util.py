@@ -3,8 +3,13 @@ A collection of utility functions:
 
 .. autosummary::
    start_delayed
+   ArrivalStream
+   PhaseController
 
 """
+from itertools import islice
+
+from .events import Event, NORMAL, PENDING
 
 
 def start_delayed(env, generator, delay):
@@ -57,7 +62,226 @@ def subscribe_at(event):
         if receiver.is_alive:
             receiver.interrupt((signaller, result))
 
-    if event.callbacks is not None:
+    if event._callbacks is not None:
         env.process(signaller(event, subscriber))
     else:
         raise RuntimeError('%s has already terminated.' % event)
+
+
+class ArrivalStream(Event):
+    """Put the *items* into *store* at the (absolute) simulation *times*,
+    without a process that wakes up for every arrival.
+
+    *times* and *items* are iterables that are consumed lazily. The next
+    *chunk_size* times are turned into arrival events and scheduled at once
+    with :meth:`~simpy.core.Environment.schedule_many()`. The next item is
+    taken from *items* when an arrival occurs. The next chunk is scheduled
+    when the last arrival of a chunk occurs, so *times* may be infinite and
+    may, for example, be produced by a vectorized random number generator::
+
+        >>> import simpy
+        >>> from simpy.util import ArrivalStream
+        >>> env = simpy.Environment()
+        >>> store = simpy.Store(env)
+        >>> stream = ArrivalStream(env, store, [1, 2, 4], 'abc')
+        >>> env.run(until=3)
+        >>> list(store.items)
+        ['a', 'b']
+
+    The stream is an event that succeeds with the number of arrivals once
+    *times* or *items* are exhausted or when :meth:`stop()` is called. The
+    times must not lie in the past and must not decrease. Raise
+    a :exc:`ValueError` if ``chunk_size < 1``.
+
+    """
+    __slots__ = ('store', 'chunk_size', 'count', '_times', '_items', '_chunk')
+
+    def __init__(self, env, store, times, items, chunk_size=1024):
+        if chunk_size < 1:
+            raise ValueError('chunk_size(=%s) must be >= 1.' % chunk_size)
+        super(ArrivalStream, self).__init__(env)
+        self.store = store
+        self.chunk_size = chunk_size
+        self.count = 0
+        """Number of items put into the store so far."""
+        self._times = iter(times)
+        self._items = iter(items)
+        self._chunk = []
+        self._schedule_chunk(None)
+
+    def stop(self):
+        """Stop the stream and cancel the arrivals that are already
+        scheduled."""
+        if self._value is PENDING:
+            self.succeed(self.count)
+            for arrival in self._chunk:
+                if arrival._callbacks is not None:
+                    arrival.cancel()
+            self._chunk = []
+
+    def _schedule_chunk(self, event):
+        if self._value is not PENDING:
+            return
+        times = list(islice(self._times, self.chunk_size))
+        if not times:
+            self.succeed(self.count)
+            return
+
+        env = self.env
+        arrive = self._arrive
+        events = []
+        for _ in times:
+            arrival = Event(env)
+            arrival._ok = True
+            arrival._value = None
+            arrival._callbacks = [arrive]
+            events.append(arrival)
+        arrival._callbacks.append(self._schedule_chunk)
+        env.schedule_many(events, times, NORMAL)
+        self._chunk = events
+
+    def _arrive(self, event):
+        if self._value is not PENDING:
+            return
+        try:
+            item = next(self._items)
+        except StopIteration:
+            self.succeed(self.count)
+            return
+        self.store.put(item)
+        self.count += 1
+
+
+class PhaseController(Event):
+    """Divide a simulation into a warm-up, a measurement and a drain phase.
+
+    The components of the model report every request (e.g. an RPC) to the
+    controller twice: :meth:`admit()` when it arrives, which tells whether the
+    request is measured, and :meth:`complete()` when it is done. Only measured
+    requests should be recorded by the trackers of the model.
+
+    - During the *warm-up* phase, requests are admitted, but not measured.
+    - During the *measurement* phase, every admitted request is measured.
+    - During the *drain* phase, requests are again not measured, so the model
+      keeps its load while the measured requests complete.
+
+    If *timed* is ``False`` (the default), *warmup* and *measure* are numbers
+    of requests: the first *warmup* requests are not measured and the next
+    *measure* requests are. If *timed* is ``True``, they are durations: the
+    requests that arrive in ``[now + warmup, now + warmup + measure)`` are
+    measured.
+
+    The controller is an event that succeeds with the number of completed
+    measured requests once the drain phase has started and all measured
+    requests are done. A simulation with sources that never stop can thus be
+    run with ``env.run(until=controller)``::
+
+        >>> import simpy
+        >>> from simpy.util import PhaseController
+        >>> env = simpy.Environment()
+        >>> phases = PhaseController(env, measure=2, warmup=1)
+        >>> latencies = []
+        >>> def request(env, n):
+        ...     measured = phases.admit()
+        ...     yield env.timeout(3 - n)
+        ...     if measured:
+        ...         latencies.append((n, env.now))
+        ...     phases.complete(measured)
+        ...
+        >>> def source(env):
+        ...     for n in range(1000):
+        ...         env.process(request(env, n))
+        ...         yield env.timeout(1)
+        ...
+        >>> proc = env.process(source(env))
+        >>> env.run(until=phases)
+        2
+        >>> latencies
+        [(1, 3), (2, 3)]
+
+    The run can be ended early with :meth:`stop()`, for example if the model
+    turns out to be unstable. Raise a :exc:`ValueError` if *warmup* or
+    *measure* is negative.
+
+    """
+    __slots__ = ('timed', 'warmup', 'measure', 'phase', 'admitted',
+                 'measured', 'completed', 'measuring', 'draining')
+
+    WARMUP = 'warmup'
+    """Name of the warm-up phase."""
+    MEASURE = 'measure'
+    """Name of the measurement phase."""
+    DRAIN = 'drain'
+    """Name of the drain phase."""
+
+    def __init__(self, env, measure, warmup=0, timed=False):
+        if warmup < 0:
+            raise ValueError('warmup(=%s) must be >= 0.' % warmup)
+        if measure < 0:
+            raise ValueError('measure(=%s) must be >= 0.' % measure)
+        super(PhaseController, self).__init__(env)
+        self.timed = timed
+        self.warmup = warmup
+        self.measure = measure
+        self.phase = self.WARMUP
+        """Name of the current phase."""
+        self.admitted = 0
+        """Number of admitted requests."""
+        self.measured = 0
+        """Number of admitted requests that are measured."""
+        self.completed = 0
+        """Number of measured requests that are complete."""
+        self.measuring = Event(env)
+        """Event that succeeds when the measurement phase starts."""
+        self.draining = Event(env)
+        """Event that succeeds when the drain phase starts."""
+
+        if not timed:
+            if warmup == 0:
+                self._start_measure()
+        elif warmup > 0:
+            env.timeout(warmup).callbacks.append(self._start_measure)
+        else:
+            self._start_measure()
+
+    def admit(self):
+        """Admit a new request and return ``True`` if it is measured."""
+        self.admitted += 1
+        if (not self.timed and self.phase is self.WARMUP and
+                self.admitted > self.warmup):
+            self._start_measure()
+        if self.phase is not self.MEASURE:
+            return False
+        self.measured += 1
+        if not self.timed and self.measured == self.measure:
+            self._start_drain()
+        return True
+
+    def complete(self, measured):
+        """Report that a request is complete. *measured* is the value that
+        :meth:`admit()` returned for it."""
+        if not measured:
+            return
+        self.completed += 1
+        if (self.phase is self.DRAIN and self.completed == self.measured and
+                self._value is PENDING):
+            self.succeed(self.completed)
+
+    def stop(self):
+        """End the run now, even if measured requests are outstanding."""
+        if self._value is PENDING:
+            self.succeed(self.completed)
+
+    def _start_measure(self, event=None):
+        self.phase = self.MEASURE
+        self.measuring.succeed()
+        if self.timed:
+            self.env.timeout(self.measure).callbacks.append(self._start_drain)
+        elif self.measure == 0:
+            self._start_drain()
+
+    def _start_drain(self, event=None):
+        self.phase = self.DRAIN
+        self.draining.succeed()
+        if self.completed == self.measured and self._value is PENDING:
+            self.succeed(self.completed)
@@ -0,0 +1,177 @@
+"""
+Tests for ``simpy.events.Actor``.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import pytest
+
+import simpy
+
+
+class Worker(simpy.Actor):
+    """Use *resource* for *duration* and return the time of completion."""
+    def __init__(self, env, name, resource, duration, log):
+        super(Worker, self).__init__(env)
+        self.name = name
+        self.resource = resource
+        self.duration = duration
+        self.log = log
+
+    def start(self):
+        self.log.append(('start', self.name, self.env.now))
+        self.request(self.resource, self.use)
+
+    def use(self, req):
+        self.req = req
+        self.log.append(('use', self.name, self.env.now))
+        self.sleep(self.duration, self.done)
+
+    def done(self, wakeup):
+        self.resource.release(self.req)
+        self.succeed(self.env.now)
+
+
+def test_actor(env, log):
+    resource = simpy.Resource(env, capacity=1)
+    a = Worker(env, 'a', resource, 2, log)
+    b = Worker(env, 'b', resource, 3, log)
+    assert log == []
+
+    env.run()
+    assert log == [('start', 'a', 0), ('start', 'b', 0),
+                   ('use', 'a', 0), ('use', 'b', 2)]
+    assert a.value == 2
+    assert b.value == 5
+    assert resource.count == 0
+
+
+def test_actor_order(env, log):
+    """Actors start and sleep in the same order as equivalent processes."""
+    class Sleeper(simpy.Actor):
+        def __init__(self, env, name):
+            super(Sleeper, self).__init__(env)
+            self.name = name
+
+        def start(self):
+            log.append((self.name, env.now))
+            self.sleep(1, self.wake)
+
+        def wake(self, wakeup):
+            log.append((self.name, env.now))
+            self.succeed()
+
+    def sleeper(env, name):
+        log.append((name, env.now))
+        yield env.timeout(1)
+        log.append((name, env.now))
+
+    env.process(sleeper(env, 'process-a'))
+    Sleeper(env, 'actor')
+    env.process(sleeper(env, 'process-b'))
+    env.run()
+    assert log == [('process-a', 0), ('actor', 0), ('process-b', 0),
+                   ('process-a', 1), ('actor', 1), ('process-b', 1)]
+
+
+def test_wait_for_actor(env):
+    """Processes can wait for actors to complete."""
+    resource = simpy.Resource(env, capacity=1)
+
+    def pem(env):
+        value = yield Worker(env, 'a', resource, 4, [])
+        assert value == 4
+        assert env.now == 4
+
+    proc = env.process(pem(env))
+    env.run()
+    assert proc.ok
+
+
+def test_wait_processed_event(env, log):
+    """Waiting for an already processed event calls the callback
+    immediately."""
+    event = env.event()
+    event.succeed('spam')
+
+    class Waiter(simpy.Actor):
+        def start(self):
+            self.sleep(1, self.later)
+
+        def later(self, wakeup):
+            self.wait(event, self.got)
+            log.append('waited')
+
+        def got(self, event):
+            log.append(event.value)
+
+    Waiter(env)
+    env.run()
+    assert log == ['spam', 'waited']
+
+
+def test_negative_sleep(env):
+    class Sleeper(simpy.Actor):
+        def start(self):
+            self.sleep(-1, None)
+
+    Sleeper(env)
+    with pytest.raises(ValueError, match='Negative delay -1'):
+        env.run()
+
+
+def test_sleep_twice(env):
+    """An actor cannot sleep again before it has woken up."""
+    class Sleeper(simpy.Actor):
+        def start(self):
+            self.sleep(1, self.wake)
+            self.sleep(2, self.wake)
+
+        def wake(self, wakeup):
+            self.succeed()
+
+    Sleeper(env)
+    with pytest.raises(RuntimeError, match='is already sleeping'):
+        env.run()
+
+
+def test_wait_cancelled_event(env):
+    timeout = env.timeout(1)
+    timeout.cancel()
+
+    class Waiter(simpy.Actor):
+        def start(self):
+            self.wait(timeout, self.got)
+
+        def got(self, event):
+            pass
+
+    Waiter(env)
+    with pytest.raises(RuntimeError, match='Cannot wait for the cancelled'):
+        env.run()
+
+
+def test_wait_wakeup(env):
+    """An actor cannot wait for the internal wakeup of a sleeping actor."""
+    class Sleeper(simpy.Actor):
+        def start(self):
+            self.sleep(5, self.wake)
+
+        def wake(self, wakeup):
+            self.succeed()
+
+    class Waiter(simpy.Actor):
+        def start(self):
+            self.wait(sleeper._wakeup, self.got)
+
+        def got(self, event):
+            pass
+
+    sleeper = Sleeper(env)
+    Waiter(env)
+    with pytest.raises(RuntimeError, match='Cannot wait for the internal'):
+        env.run()
+
+
+def test_start_not_implemented(env):
+    simpy.Actor(env)
+    pytest.raises(NotImplementedError, env.run)
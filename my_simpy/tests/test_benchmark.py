@@ -1,17 +1,20 @@
 """
 Performance benchmark tests using the `pytest-benchmark` package.
 
-Benchmarks are divided into three groups: *frequent*, *targeted*, and
-*simulation*. The *frequent* group benchmarks various simpy functions expected
-to be called frequently in normal simulations. The *targeted* group benchmarks
-singular behaviors run by the environment. The *simulation* group benchmarks
-complete simulations using processes and resources.
+Benchmarks are divided into five groups: *frequent*, *targeted*,
+*simulation*, *queue* and *store*. The *frequent* group benchmarks various
+simpy functions expected to be called frequently in normal simulations. The
+*targeted* group benchmarks singular behaviors run by the environment. The
+*simulation* group benchmarks complete simulations using processes and
+resources. The *queue* group compares the event queue backends. The *store*
+group benchmarks stores holding many items or many keys.
 
 """
 import random
 
 import pytest
 import simpy
+from simpy.queues import CalendarQueue, HeapQueue
 
 
 @pytest.mark.benchmark(group='frequent')
@@ -42,6 +45,16 @@ def test_environment_step(env, benchmark):
     benchmark(env.step)
 
 
+@pytest.mark.benchmark(group='frequent')
+def test_environment_step_delay(env, benchmark):
+    def g(env):
+        while True:
+            yield 1
+
+    env.process(g(env))
+    benchmark(env.step)
+
+
 @pytest.mark.benchmark(group='targeted')
 def test_condition_events(env, benchmark):
     def cond_proc(env):
@@ -161,3 +174,287 @@ def test_container_sim(benchmark):
 
     num_events = benchmark(sim)
     assert num_events == 104
+
+
+@pytest.mark.benchmark(group='simulation')
+@pytest.mark.parametrize('waiting', [10, 10**3, 10**4])
+def test_resource_queue_sim(benchmark, waiting):
+    """*waiting* processes queue for a resource with a single slot."""
+    def worker(env, resource):
+        with resource.request() as req:
+            yield req
+            yield env.timeout(1)
+
+    def sim():
+        env = simpy.Environment()
+        resource = simpy.FiniteQueueResource(env)
+        for _ in range(waiting):
+            env.process(worker(env, resource))
+        env.run()
+        return env.now
+
+    assert benchmark(sim) == waiting
+
+
+@pytest.mark.benchmark(group='simulation')
+@pytest.mark.parametrize('waiting', [10**2, 10**3, 10**4, 10**5])
+@pytest.mark.parametrize('preemptive', [False, True])
+def test_priority_resource_sim(benchmark, preemptive, waiting):
+    """*waiting* processes with random priorities request a resource at the
+    same time. The preemptive resource has *waiting* / 10 slots, so that every
+    request has to look for a user to preempt."""
+    if waiting > 10**4 and benchmark.disabled:
+        pytest.skip('Takes too long for a plain test run.')
+    r = random.Random(1234)
+
+    def worker(env, resource, priority):
+        try:
+            with resource.request(priority=priority) as req:
+                yield req
+                yield env.timeout(1)
+        except simpy.Interrupt:
+            pass
+
+    def sim():
+        env = simpy.Environment()
+        if preemptive:
+            resource = simpy.PreemptiveResource(env, capacity=waiting // 10)
+        else:
+            resource = simpy.PriorityResource(env)
+        for _ in range(waiting):
+            env.process(worker(env, resource, r.randint(0, 9)))
+        env.run()
+
+    benchmark(sim)
+
+
+@pytest.mark.benchmark(group='simulation')
+@pytest.mark.parametrize('capacity', [1, 64, 1024])
+def test_resource_users_sim(benchmark, capacity):
+    """Twice as many workers as the resource has slots (but at least 100)
+    request it 20 times each and hold it for a random time."""
+    r = random.Random(1234)
+    workers = max(2 * capacity, 100)
+
+    def worker(env, resource):
+        for _ in range(20):
+            with resource.request() as req:
+                yield req
+                yield env.timeout(r.expovariate(1.0))
+
+    def sim():
+        env = simpy.Environment()
+        resource = simpy.FiniteQueueResource(env, capacity=capacity)
+        for _ in range(workers):
+            env.process(worker(env, resource))
+        env.run()
+        return resource.count
+
+    assert benchmark(sim) == 0
+
+
+@pytest.mark.benchmark(group='simulation')
+@pytest.mark.parametrize('traced', [False, True])
+def test_traced_resource_sim(benchmark, tmpdir, traced):
+    """Same as test_resource_sim with and without a tracer. The run traces
+    about 48000 events, which fill the buffer of the tracer several times
+    and wrap around its file. The tracer is created in the setup of each
+    round in both cases, so that the time to allocate the file is not
+    measured. Stopping the tracer, which writes the remaining records and
+    the metadata, is measured."""
+    pytest.importorskip('numpy')
+    from simpy.tracing import Tracer
+
+    def worker(env, resource):
+        while True:
+            with resource.request() as req:
+                yield req
+                yield env.timeout(1)
+
+    def setup():
+        env = simpy.Environment()
+        resource = simpy.Resource(env, capacity=2)
+        for _ in range(5):
+            env.process(worker(env, resource))
+        tracer = Tracer(env, str(tmpdir.join('trace')), capacity=1 << 14)
+        return (env, tracer), {}
+
+    def sim(env, tracer):
+        if traced:
+            tracer.start()
+        env.run(until=8000)
+        tracer.stop()
+        return next(env._eid), tracer.count
+
+    num_events, num_records = benchmark.pedantic(sim, setup=setup, rounds=20)
+    assert num_events == 48004
+    assert num_records == (48002 if traced else 0)
+
+
+@pytest.mark.benchmark(group='targeted')
+@pytest.mark.parametrize('bulk', [False, True])
+def test_schedule_arrivals(benchmark, bulk):
+    """Schedule a block of 10000 future arrivals one by one or at once."""
+    r = random.Random(1234)
+    times = [r.uniform(0, 100) for _ in range(10000)]
+
+    def sim():
+        env = simpy.Environment()
+        for _ in range(1000):
+            env.timeout(r.uniform(0, 100))
+        events = [env.event() for _ in times]
+        if bulk:
+            env.schedule_many(events, times)
+        else:
+            for event, at in zip(events, times):
+                env.schedule(event, delay=at)
+        return len(env._queue)
+
+    assert benchmark(sim) == 11000
+
+
+@pytest.mark.benchmark(group='queue')
+@pytest.mark.parametrize('pending', [10**3, 10**5, 10**6])
+@pytest.mark.parametrize('event_queue', [HeapQueue, CalendarQueue])
+def test_event_queue_hold(benchmark, event_queue, pending):
+    """Classic "hold" model: the queue holds *pending* timeouts and every
+    processed timeout schedules a new one with a random delay."""
+    if pending > 10**5 and benchmark.disabled:
+        pytest.skip('Filling the queue takes too long for a plain test run.')
+
+    env = simpy.Environment(event_queue=event_queue)
+    r = random.Random(1234)
+    steps = 10000
+
+    def hold(event):
+        env.timeout(r.expovariate(1.0)).callbacks.append(hold)
+
+    for _ in range(pending):
+        env.timeout(r.expovariate(1.0)).callbacks.append(hold)
+
+    def sim():
+        for _ in range(steps):
+            env.step()
+
+    benchmark(sim)
+    assert len(env._queue) == pending
+    if benchmark.stats:
+        benchmark.extra_info['events_per_sec'] = (
+            steps / benchmark.stats.stats.mean)
+
+
+@pytest.mark.benchmark(group='store')
+@pytest.mark.parametrize('depth', [10, 10**3, 10**5])
+def test_store_depth(env, benchmark, depth):
+    """Get 1000 items from a store holding *depth* items and put each one
+    back."""
+    store = simpy.Store(env)
+    store.items.extend(range(depth))
+
+    def sim():
+        for _ in range(1000):
+            store.put(store.get().value)
+        env.run()
+
+    benchmark(sim)
+    assert len(store.items) == depth
+
+
+@pytest.mark.benchmark(group='store')
+def test_store_waiting_getter(env, benchmark):
+    """Items are put into a store whose consumer is already waiting."""
+    store = simpy.Store(env)
+
+    def consumer(env, store):
+        while True:
+            yield store.get()
+
+    def producer(env, store):
+        for i in range(1000):
+            yield store.put(i)
+            yield env.timeout(1)
+
+    env.process(consumer(env, store))
+
+    def sim():
+        env.process(producer(env, store))
+        env.run()
+
+    benchmark(sim)
+    assert not store.items
+
+
+@pytest.mark.benchmark(group='store')
+@pytest.mark.parametrize('keys', [16, 128, 1024])
+@pytest.mark.parametrize('keyed', [False, True])
+def test_partitioned_store(benchmark, keyed, keys):
+    """A dispatcher puts 1000 requests for random partitions into
+    a :class:`~simpy.resources.store.KeyedStore` or
+    a :class:`~simpy.resources.store.FilterStore`. One worker per partition
+    gets the requests of its partition. Every put into the filter store
+    checks the filters of all idle workers."""
+    if keys > 128 and not keyed and benchmark.disabled:
+        pytest.skip('Takes too long for a plain test run.')
+    r = random.Random(1234)
+    partitions = [r.randrange(keys) for _ in range(1000)]
+
+    def dispatcher(env, store):
+        for partition in partitions:
+            if keyed:
+                yield store.put(partition, partition)
+            else:
+                yield store.put(partition)
+            yield env.timeout(r.expovariate(keys / 2.0))
+
+    def worker(env, store, partition):
+        while True:
+            if keyed:
+                yield store.get(partition)
+            else:
+                yield store.get(lambda item: item == partition)
+            yield env.timeout(r.expovariate(1.0))
+
+    def sim():
+        env = simpy.Environment()
+        store = simpy.KeyedStore(env) if keyed else simpy.FilterStore(env)
+        env.process(dispatcher(env, store))
+        for partition in range(keys):
+            env.process(worker(env, store, partition))
+        env.run()
+        return len(store.get_queue)
+
+    assert benchmark(sim) == keys
+
+
+@pytest.mark.benchmark(group='store')
+@pytest.mark.parametrize('batch', [1, 8, 64])
+def test_store_batches(benchmark, batch):
+    """A producer moves 10000 items through a store to a consumer in batches
+    of *batch* items (one by one for a batch of 1)."""
+    items = list(range(10000))
+
+    def producer(env, store):
+        for start in range(0, len(items), batch):
+            if batch == 1:
+                yield store.put(items[start])
+            else:
+                yield store.put_many(items[start:start + batch])
+            yield env.timeout(1)
+
+    def consumer(env, store, received):
+        while True:
+            if batch == 1:
+                received.append((yield store.get()))
+            else:
+                received.extend((yield store.get_many(batch)))
+
+    def sim():
+        env = simpy.Environment()
+        store = simpy.Store(env)
+        received = []
+        env.process(producer(env, store))
+        env.process(consumer(env, store, received))
+        env.run()
+        return received
+
+    assert benchmark(sim) == items
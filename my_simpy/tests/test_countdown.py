@@ -0,0 +1,66 @@
+"""
+Tests for ``simpy.events.CountdownEvent``.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import pytest
+
+import simpy
+
+
+def test_countdown(env, log):
+    latch = simpy.CountdownEvent(env, 3)
+
+    def worker(env, delay):
+        yield delay
+        log.append(('done', delay))
+        latch.count_down()
+
+    def waiter(env):
+        yield latch
+        log.append(('latch', env.now))
+
+    for delay in (3, 1, 2):
+        env.process(worker(env, delay))
+    env.process(waiter(env))
+    env.run()
+    assert log == [('done', 1), ('done', 2), ('done', 3), ('latch', 3)]
+    assert latch.remaining == 0
+    pytest.raises(RuntimeError, latch.count_down)
+
+
+def test_countdown_as_callback(env):
+    latch = simpy.CountdownEvent(env, 2)
+    for delay in (1, 2):
+        env.timeout(delay).callbacks.append(latch.count_down)
+    env.run(until=latch)
+    assert env.now == 2
+    assert latch.ok
+
+
+def test_countdown_zero(env):
+    latch = simpy.CountdownEvent(env, 0)
+    assert latch.triggered
+    env.run()
+    assert latch.processed
+
+
+def test_countdown_failed_event(env):
+    latch = simpy.CountdownEvent(env, 2)
+    failed = env.event().fail(ValueError('spam'))
+    failed.callbacks.append(latch.count_down)
+    env.timeout(1).callbacks.append(latch.count_down)
+
+    def waiter(env):
+        with pytest.raises(ValueError, match='spam'):
+            yield latch
+        return env.now
+
+    proc = env.process(waiter(env))
+    env.run()
+    assert proc.value == 0
+    assert latch.remaining == 0
+
+
+def test_countdown_negative(env):
+    pytest.raises(ValueError, simpy.CountdownEvent, env, -1)
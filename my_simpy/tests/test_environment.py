@@ -5,6 +5,8 @@ General test for the the `simpy.core.Environment`.
 # Pytest gets the parameters "env" and "log" from the *conftest.py* file
 import pytest
 
+import simpy
+
 
 def test_event_queue_empty(env, log):
     """The simulation should stop if there are no more events, that means, no
@@ -70,3 +72,262 @@ def test_run_with_untriggered_event(env):
     excinfo = pytest.raises(RuntimeError, env.run, until=env.event())
     assert str(excinfo.value).startswith('No scheduled events left but "until"'
                                          ' event was not triggered:')
+
+
+def test_zero_delay_order(env, log):
+    """Events due now are processed by priority and then in the order in
+    which they were scheduled, even if some of them were scheduled earlier
+    with a delay and wait in the event queue."""
+    def schedule(name, priority, delay, callback=log.append):
+        event = env.event()
+        event._ok, event._value = True, name
+        event.callbacks.append(lambda event: callback(event.value))
+        env.schedule(event, priority, delay)
+
+    def trigger(name):
+        schedule('lane-normal', simpy.events.NORMAL, 0)
+        schedule('lane-urgent', simpy.events.URGENT, 0)
+        schedule('heap-late', simpy.events.NORMAL, 1)
+        schedule('lane-custom', -1, 0)
+
+    schedule('trigger', simpy.events.URGENT, 1, trigger)
+    schedule('heap-normal', simpy.events.NORMAL, 1)
+    schedule('heap-urgent', simpy.events.URGENT, 1)
+    env.run()
+
+    assert log == ['lane-custom', 'heap-urgent', 'lane-urgent',
+                   'heap-normal', 'lane-normal', 'heap-late']
+
+
+def test_zero_delay_lanes_count_event_ids(env):
+    """Events in the zero delay lanes draw event IDs, too."""
+    env.event().succeed()
+    env.timeout(0)
+    env.timeout(1)
+    assert next(env._eid) == 3
+    assert env.peek() == 0
+
+    env.step()
+    env.step()
+    assert env.peek() == 1
+
+
+def test_schedule_many(env, log):
+    """Bulk scheduled events are processed like individually scheduled ones,
+    in the order of the events for equal times."""
+    def arrival(name):
+        event = env.event()
+        event._ok = True
+        event._value = name
+        event.callbacks.append(lambda e: log.append((env.now, e.value)))
+        return event
+
+    env.timeout(2).callbacks.append(lambda e: log.append((env.now, 'timeout')))
+    env.schedule_many([arrival(name) for name in 'abcde'], [3, 0, 2, 0, 3])
+    assert next(env._eid) == 6
+    env.run()
+    assert log == [(0, 'b'), (0, 'd'), (2, 'timeout'), (2, 'c'), (3, 'a'),
+                   (3, 'e')]
+
+
+def test_schedule_many_errors(env):
+    env.run(until=5)
+    with pytest.raises(ValueError, match='Got 1 events but 2 times'):
+        env.schedule_many([env.event()], [6, 7])
+    with pytest.raises(ValueError, match='Time 4 lies before'):
+        env.schedule_many([env.event(), env.event()], [6, 4])
+    assert env.peek() == simpy.core.Infinity
+
+
+def test_schedule_many_numpy(env, log):
+    """The times may be given as a numpy array, also to the generic
+    implementation of the base class."""
+    numpy = pytest.importorskip('numpy')
+
+    def arrival(name):
+        event = env.event()
+        event._ok = True
+        event._value = name
+        event.callbacks.append(lambda e: log.append((env.now, e.value)))
+        return event
+
+    env.schedule_many([], numpy.array([]))
+    env.schedule_many([arrival(name) for name in 'abc'],
+                      numpy.array([2.0, 0.0, 1.5]))
+    env.run()
+    assert log == [(0, 'b'), (1.5, 'c'), (2, 'a')]
+    with pytest.raises(ValueError, match='lies before'):
+        env.schedule_many([env.event()], numpy.array([1.0]))
+
+    base = simpy.core.BaseEnvironment
+    base.schedule_many(env, [], numpy.array([]))
+    base.schedule_many(env, [arrival('d')], numpy.array([3.0]))
+    env.run()
+    assert log[-1] == (3, 'd')
+    with pytest.raises(ValueError, match='lies before'):
+        base.schedule_many(env, [env.event()], numpy.array([1.0]))
+
+
+def test_cancel_compaction(env):
+    """The event queue is compacted once most of its entries are
+    cancelled."""
+    timeouts = [env.timeout(i) for i in range(1, 1001)]
+    for timeout in timeouts[:500]:
+        timeout.cancel()
+    assert env._ncompactions == 0
+    assert len(env._queue) == 1000
+
+    timeouts[500].cancel()
+    assert env._ncompactions == 1
+    assert len(env._queue) == 499
+    assert env._dead == 0
+
+    env.run()
+    assert env.now == 1000
+    assert env._ncancelled == 501
+
+
+def test_cancel_compaction_due_now(env):
+    """Cancelled events due now count towards the compaction threshold
+    together with the events due now, and are removed by the compaction."""
+    env.timeout(1)
+    events = [env.event().succeed(i) for i in range(200)]
+    for event in events[:100]:
+        event.cancel()
+    assert env._ncompactions == 0
+
+    events[100].cancel()
+    assert env._ncompactions == 1
+    assert env._dead == 0
+    assert len(env._lanes[1]) == 99
+
+    # Further cancellations do not trigger compactions of their own.
+    for event in events[101:150]:
+        event.cancel()
+    assert env._ncompactions == 1
+
+    values = []
+    for event in events[150:]:
+        event.callbacks.append(lambda e: values.append(e.value))
+    env.run()
+    assert values == list(range(150, 200))
+    assert env.now == 1
+
+
+def test_inline_resumption(log):
+    """With inline resumption, a process continues right away if it yields
+    an already triggered event."""
+    def consumer(env, store, name):
+        for _ in range(2):
+            item = yield store.get()
+            log.append((name, item))
+
+    def other(env):
+        log.append(('other', None))
+        yield env.timeout(0)
+
+    for inline_limit in (0, 10):
+        env = simpy.Environment(inline_limit=inline_limit)
+        assert env.inline_limit == inline_limit
+        store = simpy.Store(env)
+        store.items.extend([1, 2, 3, 4])
+        env.process(consumer(env, store, 'a'))
+        env.process(other(env))
+        env.process(consumer(env, store, 'b'))
+        env.run()
+
+    assert log[:5] == [('other', None), ('a', 1), ('b', 2), ('a', 3),
+                       ('b', 4)]
+    assert log[5:] == [('a', 1), ('a', 2), ('other', None), ('b', 3),
+                       ('b', 4)]
+
+
+def test_inline_limit(log):
+    """The number of events a process is resumed with inline in a row is
+    limited."""
+    def pem(env, name, n):
+        for i in range(n):
+            yield env.event().succeed()
+            log.append((name, i))
+
+    env = simpy.Environment(inline_limit=2)
+    env.process(pem(env, 'a', 5))
+    env.process(pem(env, 'b', 5))
+    env.run()
+    assert log == [('a', 0), ('a', 1), ('b', 0), ('b', 1), ('a', 2),
+                   ('a', 3), ('a', 4), ('b', 2), ('b', 3), ('b', 4)]
+
+
+def test_inline_resumption_exclusions(log):
+    """Timeouts, conditions and failed events are never resumed inline."""
+    def pem(env):
+        yield env.timeout(0)
+        log.append('timeout')
+        a, b = env.event().succeed(1), env.event().succeed(2)
+        value = yield a & b
+        assert value == {a: 1, b: 2}
+        log.append('condition')
+        try:
+            yield env.event().fail(ValueError())
+        except ValueError:
+            log.append('failed')
+
+    def other(env):
+        log.append('other')
+        yield env.event().succeed()
+
+    env = simpy.Environment(inline_limit=1)
+    env.process(pem(env))
+    env.process(other(env))
+    env.run()
+    assert log == ['other', 'timeout', 'condition', 'failed']
+
+
+def test_negative_inline_limit():
+    pytest.raises(ValueError, simpy.Environment, inline_limit=-1)
+
+
+def ticker(env):
+    while True:
+        yield env.timeout(1)
+
+
+def test_run_progress(env, log):
+    """The progress callback is called every progress_events events."""
+    env.process(ticker(env))
+    env.run(until=10, progress=lambda now, events, rate: log.append(
+        (now, events)), progress_events=4)
+    assert log == [(3, 4), (7, 8)]
+
+
+def test_run_progress_interval(env, log):
+    """Without progress_events, progress is reported every
+    progress_interval seconds, which are checked every CHECK_EVENTS
+    events."""
+    env.CHECK_EVENTS = 3
+    env.process(ticker(env))
+    env.run(until=10, progress=lambda now, events, rate: log.append(
+        (now, events, rate > 0)), progress_interval=0)
+    assert log == [(2, 3, True), (5, 6, True), (8, 9, True)]
+
+
+def test_run_budget(env):
+    """A run that exceeds its budget stops and can be continued."""
+    env.process(ticker(env))
+    until = env.timeout(100, value='spam')
+    with pytest.raises(simpy.core.BudgetExceeded):
+        env.run(until=until, budget=0, progress_events=5)
+    assert env.now == 4
+    assert not until.processed
+
+    # The until event of the stopped run does not stop the next one.
+    env.run(until=50)
+    assert env.now == 50
+    assert env.run(until=until) == 'spam'
+    assert env.now == 100
+
+
+def test_run_budget_not_exceeded(env):
+    env.process(ticker(env))
+    assert env.run(until=env.timeout(5, value='spam'), budget=60) == 'spam'
+    assert env.now == 5
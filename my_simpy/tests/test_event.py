@@ -7,6 +7,8 @@ import re
 
 import pytest
 
+import simpy
+
 
 def test_succeed(env):
     """Test for the Environment.event() helper function."""
@@ -135,3 +137,61 @@ def test_condition_nested_callback_removal(env):
         # b_and_c may have a _build_value callback.
         assert cb.__name__ != '_check'
     assert not a_or_b_and_c.callbacks
+
+
+def test_cancel(env, log):
+    """A cancelled event is skipped: its callbacks are not invoked and the
+    time does not advance to it."""
+    a, b = env.timeout(1), env.timeout(5)
+    for event in (a, b):
+        event.callbacks.append(lambda e: log.append(env.now))
+    b.cancel()
+    b.cancel()
+    env.run()
+    assert log == [1]
+    assert env.now == 1
+    assert b.triggered and not b.processed
+
+
+def test_cancel_due_now(env, log):
+    event = env.event().succeed()
+    event.callbacks.append(lambda e: log.append('cancelled'))
+    env.event().succeed().callbacks.append(lambda e: log.append('other'))
+    event.cancel()
+    assert env.peek() == 0
+    env.run()
+    assert log == ['other']
+
+
+def test_cancel_errors(env):
+    event = env.event()
+    with pytest.raises(RuntimeError, match='has not been triggered'):
+        event.cancel()
+    event.succeed()
+    env.run()
+    with pytest.raises(RuntimeError, match='has already been processed'):
+        event.cancel()
+
+
+def test_yield_cancelled_event(env):
+    def pem(env, event):
+        yield event
+
+    timeout = env.timeout(1)
+    timeout.cancel()
+    env.process(pem(env, timeout))
+    with pytest.raises(RuntimeError, match='Cannot wait for the cancelled'):
+        env.run()
+
+
+def test_yield_cancelled_event_inline():
+    """Cancelled events are not resumed inline."""
+    def pem(env):
+        event = env.event().succeed('spam')
+        event.cancel()
+        yield event
+
+    env = simpy.Environment(inline_limit=8)
+    env.process(pem(env))
+    with pytest.raises(RuntimeError, match='Cannot wait for the cancelled'):
+        env.run()
@@ -0,0 +1,86 @@
+"""
+Tests for the memory footprint of events and resource requests.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import tracemalloc
+
+import pytest
+
+import simpy
+from simpy.events import Timeout
+
+
+class DictTimeout(Timeout):
+    """Replica of the former timeout event with a per-instance ``__dict__``
+    and an eagerly created callback list."""
+    def __init__(self, env, delay, value=None):
+        super(DictTimeout, self).__init__(env, delay, value)
+        self.callbacks = []
+
+
+def bytes_per_event(create, n=10000):
+    """Return the number of bytes allocated per pending event by *n* calls of
+    *create(i)*."""
+    tracemalloc.start()
+    try:
+        events = [create(i) for i in range(n)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(events) == n
+    return size / n
+
+
+def test_no_instance_dict(env):
+    def pem(env):
+        yield env.timeout(1)
+
+    resource = simpy.Resource(env)
+    store = simpy.Store(env)
+    for event in (env.event(), env.timeout(1), env.process(pem(env)),
+                  resource.request(), store.put(1), store.get(),
+                  env.all_of([]), env.any_of([]),
+                  simpy.CountdownEvent(env, 1)):
+        assert not hasattr(event, '__dict__'), type(event).__name__
+
+
+def test_lazy_callbacks(env):
+    """The callback list is only created when somebody subscribes."""
+    event = env.timeout(1)
+    assert event._callbacks == ()
+    assert event.callbacks == []
+    assert type(event._callbacks) is list
+    env.run()
+    assert event.callbacks is None
+    assert event.processed
+
+
+def test_pending_event_size(env):
+    before = bytes_per_event(lambda i: DictTimeout(env, i + 1))
+    after = bytes_per_event(lambda i: env.timeout(i + 1))
+    print('bytes per pending timeout: before %.1f, after %.1f' %
+          (before, after))
+    assert after < before
+
+
+@pytest.mark.parametrize('with_statement', [True, False])
+def test_request_with_statement(env, with_statement):
+    """Slotted requests still release the resource in a with statement."""
+    resource = simpy.Resource(env, capacity=1)
+
+    def pem(env):
+        if with_statement:
+            with resource.request() as req:
+                yield req
+                assert req.usage_since == 0
+                yield env.timeout(1)
+        else:
+            req = resource.request()
+            yield req
+            yield env.timeout(1)
+            resource.release(req)
+
+    env.process(pem(env))
+    env.run()
+    assert resource.count == 0
@@ -3,9 +3,11 @@ Tests for the ``simpy.events.Process``.
 
 """
 # Pytest gets the parameters "env" and "log" from the *conftest.py* file
+from fractions import Fraction
+
 import pytest
 
-from simpy import Interrupt
+from simpy import Environment, Interrupt
 
 
 def test_start_non_process(env):
@@ -203,3 +205,154 @@ def test_error_and_interrupted_join(env):
 
     env.process(parent(env))
     pytest.raises(AttributeError, env.run)
+
+
+def test_yield_delay(env, log):
+    """A process can yield a number to wait for that delay."""
+    def pem(env, log):
+        yield 1
+        log.append(env.now)
+        yield 0.5
+        log.append(env.now)
+        yield 0
+        log.append(env.now)
+        yield Fraction(1, 2)
+        log.append(env.now)
+
+    env.process(pem(env, log))
+    env.run()
+    assert log == [1, 1.5, 1.5, 2]
+
+
+def test_yield_delay_order(env, log):
+    """Delays are processed in the same order as equivalent timeouts."""
+    def pem(env, name, delays, log):
+        for delay in delays:
+            if name.startswith('number'):
+                yield delay
+            else:
+                yield env.timeout(delay)
+            log.append((env.now, name))
+
+    env.process(pem(env, 'number-a', [1, 0, 2], log))
+    env.process(pem(env, 'timeout-a', [1, 0, 2], log))
+    env.process(pem(env, 'number-b', [1, 0, 2], log))
+    env.run()
+    assert log == [(1, 'number-a'), (1, 'timeout-a'), (1, 'number-b')] * 2 + \
+        [(3, 'number-a'), (3, 'timeout-a'), (3, 'number-b')]
+
+
+def test_yield_delay_reuses_wakeup(env):
+    def pem(env):
+        for _ in range(3):
+            yield 1
+            wakeups.append(proc._wakeup)
+
+    wakeups = []
+    proc = env.process(pem(env))
+    env.run()
+    assert len(set(map(id, wakeups))) == 1
+
+
+def test_yield_wakeup(env):
+    """The wakeup of a process waiting for a delay cannot be yielded by
+    other processes."""
+    def sleeper(env):
+        yield 10
+
+    def waiter(env, proc):
+        yield proc.target
+
+    proc = env.process(sleeper(env))
+    env.run(until=1)
+    env.process(waiter(env, proc))
+    with pytest.raises(RuntimeError) as excinfo:
+        env.run()
+    assert 'Cannot wait for the internal wakeup' in excinfo.value.args[0]
+
+
+def test_yield_wakeup_inline():
+    """An armed wakeup is not resumed inline, although it looks like
+    a triggered event."""
+    def sleeper(env):
+        yield 10
+
+    def waiter(env, proc):
+        yield env.timeout(1)
+        yield proc.target
+
+    env = Environment(inline_limit=8)
+    proc = env.process(sleeper(env))
+    env.process(waiter(env, proc))
+    with pytest.raises(RuntimeError) as excinfo:
+        env.run()
+    assert 'Cannot wait for the internal wakeup' in excinfo.value.args[0]
+    assert env.now == 1
+
+
+def test_yield_negative_delay(env):
+    """A negative delay is thrown into the process as a ValueError."""
+    def pem(env):
+        try:
+            yield -1
+            pytest.fail('Expected a ValueError')
+        except ValueError as exc:
+            assert exc.args[0] == 'Negative delay -1'
+        yield 1
+        return 'done'
+
+    proc = env.process(pem(env))
+    env.run()
+    assert proc.value == 'done'
+    assert env.now == 1
+
+
+def test_interrupt_delay(env, log):
+    """A process waiting for a delay can be interrupted. The abandoned delay
+    does not resume it again."""
+    def child(env, log):
+        try:
+            yield 10
+        except Interrupt:
+            log.append(('interrupted', env.now))
+        yield 15
+        log.append(('done', env.now))
+
+    def parent(env, child_proc):
+        yield 5
+        child_proc.interrupt()
+
+    child_proc = env.process(child(env, log))
+    env.process(parent(env, child_proc))
+    env.run()
+    assert log == [('interrupted', 5), ('done', 20)]
+
+
+def test_interrupt_delay_cancels_wakeup(env):
+    """The wakeup of an interrupted delay is cancelled, so the simulation
+    ends with the interrupt instead of at the end of the delay."""
+    def child(env):
+        try:
+            yield 10
+        except Interrupt:
+            pass
+
+    def parent(env, child_proc):
+        yield 5
+        child_proc.interrupt()
+
+    child_proc = env.process(child(env))
+    env.process(parent(env, child_proc))
+    env.run()
+    assert env.now == 5
+    assert env._ncancelled == 1
+    assert env.peek() == float('inf')
+
+
+def test_yield_bool(env):
+    """Booleans are not accepted as delays."""
+    def pem(env):
+        yield True
+
+    env.process(pem(env))
+    pytest.raises(RuntimeError, env.run)
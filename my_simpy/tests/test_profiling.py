@@ -0,0 +1,74 @@
+"""
+Tests for the ``simpy.profiling.Profiler``.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import pytest
+
+import simpy
+from simpy.profiling import Profiler
+
+
+def producer(env, store):
+    for i in range(3):
+        yield env.timeout(1)
+        yield store.put(i)
+
+
+def consumer(env, store):
+    while True:
+        yield store.get()
+
+
+def test_profiler(env):
+    store = simpy.Store(env)
+    env.process(producer(env, store))
+    env.process(consumer(env, store))
+    env.timeout(0.5)
+
+    with Profiler(env) as profiler:
+        env.run()
+
+    assert profiler.events['Timeout'][0] == 4
+    assert profiler.events['Initialize'][0] == 2
+    assert profiler.events['StorePut'][0] == 3
+    assert profiler.events['StoreGet'][0] == 3
+    assert profiler.callbacks['producer'][0] == 7
+    assert profiler.callbacks['consumer'][0] == 4
+    assert all(wall >= 0 for _, wall in profiler.events.values())
+    assert profiler.max_queue_size == 3
+    assert profiler.sim_time == 3
+    assert profiler.speed > 0
+
+    report = profiler.report()
+    assert 'Max. scheduled events: 3' in report
+    assert 'producer' in report
+
+
+def test_profiler_restores_step(env):
+    profiler = Profiler(env)
+    profiler.start()
+    assert env.step == profiler._step
+    pytest.raises(RuntimeError, Profiler(env).start)
+    profiler.stop()
+    assert 'step' not in env.__dict__
+    assert env.step.__func__ is simpy.Environment.step
+
+
+def test_profiler_failed_event(env):
+    """Failed events crash the environment like without profiling."""
+    env.event().fail(ValueError('spam'))
+    with Profiler(env) as profiler:
+        pytest.raises(ValueError, env.run)
+    assert profiler.events['Event'][0] == 1
+
+
+def test_profiler_cancelled(env):
+    env.timeout(1)
+    with Profiler(env) as profiler:
+        env.timeout(2).cancel()
+        env.run()
+    assert env.now == 1
+    assert profiler.cancelled == 1
+    assert profiler.events['Timeout'][0] == 1
+    assert 'Cancelled events: 1, compactions: 0' in profiler.report()
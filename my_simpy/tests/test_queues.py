@@ -0,0 +1,169 @@
+"""
+Tests for the event queue backends of the `simpy.core.Environment`.
+
+"""
+import random
+
+import pytest
+
+import simpy
+from simpy.queues import CalendarQueue, HeapQueue
+
+
+@pytest.fixture(params=[HeapQueue, CalendarQueue])
+def queue_type(request):
+    return request.param
+
+
+def test_empty_queue(queue_type):
+    queue = queue_type()
+    assert len(queue) == 0
+    pytest.raises(IndexError, queue.pop)
+    pytest.raises(IndexError, queue.peek)
+
+
+def test_queue_order(queue_type):
+    """Entries are retrieved by time, then priority and then event ID."""
+    rnd = random.Random(42)
+    queue = queue_type()
+    items = [(rnd.randint(0, 50) * 0.5, rnd.randint(0, 1), eid, None)
+             for eid in range(1000)]
+    for item in items:
+        queue.push(item)
+
+    assert len(queue) == len(items)
+    assert queue.peek() == min(items)
+    assert [queue.pop() for _ in items] == sorted(items)
+
+
+def test_queue_hold_order(queue_type):
+    """Interleaved push and pop operations (the classic "hold" model) yield
+    the same sequence for all backends."""
+    rnd = random.Random(23)
+    queue, reference = queue_type(), HeapQueue()
+    now, eid = 0, 0
+    for eid in range(200):
+        item = (rnd.expovariate(1.0), 1, eid, None)
+        queue.push(item)
+        reference.push(item)
+
+    for eid in range(200, 20000):
+        item = queue.pop()
+        assert item == reference.pop()
+        assert item[0] >= now
+        now = item[0]
+        # Let the queue grow and shrink over time.
+        for _ in range(rnd.choice([0, 1, 1, 2])):
+            eid += 1
+            item = (now + rnd.expovariate(1.0) * rnd.choice([0, 1, 10]),
+                    rnd.randint(0, 1), eid, None)
+            queue.push(item)
+            reference.push(item)
+
+    while len(reference):
+        assert queue.pop() == reference.pop()
+    assert len(queue) == 0
+
+
+@pytest.mark.parametrize('block', [1, 10, 1000])
+def test_queue_push_many(queue_type, block):
+    """Bulk insertion keeps the order of small and large blocks."""
+    rnd = random.Random(7)
+    queue = queue_type()
+    items = [(rnd.randint(0, 100) * 0.5, rnd.randint(0, 1), eid, None)
+             for eid in range(2000)]
+    for item in items[:100]:
+        queue.push(item)
+    for start in range(100, len(items), block):
+        queue.push_many(items[start:start + block])
+
+    assert len(queue) == len(items)
+    assert [queue.pop() for _ in items] == sorted(items)
+
+
+def test_queue_remove_if(queue_type):
+    rnd = random.Random(3)
+    queue = queue_type()
+    items = [(rnd.expovariate(1.0), 1, eid, None) for eid in range(500)]
+    items.append((float('inf'), 1, 500, None))
+    for item in items:
+        queue.push(item)
+    queue.peek()
+
+    queue.remove_if(lambda item: item[2] % 3 == 0)
+    kept = sorted(item for item in items if item[2] % 3)
+    assert len(queue) == len(kept)
+    assert [queue.pop() for _ in kept] == kept
+
+
+def test_calendar_queue_peek_then_push():
+    """Pushing an entry that precedes the result of a previous peek works."""
+    queue = CalendarQueue()
+    queue.push((100, 1, 0, None))
+    assert queue.peek() == (100, 1, 0, None)
+    queue.push((3, 1, 1, None))
+    assert queue.pop() == (3, 1, 1, None)
+    assert queue.pop() == (100, 1, 0, None)
+
+
+def test_calendar_queue_infinity():
+    queue = CalendarQueue()
+    inf = float('inf')
+    queue.push((inf, 0, 0, None))
+    queue.push((1, 1, 1, None))
+    assert len(queue) == 2
+    assert queue.pop() == (1, 1, 1, None)
+    assert queue.peek() == (inf, 0, 0, None)
+    assert queue.pop() == (inf, 0, 0, None)
+    pytest.raises(IndexError, queue.pop)
+
+
+def test_calendar_queue_resize():
+    queue = CalendarQueue()
+    for eid in range(1000):
+        queue.push((eid * 0.1, 1, eid, None))
+    assert queue.nbuckets >= 500
+    assert queue.width == pytest.approx(1.2)
+
+    for eid in range(990):
+        assert queue.pop()[2] == eid
+    assert queue.nbuckets == CalendarQueue.MIN_BUCKETS
+
+
+def test_calendar_queue_width():
+    pytest.raises(ValueError, CalendarQueue, 0)
+
+
+def test_environment_backends(queue_type):
+    """All backends process the events of a simulation in the same order."""
+    def pem(env, name, log):
+        for delay in (3, 0, 1.5, 0, 2):
+            yield env.timeout(delay)
+            log.append((env.now, name))
+
+    logs = []
+    for event_queue in (HeapQueue, queue_type):
+        env = simpy.Environment(event_queue=event_queue)
+        log = []
+        for name in 'abc':
+            env.process(pem(env, name, log))
+        env.run()
+        logs.append(log)
+        assert type(env._queue) is event_queue
+
+    assert logs[0] == logs[1]
+
+
+def test_environment_peek(queue_type):
+    env = simpy.Environment(event_queue=queue_type)
+    assert env.peek() == simpy.core.Infinity
+    env.timeout(5)
+    assert env.peek() == 5
+
+
+def test_environment_default_backend():
+    class CalendarEnvironment(simpy.Environment):
+        EventQueue = CalendarQueue
+
+    assert type(simpy.Environment()._queue) is HeapQueue
+    assert type(CalendarEnvironment()._queue) is CalendarQueue
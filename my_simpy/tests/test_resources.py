@@ -237,6 +237,30 @@ def test_sorted_queue_maxlen(env):
     env.run()
 
 
+def test_sorted_queue(env):
+    """Requests are sorted by their key, requests with equal keys stay in the
+    order in which they were made. Removed requests are skipped."""
+    resource = simpy.PriorityResource(env, capacity=1)
+    resource.request(priority=0)
+    requests = [resource.request(priority=prio) for prio in (3, 1, 2, 1, 0)]
+    queue = resource.queue
+    assert list(queue) == [requests[i] for i in (4, 1, 3, 2, 0)]
+
+    queue.remove(requests[4])
+    queue.remove(requests[1])
+    pytest.raises(ValueError, queue.remove, requests[1])
+    assert len(queue) == 3
+    assert queue[0] is requests[3]
+    assert queue[1] is requests[2]
+
+    del queue[0]
+    assert list(queue) == [requests[2], requests[0]]
+    queue.remove(requests[2])
+    del queue[0]
+    assert len(queue) == 0
+    pytest.raises(IndexError, queue.__getitem__, 0)
+
+
 def test_get_users(env):
     def process(env, resource):
         with resource.request() as req:
@@ -254,6 +278,71 @@ def test_get_users(env):
     assert [evt.proc for evt in resource.queue] == procs[2:]
 
 
+def test_users_view(env):
+    """users is a live view of the requests holding the resource in the
+    order in which they got it."""
+    resource = simpy.Resource(env, 3)
+    requests = [resource.request() for _ in range(4)]
+    users = resource.users
+    assert list(users) == requests[:3]
+
+    resource.release(requests[1])
+    env.run()
+    assert list(users) == [requests[0], requests[2], requests[3]]
+    assert requests[1] not in users
+    assert resource.count == len(users) == 3
+
+
+def test_finite_queue_resource(env, log):
+    """Requests that find the queue full fail and are counted."""
+    def user(env, resource, name):
+        with resource.request() as req:
+            try:
+                yield req
+            except simpy.Interrupt as exc:
+                log.append((name, exc.cause))
+                return
+            yield env.timeout(1)
+            log.append((name, env.now))
+
+    resource = simpy.FiniteQueueResource(env, capacity=1, queueDepth=0)
+    for name in 'abc':
+        env.process(user(env, resource, name))
+    env.run()
+
+    # The queue holds one request more than queueDepth.
+    assert log == [('c', 'maxQDepthExceeded'), ('a', 1), ('b', 2)]
+    assert resource.rejections == 1
+
+
+def test_finite_queue_try_request(env, log):
+    """try_request() returns None instead of failing if the queue is
+    full."""
+    def user(env, resource, name):
+        retry = False
+        while True:
+            req = resource.try_request(retry)
+            if req is not None:
+                break
+            retry = True
+            yield env.timeout(1)
+        with req:
+            yield req
+            yield env.timeout(2)
+            log.append((name, env.now))
+
+    resource = simpy.FiniteQueueResource(env, capacity=1, queueDepth=0)
+    for name in 'abc':
+        env.process(user(env, resource, name))
+    env.run()
+
+    # c is rejected at 0, 1 and 2 (b only leaves the queue after a's
+    # release has been processed) and queued at 3.
+    assert log == [('a', 2), ('b', 4), ('c', 6)]
+    assert resource.rejections == 3
+    assert resource.retries == 3
+
+
 #
 # Tests for PreemptiveResource
 #
@@ -386,6 +475,30 @@ def test_nested_preemption(env, log):
         (26, 3), (31, 4),
     ]
 
+
+def test_preemption_victim(env, log):
+    """The user with the largest key is preempted first. Among users with
+    equal keys, the one that got the resource last is preempted first."""
+    def process(name, env, res, delay, prio):
+        yield env.timeout(delay)
+        with res.request(priority=prio) as req:
+            try:
+                yield req
+                yield env.timeout(10)
+            except simpy.Interrupt:
+                log.append((env.now, name))
+
+    res = simpy.PreemptiveResource(env, 3)
+    for name, prio in (('a', 2), ('b', 1), ('c', 2)):
+        env.process(process(name, env, res, 0, prio))
+    env.process(process('d', env, res, 1, 0))
+    env.process(process('e', env, res, 2, 0))
+    env.process(process('f', env, res, 3, 0))
+    env.process(process('g', env, res, 3, 0))
+    env.run()
+
+    assert log == [(1, 'c'), (2, 'a'), (3, 'b')]
+
 #
 # Tests for Container
 #
@@ -444,6 +557,27 @@ def test_container_get_queued(env):
     assert [ev.proc for ev in container.get_queue] == []
 
 
+@pytest.mark.parametrize('scan', [False, True])
+def test_container_scan_get_queue(env, scan):
+    """By default, a get request that cannot be served blocks the later ones.
+    With scan_get_queue, the later requests are tried as well."""
+    class ScanContainer(simpy.Container):
+        scan_get_queue = scan
+
+        def _do_get(self, event):
+            super(ScanContainer, self)._do_get(event)
+            return True
+
+    container = ScanContainer(env)
+    gets = [container.get(amount) for amount in (5, 2, 1)]
+    container.put(3)
+    env.run()
+
+    assert [get.triggered for get in gets] == [False, scan, scan]
+    assert list(container.get_queue) == (gets[:1] if scan else gets)
+    assert container.level == (0 if scan else 3)
+
+
 def test_initial_container_capacity(env):
     container = simpy.Container(env)
     assert container.capacity == float('inf')
@@ -534,6 +668,288 @@ def test_store_cancel(env):
     env.run()
 
 
+def test_store_waiting_getters(env, log):
+    """Items put while getters are waiting are passed on to them in the
+    order of their requests once the puts are processed."""
+    def getter(env, store, name):
+        item = yield store.get()
+        log.append((name, item, env.now))
+
+    def putter(env, store):
+        yield env.timeout(1)
+        put = store.put('spam')
+        assert put.triggered and list(store.items) == ['spam']
+        yield put
+        assert not store.items
+        yield store.put('eggs')
+        yield store.put('ham')
+
+    store = simpy.Store(env, capacity=1)
+    env.process(getter(env, store, 'a'))
+    env.process(getter(env, store, 'b'))
+    env.process(putter(env, store))
+    env.run()
+
+    assert log == [('a', 'spam', 1), ('b', 'eggs', 1)]
+    assert list(store.items) == ['ham']
+    assert not store.get_queue
+
+
+def test_store_fifo_with_waiting_getter(env, log):
+    """Items already in the store are retrieved before newly put ones."""
+    def getter(env, store):
+        while True:
+            item = yield store.get()
+            log.append(item)
+
+    store = simpy.Store(env)
+    env.process(getter(env, store))
+    env.run()
+    store.items.extend([1, 2])
+    store.put(3)
+    env.run()
+
+    assert log == [1, 2, 3]
+
+
+def test_store_put_get_many(env, log):
+    """Batches keep the FIFO order of the items and of the requests."""
+    def getter(env, store, name, max_n=None):
+        if max_n is None:
+            item = yield store.get()
+        else:
+            item = yield store.get_many(max_n)
+        log.append((name, item, env.now))
+
+    store = simpy.Store(env, capacity=4)
+    env.process(getter(env, store, 'a'))
+    env.process(getter(env, store, 'b', 2))
+    env.run()
+    store.put_many([1, 2, 3])
+    store.put(4)
+    put = store.put_many([5, 6])
+    env.run()
+
+    assert log == [('a', 1, 0), ('b', [2, 3], 0)]
+    assert put.triggered
+    assert list(store.items) == [4, 5, 6]
+    assert store.get_many(10).value == [4, 5, 6]
+
+
+def test_store_get_many_handoff(env):
+    """A single item put into the empty store is passed on to a waiting
+    batch request as a list."""
+    store = simpy.Store(env)
+    get = store.get_many(3)
+    store.put('spam')
+    env.run()
+    assert get.value == ['spam']
+    assert not store.items
+
+
+def test_store_put_many_capacity(env):
+    """A batch waits until there is space for all of its items."""
+    store = simpy.Store(env, capacity=3)
+    store.put(1)
+    put = store.put_many([2, 3, 4])
+    later = store.put(5)
+    assert not put.triggered and not later.triggered
+
+    store.get()
+    env.run()
+    assert put.triggered and not later.triggered
+    assert list(store.items) == [2, 3, 4]
+
+    pytest.raises(ValueError, store.put_many, [])
+    pytest.raises(ValueError, store.put_many, range(4))
+    pytest.raises(ValueError, store.get_many, 0)
+
+
+def test_priority_store_many(env):
+    store = simpy.PriorityStore(env)
+    store.put_many([3, 1, 2])
+    store.put(0)
+    assert store.get_many(3).value == [0, 1, 2]
+    assert store.get_many(3).value == [3]
+
+
+def test_filter_store_get_many(env):
+    store = simpy.FilterStore(env)
+    store.put_many('abc')
+    assert store.get(lambda item: item == 'b').value == 'b'
+    assert store.get_many(5).value == ['a', 'c']
+
+
+def test_resource_request_many(env, log):
+    """A batch request takes several slots at once, after the earlier
+    requests."""
+    def user(env, name, amount, duration):
+        if amount == 1:
+            req = resource.request()
+        else:
+            req = resource.request_many(amount)
+        with req:
+            yield req
+            log.append((name, env.now, resource.count))
+            yield env.timeout(duration)
+
+    resource = simpy.Resource(env, capacity=3)
+    env.process(user(env, 'a', 2, 2))
+    env.process(user(env, 'b', 2, 1))
+    env.process(user(env, 'c', 1, 1))
+    env.run()
+
+    # c has to wait for b, even though a slot is free.
+    assert log == [('a', 0, 2), ('b', 2, 3), ('c', 2, 3)]
+    assert resource.count == 0 and not resource.users
+
+    # Requests behind a canceled batch request may use the free slots.
+    first = resource.request()
+    batch = resource.request_many(3)
+    second = resource.request()
+    batch.cancel()
+    assert second.triggered and resource.count == 2
+
+    pytest.raises(ValueError, resource.request_many, 0)
+    pytest.raises(ValueError, resource.request_many, 4)
+
+
+def test_resource_release_many(env, log):
+    """Releasing a batch request grants the queued requests its slots in one
+    pass."""
+    def user(env, name):
+        with resource.request() as req:
+            yield req
+            log.append((name, env.now))
+
+    resource = simpy.Resource(env, capacity=3)
+    batch = resource.request_many(3)
+    for name in 'abcd':
+        env.process(user(env, name))
+    env.run()
+    assert not log
+    resource.release(batch)
+    env.run()
+    assert log == [('a', 0), ('b', 0), ('c', 0), ('d', 0)]
+
+
+def test_priority_resource_request_many(env, log):
+    """Batch requests are sorted by their priority."""
+    def user(env, name, amount, priority):
+        with resource.request_many(amount, priority=priority) as req:
+            yield req
+            log.append((name, env.now))
+            yield env.timeout(1)
+
+    resource = simpy.PriorityResource(env, capacity=2)
+    env.process(user(env, 'a', 2, 0))
+    env.process(user(env, 'b', 2, 1))
+    env.process(user(env, 'c', 1, 0))
+    env.run()
+    assert log == [('a', 0), ('c', 1), ('b', 2)]
+
+
+def test_preemptive_resource_request_many(env, log):
+    """A batch request preempts users with a lower priority only if that
+    frees enough slots."""
+    def user(env, name, priority):
+        with resource.request(priority=priority) as req:
+            try:
+                yield req
+                yield env.timeout(5)
+                log.append((name, 'done', env.now))
+            except simpy.Interrupt:
+                log.append((name, 'preempted', env.now))
+
+    def batch(env, name, priority):
+        yield env.timeout(1)
+        with resource.request_many(2, priority=priority) as req:
+            yield req
+            log.append((name, 'granted', env.now))
+
+    # a and c have a lower priority than the batch and free two slots.
+    resource = simpy.PreemptiveResource(env, capacity=3)
+    env.process(user(env, 'a', 2))
+    env.process(user(env, 'b', 0))
+    env.process(user(env, 'c', 1))
+    env.process(batch(env, 'x', 0))
+    env.run(until=2)
+    assert log == [('a', 'preempted', 1), ('c', 'preempted', 1),
+                   ('x', 'granted', 1)]
+
+    # Only c has a lower priority, which does not free enough slots.
+    del log[:]
+    env = simpy.Environment()
+    resource = simpy.PreemptiveResource(env, capacity=2)
+    env.process(user(env, 'b', 0))
+    env.process(user(env, 'c', 2))
+    env.process(batch(env, 'y', 1))
+    env.run()
+    assert log == [('b', 'done', 5), ('c', 'done', 5), ('y', 'granted', 5)]
+
+
+def test_resource_cancel_request_many(env, log):
+    """Cancelling a queued batch request grants every request behind it that
+    fits."""
+    def user(env, name):
+        with resource.request() as req:
+            yield req
+            log.append((name, env.now))
+            yield env.timeout(1)
+
+    resource = simpy.Resource(env, capacity=4)
+    resource.request()
+    batch = resource.request_many(4)
+    env.process(user(env, 'a'))
+    env.process(user(env, 'c'))
+    env.run()
+    assert not log
+    batch.cancel()
+    env.run()
+    assert log == [('a', 0), ('c', 0)]
+
+
+def test_preemptive_resource_preempt_request_many(env, log):
+    """Preempting a batch request frees all of its slots for the queued
+    requests."""
+    def user(env, name, priority, preempt):
+        yield env.timeout(1)
+        with resource.request(priority=priority, preempt=preempt) as req:
+            yield req
+            log.append((name, env.now))
+            yield env.timeout(5)
+
+    def batch(env):
+        with resource.request_many(3, priority=2) as req:
+            yield req
+            try:
+                yield env.timeout(10)
+            except simpy.Interrupt:
+                log.append(('batch', 'preempted', env.now))
+
+    resource = simpy.PreemptiveResource(env, capacity=3)
+    env.process(batch(env))
+    env.process(user(env, 'c', 1, False))
+    env.process(user(env, 'd', 1, False))
+    env.process(user(env, 'a', 0, True))
+    env.run(until=2)
+    assert log == [('batch', 'preempted', 1), ('a', 1), ('c', 1), ('d', 1)]
+
+
+def test_finite_queue_request_many(env):
+    resource = simpy.FiniteQueueResource(env, capacity=2, queueDepth=0)
+    first = resource.request_many(2)
+    second = resource.request_many(2)
+    third = resource.request_many(1)
+    assert first.triggered and resource.count == 2
+    assert not second.triggered
+    assert not third.ok and resource.rejections == 1
+    third.defused = True
+    resource.release(first)
+    env.run()
+    assert second.triggered and resource.count == 2
+
+
 def test_priority_store_item_priority(env):
     pstore = simpy.PriorityStore(env, 3)
     log = []
@@ -677,6 +1093,117 @@ def test_filter_calls_worst_case(env):
     ]
 
 
+def test_keyed_store(env, log):
+    """Items are retrieved per key in FIFO order."""
+    store = simpy.KeyedStore(env)
+
+    def getter(env, key):
+        while True:
+            item = yield store.get(key)
+            log.append((key, item, env.now))
+
+    def putter(env):
+        for i in range(3):
+            yield store.put(i % 2, i)
+            yield env.timeout(1)
+
+    store.put(1, 'spam')
+    store.put(1, 'eggs')
+    env.process(getter(env, 1))
+    env.process(getter(env, 0))
+    env.process(putter(env))
+    env.run()
+
+    assert [entry for entry in log if entry[0] == 0] == [(0, 0, 0), (0, 2, 2)]
+    assert [entry for entry in log if entry[0] == 1] == [
+        (1, 'spam', 0), (1, 'eggs', 0), (1, 1, 1)]
+    assert store.size == 0 and not store.items
+    assert len(store.get_queue) == 2
+
+
+def test_keyed_store_get_any(env):
+    """Get requests for any key take the items of the ready keys in turn."""
+    store = simpy.KeyedStore(env)
+    for key, item in [('a', 1), ('a', 2), ('b', 3), ('c', 4), ('b', 5)]:
+        store.put(key, item)
+    assert store.count('a') == 2 and store.count('d') == 0
+
+    items = [store.get_any().value for _ in range(5)]
+    assert items == [1, 3, 4, 2, 5]
+    assert not store.items
+
+
+def test_keyed_store_handoff(env, log):
+    """An item goes to the oldest get request waiting for its key or for any
+    key."""
+    def getter(env, name, key=None):
+        item = yield (store.get_any() if key is None else store.get(key))
+        log.append((name, item))
+
+    store = simpy.KeyedStore(env)
+    env.process(getter(env, 'x', 'x'))
+    env.process(getter(env, 'any'))
+    env.process(getter(env, 'y', 'y'))
+    env.run()
+    store.put('y', 1)
+    store.put('y', 2)
+    store.put('x', 3)
+    store.put('x', 4)
+    env.run()
+
+    assert log == [('any', 1), ('y', 2), ('x', 3)]
+    assert list(store.items['x']) == [4]
+    assert not store.get_queue
+
+
+@pytest.mark.parametrize('keyed, order', [
+    (True, ['get', 'put']),
+    (False, ['put', 'get']),
+])
+def test_keyed_store_handoff_order(env, log, keyed, order):
+    """A get request that receives an item directly is processed before the
+    put request, unlike the get requests of a Store."""
+    def getter(env, store):
+        yield store.get('x') if keyed else store.get()
+        log.append('get')
+
+    def putter(env, store):
+        yield env.timeout(1)
+        yield store.put('x', 1) if keyed else store.put(1)
+        log.append('put')
+
+    store = simpy.KeyedStore(env) if keyed else simpy.Store(env)
+    env.process(getter(env, store))
+    env.process(putter(env, store))
+    env.run()
+    assert log == order
+
+
+def test_keyed_store_capacity(env):
+    pytest.raises(ValueError, simpy.KeyedStore, env, 0)
+    store = simpy.KeyedStore(env, capacity=2)
+    puts = [store.put(key, key) for key in 'abc']
+    assert [put.triggered for put in puts] == [True, True, False]
+    assert store.get('b').value == 'b'
+    env.run()
+    assert puts[2].triggered
+    assert store.size == 2
+
+
+def test_keyed_store_cancel(env):
+    store = simpy.KeyedStore(env)
+    first = store.get('a')
+    second = store.get('a')
+    any_key = store.get_any()
+    first.cancel()
+    assert list(store.get_queue) == [second, any_key]
+    store.put('a', 1)
+    store.put('b', 2)
+    assert second.value == 1 and any_key.value == 2
+    assert not store.get_queue
+    pytest.raises(ValueError, store.get_queue.remove, first)
+
+
 def test_immediate_put_request(env):
     """Put requests that can be fulfilled immediately do not enter the put
     queue."""
@@ -0,0 +1,134 @@
+"""
+Tests for ``simpy.resources.stats``.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import pytest
+
+import simpy
+from simpy.resources.stats import QueueStats, length_percentile
+
+
+def test_store_stats(env):
+    """The queue length of a store is its number of items."""
+    store = simpy.Store(env)
+    stats = QueueStats(store)
+
+    def producer(env):
+        for i in range(3):
+            yield store.put(i)
+        yield env.timeout(2)
+        yield store.put(3)
+
+    def consumer(env):
+        yield env.timeout(4)
+        for i in range(4):
+            yield store.get()
+            yield env.timeout(1)
+
+    env.process(producer(env))
+    env.process(consumer(env))
+    env.run(until=10)
+
+    # 3 items from 0 to 2, 4 from 2 to 4, then one less per time unit.
+    assert stats.histogram() == {0: 3, 1: 1, 2: 1, 3: 3, 4: 2}
+    assert stats.max_length == 4
+    assert stats.mean_length == pytest.approx((6 + 8 + 3 + 2 + 1) / 10.0)
+    assert stats.departures == 4
+    assert stats.throughput == pytest.approx(0.4)
+    assert stats.utilization == 0
+    assert stats.percentile(50) == 2
+    assert stats.percentile(60) == 3
+    assert stats.percentile(100) == 4
+
+
+def test_store_stats_handoff(env):
+    """Items passed on to waiting getters count as departures."""
+    store = simpy.Store(env)
+    stats = QueueStats(store)
+
+    def consumer(env):
+        while True:
+            yield store.get()
+
+    env.process(consumer(env))
+    env.run(until=1)
+    store.put('spam')
+    env.run(until=2)
+
+    # The item is in the store only until the put is processed.
+    assert stats.departures == 1
+    assert stats.max_length == 1
+    assert stats.histogram() == {0: 2}
+
+
+def test_resource_stats(env):
+    """The queue length of a resource is its number of waiting requests and
+    its users are the busy servers."""
+    resource = simpy.Resource(env, capacity=2)
+    stats = QueueStats(resource)
+
+    def user(env, delay):
+        yield env.timeout(delay)
+        with resource.request() as req:
+            yield req
+            yield env.timeout(2)
+
+    for delay in (0, 0, 0, 1):
+        env.process(user(env, delay))
+    env.run(until=8)
+
+    # Busy: 2 from 0 to 4, none afterwards. Queued: 1 from 0 to 1, 2 from 1
+    # to 2, none afterwards.
+    assert stats.mean_busy == pytest.approx(1.0)
+    assert stats.utilization == pytest.approx(0.5)
+    assert stats.histogram() == {0: 6, 1: 1, 2: 1}
+    assert stats.max_length == 2
+    assert stats.departures == 4
+    assert stats.throughput == pytest.approx(0.5)
+
+
+def test_stats_while_running(env):
+    """The statistics include the time since the last change."""
+    resource = simpy.Resource(env)
+    stats = QueueStats(resource)
+    resource.request()
+    env.run(until=5)
+
+    assert stats.elapsed == 5
+    assert stats.mean_busy == 1
+    assert stats.histogram() == {0: 5}
+
+    stats.reset()
+    assert stats.elapsed == 0
+    assert stats.mean_busy == 1
+    env.run(until=7)
+    assert stats.histogram() == {0: 2}
+
+
+def test_stats_cancel(env):
+    """Canceled requests leave the queue."""
+    resource = simpy.Resource(env)
+    stats = QueueStats(resource)
+    resource.request()
+    req = resource.request()
+    env.run(until=1)
+    req.cancel()
+    env.run(until=3)
+
+    assert stats.histogram() == {1: 1, 0: 2}
+
+
+def test_stats_errors(env):
+    store = simpy.Store(env)
+    QueueStats(store)
+    pytest.raises(RuntimeError, QueueStats, store)
+    pytest.raises(NotImplementedError, QueueStats, simpy.Container(env))
+
+
+def test_length_percentile():
+    histogram = {0: 50, 1: 40, 5: 10}
+    assert length_percentile(histogram, 50) == 0
+    assert length_percentile(histogram, 90) == 1
+    assert length_percentile(histogram, 99) == 5
+    assert length_percentile({}, 99) == 0
@@ -0,0 +1,169 @@
+"""
+Tests for ``simpy.tracing``.
+
+"""
+# Pytest gets the parameters "env" and "log" from the *conftest.py* file
+import pytest
+
+import simpy
+from simpy.profiling import Profiler
+
+numpy = pytest.importorskip('numpy')
+from simpy.tracing import Tracer, TraceReader  # noqa: E402
+
+
+def producer(env, store):
+    for i in range(3):
+        yield env.timeout(1)
+        yield store.put(i)
+
+
+def consumer(env, store):
+    while True:
+        yield store.get()
+
+
+def ticker(env, n):
+    for i in range(n):
+        yield env.timeout(1)
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('trace'))
+
+
+def test_tracer(env, path):
+    store = simpy.Store(env)
+    proc = env.process(producer(env, store))
+    env.process(consumer(env, store))
+
+    with Tracer(env, path) as tracer:
+        env.run()
+
+    reader = TraceReader(path)
+    records = reader.records()
+    assert len(reader) == len(records) == tracer.count == 12
+    assert reader.types == tracer.types
+    assert reader.resources == ['Store#0']
+    assert list(records['seq']) == list(range(12))
+    assert list(records['time']) == sorted(records['time'])
+    assert records['time'][-1] == 3
+
+    types = [reader.types[code] for code in records['type']]
+    assert types.count('StorePut') == 3
+    assert types.count('StoreGet') == 3
+    for record, name in zip(records, types):
+        if name in ('StorePut', 'StoreGet'):
+            assert record['resource'] == 0
+        else:
+            assert record['resource'] == -1
+        if name == 'Timeout':
+            assert record['proc'] == id(proc)
+
+
+def test_tracer_events_without_process(env, path):
+    """Events that do not resume a process are recorded with proc 0."""
+    env.timeout(1)
+    with Tracer(env, path):
+        env.run()
+
+    records = TraceReader(path).records()
+    assert len(records) == 1
+    assert records[0]['proc'] == 0
+
+
+def test_tracer_ring(env, path):
+    """Once the file is full, the oldest records are overwritten."""
+    env.process(ticker(env, 20))
+    with Tracer(env, path, capacity=8, buffer_size=3) as tracer:
+        env.run()
+
+    assert tracer.count == 22  # Initialize, 20 timeouts and the Process
+    reader = TraceReader(path)
+    records = reader.records()
+    assert len(reader) == 8
+    assert list(records['seq']) == list(range(14, 22))
+    assert list(records['time']) == [14, 15, 16, 17, 18, 19, 20, 20]
+
+
+def test_tracer_float_times(env, path):
+    """Integer and float times can be mixed."""
+    def sleeper(env):
+        yield env.timeout(1)
+        yield env.timeout(0.5)
+        yield env.timeout(2)
+
+    env.process(sleeper(env))
+    with Tracer(env, path):
+        env.run()
+
+    assert list(TraceReader(path).records()['time']) == [0, 1, 1.5, 3.5, 3.5]
+
+
+def test_tracer_many_processes(env, path):
+    """Each record refers to the process it resumed, even if there are more
+    processes than fit into the tables of the tracer."""
+    procs = [env.process(ticker(env, 1)) for _ in range(600)]
+    with Tracer(env, path, capacity=4096, buffer_size=1000):
+        env.run()
+
+    records = TraceReader(path).records()
+    types = TraceReader(path).types
+    timeouts = records[records['type'] == types.index('Timeout')]
+    assert sorted(timeouts['proc']) == sorted(id(proc) for proc in procs)
+
+
+@pytest.mark.parametrize('capacity', [8, 64])
+def test_reader_window(env, path, capacity):
+    env.process(ticker(env, 20))
+    with Tracer(env, path, capacity=capacity, buffer_size=5):
+        env.run()
+
+    reader = TraceReader(path)
+    window = reader.window(15, 18)
+    assert list(window['time']) == [15, 16, 17]
+    assert list(reader.window(17.5, 30)['time']) == [18, 19, 20, 20]
+    assert len(reader.window(30, 40)) == 0
+
+
+def test_tracer_flush(env, path):
+    """Flushed records can be read while the tracer is still active."""
+    env.process(ticker(env, 5))
+    tracer = Tracer(env, path)
+    tracer.start()
+    env.run(until=3)
+    tracer.flush()
+    assert list(TraceReader(path).records()['time']) == [0, 1, 2, 3]
+
+    env.run()
+    tracer.stop()
+    assert len(TraceReader(path)) == 8
+
+
+def test_tracer_restores_step(env, path):
+    tracer = Tracer(env, path)
+    tracer.start()
+    pytest.raises(RuntimeError, Profiler(env).start)
+    tracer.stop()
+    assert 'step' not in env.__dict__
+
+    with Profiler(env):
+        pytest.raises(RuntimeError, Tracer(env, path).start)
+
+
+def test_tracer_failed_event(env, path):
+    """Failed events crash the environment like without tracing."""
+    env.event().fail(ValueError('spam'))
+    with Tracer(env, path):
+        pytest.raises(ValueError, env.run)
+    assert len(TraceReader(path)) == 1
+
+
+@pytest.mark.parametrize(('kwargs', 'error'), [
+    ({'capacity': 0}, 'capacity'),
+    ({'buffer_size': 0}, 'buffer_size'),
+])
+def test_tracer_invalid_sizes(env, path, kwargs, error):
+    with pytest.raises(ValueError, match=error):
+        Tracer(env, path, **kwargs)
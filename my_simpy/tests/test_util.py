@@ -4,9 +4,11 @@ Tests for the utility functions from :mod:`simpy.util`.
 """
 import pytest
 
+import simpy
 from simpy import Interrupt
 from simpy.events import ConditionValue
-from simpy.util import start_delayed, subscribe_at
+from simpy.util import (
+    ArrivalStream, PhaseController, start_delayed, subscribe_at)
 
 
 def test_start_delayed(env):
@@ -323,3 +325,176 @@ def test_all_of_expansion(env):
 
     env.process(p(env))
     env.run()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 1000])
+def test_arrival_stream(env, chunk_size):
+    store = simpy.Store(env)
+    log = []
+
+    def consumer(env):
+        while True:
+            item = yield store.get()
+            log.append((env.now, item))
+
+    env.process(consumer(env))
+    stream = ArrivalStream(env, store, [0, 1, 1, 2.5, 4], 'abcde', chunk_size)
+    env.run(until=stream)
+    assert stream.value == 5
+    assert env.now == 4
+    env.run(until=5)
+    assert log == [(0, 'a'), (1, 'b'), (1, 'c'), (2.5, 'd'), (4, 'e')]
+
+
+def test_arrival_stream_lazy(env):
+    """Infinite streams are consumed chunk by chunk."""
+    def times():
+        t = 0
+        while True:
+            produced.append(t)
+            yield t
+            t += 1
+
+    def items():
+        i = 0
+        while True:
+            yield i
+            i += 1
+
+    produced = []
+    store = simpy.Store(env)
+    stream = ArrivalStream(env, store, times(), items(), chunk_size=4)
+    assert len(produced) == 4
+    env.run(until=5.5)
+    assert list(store.items) == [0, 1, 2, 3, 4, 5]
+    assert len(produced) == 8
+    assert not stream.triggered
+
+
+def test_arrival_stream_stop(env):
+    store = simpy.Store(env)
+    stream = ArrivalStream(env, store, range(10), range(10), chunk_size=3)
+
+    def stopper(env):
+        yield env.timeout(4.5)
+        stream.stop()
+
+    env.process(stopper(env))
+    env.run()
+    assert stream.value == 5
+    assert list(store.items) == [0, 1, 2, 3, 4]
+    # The rest of the chunk has been cancelled.
+    assert env.now == 4.5
+    assert env._ncancelled == 1
+
+
+def test_arrival_stream_items_exhausted(env):
+    store = simpy.Store(env)
+    stream = ArrivalStream(env, store, [1, 2, 3], 'ab')
+    env.run(until=stream)
+    assert env.now == 3
+    assert stream.value == 2
+
+
+def test_arrival_stream_chunk_size(env):
+    pytest.raises(ValueError, ArrivalStream, env, None, [], [], 0)
+
+
+def phased_source(env, phases, log, service_time):
+    """Start a request every time unit. Each request takes *service_time*
+    and logs its number and completion time if it is measured."""
+    def request(env, n):
+        measured = phases.admit()
+        yield env.timeout(service_time(n))
+        if measured:
+            log.append((n, env.now))
+        phases.complete(measured)
+
+    n = 0
+    while True:
+        env.process(request(env, n))
+        n += 1
+        yield env.timeout(1)
+
+
+def test_phase_controller(env, log):
+    phases = PhaseController(env, measure=3, warmup=2)
+    assert phases.phase == PhaseController.WARMUP
+    env.process(phased_source(env, phases, log, lambda n: max(10 - 2 * n, 1)))
+
+    assert env.run(until=phases) == 3
+    assert log == [(4, 6), (3, 7), (2, 8)]
+    assert env.now == 8
+    assert phases.phase == PhaseController.DRAIN
+    assert phases.admitted == 9  # The source kept going while draining.
+    assert phases.measured == phases.completed == 3
+    assert phases.measuring.ok and phases.draining.ok
+
+
+def test_phase_controller_phase_events(env, log):
+    phases = PhaseController(env, measure=2, warmup=1)
+    env.process(phased_source(env, phases, [], lambda n: 5))
+
+    def watcher(env):
+        yield phases.measuring
+        log.append(('measure', env.now))
+        yield phases.draining
+        log.append(('drain', env.now))
+
+    env.process(watcher(env))
+    env.run(until=phases)
+    assert log == [('measure', 1), ('drain', 2)]
+    assert env.now == 7
+
+
+def test_phase_controller_timed(env, log):
+    phases = PhaseController(env, measure=3, warmup=2.5, timed=True)
+    env.process(phased_source(env, phases, log, lambda n: 4))
+
+    env.run(until=phases)
+    assert log == [(3, 7), (4, 8), (5, 9)]
+    assert env.now == 9
+    assert phases.measuring.ok and phases.draining.ok
+
+
+def test_phase_controller_no_warmup(env):
+    phases = PhaseController(env, measure=1)
+    assert phases.phase == PhaseController.MEASURE
+    assert phases.admit()
+    assert phases.phase == PhaseController.DRAIN
+    assert not phases.admit()
+    assert not phases.triggered
+    phases.complete(False)
+    assert not phases.triggered
+    phases.complete(True)
+    assert phases.triggered
+    assert phases.value == 1
+
+
+@pytest.mark.parametrize('timed', [False, True])
+def test_phase_controller_no_measurement(env, timed):
+    phases = PhaseController(env, measure=0, timed=timed)
+    if timed:
+        env.run(until=phases)
+    assert phases.phase == PhaseController.DRAIN
+    assert phases.triggered
+    assert phases.value == 0
+
+
+def test_phase_controller_stop(env, log):
+    phases = PhaseController(env, measure=100)
+    env.process(phased_source(env, phases, log, lambda n: 1))
+
+    def stopper(env):
+        yield env.timeout(2.5)
+        phases.stop()
+
+    env.process(stopper(env))
+    assert env.run(until=phases) == 2
+    assert env.now == 2.5
+    assert log == [(0, 1), (1, 2)]
+
+
+@pytest.mark.parametrize(('measure', 'warmup'), [(-1, 0), (1, -1)])
+def test_phase_controller_negative(env, measure, warmup):
+    pytest.raises(ValueError, PhaseController, env, measure, warmup)
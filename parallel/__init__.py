@@ -1 +1,3 @@
 from .invoker import Invoker
+from .branching import run_branches, reseed
+from .pdes import RemoteChannel, ChannelLP, runWindowed
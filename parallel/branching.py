@@ -0,0 +1,103 @@
+import os
+import pickle
+import random
+import sys
+import traceback
+
+import numpy as np
+
+import components.random_stream as random_stream
+
+def reseed(seed):
+    """Seed the random number generators used by the models (the streams of
+    components.random_stream, python's random module and numpy's global
+    generator, which scipy.stats also draws from)."""
+    random_stream.seed(seed)
+    random.seed(seed)
+    np.random.seed(seed)
+
+def run_branches(env, until, branches, maxParallel=None):
+    """Run the simulation env up to the simulated time until, then fork() the
+    warm process once per branch and return the results of all branches in
+    order.
+
+    Each branch is a callable that receives the warm env in a child process.
+    It should change the parameters it explores (e.g. NI.myLambda), reseed
+    the RNGs (see reseed()) so that the branches are independent, continue the
+    simulation with env.run() and return a picklable result. The parent never
+    continues past until, so one warm-up is shared by all branches.
+
+    At most maxParallel children (default: number of CPUs) run at once. If a
+    branch raises, a RuntimeError with the child's traceback is raised in the
+    parent after all children have finished. Requires os.fork() (Linux/macOS).
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('Warm-start branching requires os.fork().')
+    if maxParallel is None:
+        maxParallel = os.cpu_count() or 1
+    if maxParallel < 1:
+        raise ValueError('maxParallel(=%s) must be >= 1.' % maxParallel)
+
+    if until > env.now:
+        env.run(until=until)
+
+    results = [ None for b in branches ]
+    errors = [ ]
+    running = [ ] # (branch index, pid, read end of the result pipe)
+    for idx,branch in enumerate(branches):
+        if len(running) >= maxParallel:
+            _collect(running.pop(0),results,errors)
+        running.append(_fork(env,idx,branch))
+    while running:
+        _collect(running.pop(0),results,errors)
+
+    if errors:
+        raise RuntimeError('%d of %d branches failed:\n%s' % (len(errors),len(branches),'\n'.join(errors)))
+    return results
+
+def _fork(env,idx,branch):
+    """Start branch idx in a child process and return (idx, pid, fd)."""
+    rfd,wfd = os.pipe()
+    # Flush buffered output, otherwise the child would print it again.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        # Child: run the branch, send the pickled outcome and exit without
+        # running any of the parent's cleanup handlers.
+        status = 0
+        try:
+            os.close(rfd)
+            try:
+                outcome = (True, branch(env))
+            except BaseException:
+                outcome = (False, traceback.format_exc())
+            try:
+                data = pickle.dumps(outcome, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = pickle.dumps((False, traceback.format_exc()), pickle.HIGHEST_PROTOCOL)
+            with os.fdopen(wfd,'wb') as f:
+                f.write(data)
+        except BaseException:
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+    os.close(wfd)
+    return (idx,pid,rfd)
+
+def _collect(child,results,errors):
+    """Read the outcome of a child started by _fork() and reap it."""
+    idx,pid,rfd = child
+    with os.fdopen(rfd,'rb') as f:
+        data = f.read() # read everything before waiting, the pipe may be full
+    _,status = os.waitpid(pid,0)
+    if not data:
+        errors.append('Branch %d exited with status %d without a result.' % (idx,status))
+        return
+    ok,value = pickle.loads(data)
+    if ok:
+        results[idx] = value
+    else:
+        errors.append('Branch %d failed:\n%s' % (idx,value))
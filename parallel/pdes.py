@@ -0,0 +1,175 @@
+import multiprocessing as mp
+from itertools import count
+
+import sys
+sys.path.append("..")
+from my_simpy.src.simpy import Environment
+from my_simpy.src.simpy.core import Infinity
+from my_simpy.src.simpy.events import Event, NORMAL
+from .branching import reseed
+
+# Window-based conservative parallel simulation.
+#
+# The model is split into one "front" logical process (LP), which runs in the
+# calling process, and one LP per remote channel, each in its own forked OS
+# process with its own Environment. The front LP talks to a channel only
+# through RemoteChannel.access(): it sends a request at time ts and receives
+# the completion time of the request. A channel must never complete a request
+# earlier than ts + lookahead, and it reports the completion time as soon as
+# the request starts being served.
+#
+# All LPs advance in lock-step windows of length W = lookahead. In each window
+# [T, T+W) the front LP runs first and collects the requests it issues. The
+# channels then simulate the same window with these requests and return the
+# completion times of all requests that started being served in the window.
+# Those completions happen at or after T+W, i.e. in a later window of the
+# front LP, so no LP ever receives a message from its past.
+#
+# Every window costs one pipe round trip per channel, so this only pays off
+# if a channel has much more work per window than that. It does not for the
+# DRAM channels of core_dram_contention.py: their lookahead (tOffchip+tCAS =
+# 39ns) bounds the windows, as the cores issue accesses without any delay to
+# the channels, and a window needs the completions of the previous one. With
+# 16 channels and 2000 Gbps, the windowed run took 25s instead of 4s (on one
+# CPU), so the model does not offer it.
+
+class RemoteChannel(object):
+    """Front-side proxy of a channel LP."""
+    def __init__(self,env,idx):
+        self.env = env
+        self.idx = idx
+        self.outbox = [ ] # (ts, request id, size) issued in the current window
+        self.pending = { } # request id -> event succeeded upon completion
+        self.results = None # filled with ChannelLP.getResults() at the end
+        self._ids = count()
+
+    def access(self,sz=64):
+        """Request an access of sz bytes and return an event that succeeds
+        when the channel has completed it."""
+        event = Event(self.env)
+        rid = next(self._ids)
+        self.outbox.append((self.env.now,rid,sz))
+        self.pending[rid] = event
+        return event
+
+    def deliver(self,responses):
+        now = self.env.now
+        for rid,t in responses:
+            if t < now:
+                raise RuntimeError('Lookahead violated: channel %d completed request %d at %s, front is at %s.' % (self.idx,rid,t,now))
+            event = self.pending.pop(rid)
+            # Trigger the event with a delay, like a timeout.
+            event._ok = True
+            event._value = None
+            self.env.schedule(event,NORMAL,t - now)
+
+class ChannelLP(object):
+    """Base class of the channel side of a RemoteChannel. Subclasses
+    implement accept() and getResults()."""
+    def __init__(self,env):
+        self.env = env
+        self.responses = [ ]
+
+    def accept(self,rid,sz):
+        """Start serving request rid and call respond() once its completion
+        time is known."""
+        raise NotImplementedError(self)
+
+    def respond(self,rid,t):
+        self.responses.append((rid,t))
+
+    def getResults(self):
+        """Return the picklable results of this channel after the run."""
+        raise NotImplementedError(self)
+
+def _channelMain(conn,makeChannel,idx,seed):
+    # Forked children inherit the RNG state of the parent, reseed so that the
+    # channels draw independent streams (seed None uses fresh OS entropy).
+    reseed(seed)
+    env = Environment()
+    channel = makeChannel(env,idx)
+    while True:
+        msg = conn.recv()
+        if msg[0] == 'finish':
+            # Complete the accesses still in service.
+            env.run()
+            conn.send(channel.getResults())
+            conn.close()
+            return
+        _,end,requests = msg
+        for ts,rid,sz in requests:
+            arrival = Event(env)
+            arrival._ok = True
+            arrival._value = None
+            arrival.callbacks.append(lambda e,rid=rid,sz=sz: channel.accept(rid,sz))
+            env.schedule(arrival,NORMAL,ts - env.now)
+        env.run(until=end)
+        conn.send(channel.responses)
+        channel.responses = [ ]
+
+def _recv(ch,conn):
+    try:
+        return conn.recv()
+    except EOFError:
+        # The child printed its traceback to stderr.
+        raise RuntimeError('Channel %d exited unexpectedly.' % ch.idx)
+
+def runWindowed(env,channels,makeChannel,lookahead,seed=None,until=None):
+    """Run the front LP env together with one forked channel LP per
+    RemoteChannel in channels until no events and no requests are left or,
+    if until is an event, until the end of the window in which it has been
+    processed.
+
+    makeChannel(env,idx) creates the ChannelLP of channel idx in its process.
+    Channel idx is seeded with seed + 1 + idx (with fresh OS entropy if seed
+    is None). Requires the fork start method (Linux/macOS). Returns the
+    number of windows. The results of each channel LP are stored in
+    channels[idx].results."""
+    if lookahead <= 0:
+        raise ValueError('lookahead(=%s) must be > 0.' % lookahead)
+    ctx = mp.get_context('fork')
+    conns = [ ]
+    procs = [ ]
+    sys.stdout.flush()
+    sys.stderr.flush()
+    for ch in channels:
+        parent_conn,child_conn = ctx.Pipe()
+        chSeed = None if seed is None else seed + 1 + ch.idx
+        p = ctx.Process(target=_channelMain,args=(child_conn,makeChannel,ch.idx,chSeed))
+        p.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        procs.append(p)
+
+    windows = 0
+    try:
+        T = env.now
+        while until is None or not until.processed:
+            idle = not any(ch.pending for ch in channels)
+            if idle:
+                nxt = env.peek()
+                if nxt == Infinity:
+                    break
+                # Nothing in flight, skip to the next event of the front LP.
+                T = max(T,nxt)
+            end = T + lookahead
+            env.run(until=end)
+            for ch,conn in zip(channels,conns):
+                conn.send(('window',end,ch.outbox))
+                ch.outbox = [ ]
+            for ch,conn in zip(channels,conns):
+                ch.deliver(_recv(ch,conn))
+            T = end
+            windows += 1
+
+        for ch,conn in zip(channels,conns):
+            conn.send(('finish',))
+            ch.results = _recv(ch,conn)
+    finally:
+        for conn in conns:
+            conn.close()
+        for p in procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+    return windows
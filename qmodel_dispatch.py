@@ -9,10 +9,12 @@ from components.load_generator import PoissonLoadGen
 from components.rpc_core import RPCCore
 from components.serv_times.exp_generator import ExpServTimeGenerator
 from components.dispatch_policies import RandomDispatchPolicy, JSQDispatchPolicy, JBSQDispatchPolicy, CREWDispatchPolicy, EREWDispatchPolicy
+from components.random_stream import seed
 
 # simpy includes
 from my_simpy.src.simpy import Environment
-from my_simpy.src.simpy.resources.store import Store
+from my_simpy.src.simpy.resources.store import Store, KeyedStore
+from my_simpy.src.simpy.util import PhaseController
 
 # python environment includes
 import argparse
@@ -27,10 +29,16 @@ def main():
     parser.add_argument('-cp','--ConcurrencyPolicy',required=True,choices=['EREW','CREW','CRCW'],help="Concurrency dispatch poliy")
     parser.add_argument('-f','--WriteFraction',type=float,help="Fraction of writes in the simulation, expressed as percentage. Default = 5",default=5.0)
     parser.add_argument('--RequestsToSimulate',type=int,help="Number of requests to simulate for. Default = 1M",default = 1000000)
+    parser.add_argument('--WarmupRequests',type=int,help="Number of requests to simulate before the measured ones, their latencies are discarded. Default = 0",default = 0)
+    parser.add_argument('--InlineLimit',type=int,help="Max. number of already triggered events (e.g. gets on non-empty queues) a process continues with inline before waiting for the scheduler. Default = 0 (disabled)",default = 0)
+    parser.add_argument('--Seed',type=int,help="Seed of the random number streams of the load generator, service times and dispatcher. Default = None (fresh OS entropy)",default = None)
     args = parser.parse_args()
 
+    if args.Seed is not None:
+        seed(args.Seed)
+
     # Create the simpy environment needed by all components beneath it
-    env = Environment()
+    env = Environment(inline_limit=args.InlineLimit)
 
     # Make the zipf generator
     kwarg_dict = { "num_items" : args.NumItems, "coeff" : args.ZipfCoeff }
@@ -51,30 +59,34 @@ def main():
     if 'CRCW' in args.ConcurrencyPolicy: # single-queue
         disp_queues = [ Store(env) ]
         disp_policy = JSQDispatchPolicy(disp_queues)
-    else: # both CREW and EREW are a form of multi-queueing
-        disp_queues = [ Store(env) for i in range(args.NumberOfWorkers) ]
+    else: # both CREW and EREW are a form of multi-queueing, one partition of a keyed store per core
+        disp_queues = KeyedStore(env)
         if 'CREW' in args.ConcurrencyPolicy:
-            disp_policy = CREWDispatchPolicy(disp_queues)
+            disp_policy = CREWDispatchPolicy(disp_queues,args.NumberOfWorkers)
         else: # EREW
-            disp_policy = EREWDispatchPolicy(disp_queues)
+            disp_policy = EREWDispatchPolicy(disp_queues,args.NumberOfWorkers)
 
     event_queue = Store(env) # to pass incoming load from generator to balancer
 
+    # Warm-up, measure and drain phases, the run ends when the last measured
+    # request completes
+    phases = PhaseController(env,args.RequestsToSimulate,args.WarmupRequests)
+
     # Make the load balancer and load generator
-    lgen = PoissonLoadGen(env,event_queue,args.RequestsToSimulate,z,args.Load,args.WriteFraction)
-    lb = LoadBalancer(env,lgen,event_queue,disp_queues,disp_policy)
+    lgen = PoissonLoadGen(env,event_queue,phases,z,args.Load,args.WriteFraction)
+    lb = LoadBalancer(env,event_queue,disp_queues,disp_policy)
 
-    rd_generator = ExpServTimeGenerator(1.0)
-    wr_generator = ExpServTimeGenerator(1.5)
+    rd_generator = ExpServTimeGenerator(1.0,'serv_times.read')
+    wr_generator = ExpServTimeGenerator(1.5,'serv_times.write')
 
     # Hook up cores
     if 'CRCW' in args.ConcurrencyPolicy: # single-queue
-        core_list = [ RPCCore(env,i,disp_queues[0],latency_store,rd_generator,wr_generator,lgen) for i in range(args.NumberOfWorkers) ] # All get a single queue
-    else: # private core queues
-        core_list = [ RPCCore(env,i,disp_queues[i],latency_store,rd_generator,wr_generator,lgen) for i in range(args.NumberOfWorkers) ]  # Multi-queue
+        core_list = [ RPCCore(env,i,disp_queues[0],latency_store,rd_generator,wr_generator,phases) for i in range(args.NumberOfWorkers) ] # All get a single queue
+    else: # private core partitions
+        core_list = [ RPCCore(env,i,disp_queues,latency_store,rd_generator,wr_generator,phases,i) for i in range(args.NumberOfWorkers) ]  # Multi-queue
 
     print('Running for',args.RequestsToSimulate,'requests......')
-    env.run()
+    env.run(until=phases)
 
     # Get results
     def getServiceTimes(latStore):
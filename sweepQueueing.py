@@ -55,6 +55,7 @@ def main():
     # Remap to dictwriter-able format.
     for x in flat_results:
         for k,v in x.items():
+            partial = v.pop()
             n_dropped = v.pop()
             l = sorted(list(v[0]),key = lambda t : t[0])
             #print(k,l,n_dropped)
@@ -63,8 +64,10 @@ def main():
                     output_fields.append(tup[0])
                 init_or_add(odict,k,tup[1])
         init_or_add(odict,k,n_dropped)
+        init_or_add(odict,k,partial)
 
     output_fields.append('n_dropped')
+    output_fields.append('partial')
 
     with open('queueing'+args.mode+'.csv','w') as fh:
         writer = csv.DictWriter(fh, fieldnames = output_fields)